@@ -1,15 +1,117 @@
 import google.generativeai as genai
+import asyncio
 import os
-from typing import Dict, List
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
 import json
 import re
 
 
+class AIResponseError(ValueError):
+    """Raised when a model reply does not contain a usable analysis"""
+
+
+# Characters that matter when finding JSON objects in a reply
+_JSON_SYNTAX = re.compile(r'[{}"\\]')
+
+
+def _object_spans(text: str) -> Iterator[Tuple[int, int]]:
+    """(start, end) of each balanced top-level {...} span, in one pass"""
+    depth, start, in_string, escaped_at = 0, 0, False, -1
+    for match in _JSON_SYNTAX.finditer(text):
+        char, position = match.group(), match.start()
+        if in_string:
+            if char == '\\' and escaped_at != position:
+                escaped_at = position + 1  # the next character is escaped
+            elif char == '"' and escaped_at != position:
+                in_string = False
+        elif char == '"':
+            in_string = depth > 0  # quotes in prose around the JSON don't matter
+        elif char == '{':
+            if depth == 0:
+                start = position
+            depth += 1
+        elif char == '}' and depth:
+            depth -= 1
+            if depth == 0:
+                yield start, position + 1
+
+
+class CircuitBreaker:
+    """Stops calling a failing API for a while instead of waiting on every request.
+    
+    After ``failure_threshold`` consecutive failures the breaker opens and all
+    calls are refused for ``reset_timeout`` seconds; then a single trial call is
+    let through (half-open) and its outcome closes or re-opens the breaker.
+    """
+    
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+    
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+    
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+    
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+    
+    def release_trial(self):
+        """Forget a half-open trial that ended without an outcome (e.g. cancelled)"""
+        self.trial_in_flight = False
+    
+    def record_failure(self):
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
 class AIService:
     def __init__(self):
         self.model = None
         self.api_key = os.getenv("GEMINI_API_KEY")
         
+        # Per-call deadline, circuit breaker and optional hedged fallback
+        self.timeout = float(os.getenv("AI_TIMEOUT_SECONDS", "20"))
+        self.hedged = os.getenv("AI_HEDGED", "0") == "1"
+        # Prompt size control: per-call token budget and map-reduce chunk limit
+        self.max_prompt_tokens = int(os.getenv("AI_MAX_PROMPT_TOKENS", "3000"))
+        self.max_chunks = int(os.getenv("AI_MAX_CHUNKS", "4"))
+        self.repeated_line_threshold = 3
+        
+        self.breaker = CircuitBreaker(
+            int(os.getenv("AI_BREAKER_THRESHOLD", "3")),
+            float(os.getenv("AI_BREAKER_RESET_SECONDS", "60"))
+        )
+        
+        # Gemini calls get their own threads: a call that misses its deadline
+        # keeps its thread until the client returns, and must not tie up the
+        # default executor shared with database queries and OCR
+        self.executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("AI_MAX_THREADS", "8")),
+            thread_name_prefix="gemini"
+        )
+        
         if self.api_key:
             genai.configure(api_key=self.api_key)
             self.model = genai.GenerativeModel('gemini-pro')
@@ -19,25 +121,217 @@ class AIService:
         return self.model is not None and self.api_key is not None
     
     async def analyze_document(self, ocr_text: str) -> Dict:
-        """Analyze document text using Gemini API"""
+        """Analyze document text using Gemini API.
+        
+        The result carries ``analysis_source`` ("gemini" or "fallback") and, for
+        the fallback, a ``fallback_reason``.
+        """
         if not self.is_ready():
             # Fallback to rule-based analysis if API not configured
-            return self._fallback_analysis(ocr_text)
+            return self._record_source(self._fallback_analysis(ocr_text), "fallback", "not_configured")
+        
+        if not self.breaker.allow():
+            # API has been failing: don't make the upload wait on it
+            return self._record_source(self._fallback_analysis(ocr_text), "fallback", "circuit_open")
+        
+        # In hedged mode the fallback is computed while the remote call is in flight
+        hedge = asyncio.create_task(asyncio.to_thread(self._fallback_analysis, ocr_text)) if self.hedged else None
         
         try:
-            prompt = self._create_analysis_prompt(ocr_text)
-            
-            response = self.model.generate_content(prompt)
-            
-            # Parse the response
-            analysis = self._parse_ai_response(response.text)
-            
-            return analysis
+            analysis = await asyncio.wait_for(self._remote_analysis(ocr_text), self.timeout)
+            self.breaker.record_success()
+            if hedge:
+                hedge.cancel()
+            return self._record_source(analysis, "gemini")
+        
+        except asyncio.TimeoutError:
+            print(f"⚠️ AI analysis missed its {self.timeout:g}s deadline")
+            self.breaker.record_failure()
+            reason = "timeout"
+        
+        except AIResponseError as e:
+            # A reply we cannot use counts against the API like an error
+            print(f"⚠️ AI analysis unusable: {str(e)}")
+            self.breaker.record_failure()
+            reason = "parse_error"
         
         except Exception as e:
             print(f"⚠️ AI analysis error: {str(e)}")
-            # Fallback to rule-based analysis
-            return self._fallback_analysis(ocr_text)
+            self.breaker.record_failure()
+            reason = "error"
+        
+        except BaseException:
+            # Cancelled (client gone, shutdown): nothing was learned about the API
+            self.breaker.release_trial()
+            if hedge:
+                hedge.cancel()
+            raise
+        
+        # Fallback to rule-based analysis
+        fallback = await hedge if hedge else self._fallback_analysis(ocr_text)
+        return self._record_source(fallback, "fallback", reason)
+    
+    async def _remote_analysis(self, ocr_text: str) -> Dict:
+        """Ask Gemini for the analysis, map-reducing over chunks of long documents"""
+        chunks = self._chunk_text(self._deduplicate_lines(ocr_text))
+        
+        if len(chunks) == 1:
+            return await self._analyze_chunk(chunks[0], 1, 1)
+        
+        analyses = await asyncio.gather(
+            *(self._analyze_chunk(chunk, i + 1, len(chunks)) for i, chunk in enumerate(chunks))
+        )
+        return self._merge_analyses(list(analyses))
+    
+    async def _analyze_chunk(self, text: str, part: int, parts: int) -> Dict:
+        """Run one Gemini call (the blocking client call runs in a Gemini thread)"""
+        prompt = self._create_analysis_prompt(text)
+        start = time.perf_counter()
+        
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(self.executor, self.model.generate_content, prompt)
+        
+        print(
+            f"🤖 Gemini call {part}/{parts}: prompt {len(prompt)} chars "
+            f"(~{self._estimate_tokens(prompt)} tokens), {time.perf_counter() - start:.2f}s"
+        )
+        
+        # Parse the response
+        return self._parse_ai_response(response.text)
+    
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        """Rough token count (~4 characters per token for English text)"""
+        return len(text) // 4 + 1
+    
+    def _deduplicate_lines(self, text: str) -> str:
+        """Drop repeated page headers/footers, keeping their first occurrence.
+        
+        Only the first and last two lines of each page (blocks separated by a
+        blank line) are candidates, and they are compared with digits masked,
+        so "Page 3 of 12" and "Page 4 of 12" count as the same footer.
+        """
+        pages = [
+            [line.strip() for line in block.split('\n') if line.strip()]
+            for block in re.split(r'\n\s*\n', text)
+        ]
+        pages = [page for page in pages if page]
+        
+        def key(line: str) -> str:
+            return re.sub(r'\d+', '#', line.lower())
+        
+        def edge_positions(page: List[str]) -> set:
+            return set(range(min(2, len(page)))) | set(range(max(0, len(page) - 2), len(page)))
+        
+        counts = {}
+        for page in pages:
+            for position in edge_positions(page):
+                line_key = key(page[position])
+                counts[line_key] = counts.get(line_key, 0) + 1
+        
+        seen = set()
+        kept_pages = []
+        for page in pages:
+            edges = edge_positions(page)
+            kept = []
+            for position, line in enumerate(page):
+                line_key = key(line)
+                if position in edges and counts.get(line_key, 0) >= self.repeated_line_threshold:
+                    if line_key in seen:
+                        continue
+                    seen.add(line_key)
+                kept.append(line)
+            if kept:
+                kept_pages.append('\n'.join(kept))
+        
+        return '\n\n'.join(kept_pages)
+    
+    def _chunk_text(self, text: str) -> List[str]:
+        """Split text into chunks whose full prompts fit AI_MAX_PROMPT_TOKENS"""
+        # ~4 characters per token, less what the prompt template itself takes
+        budget = max(self.max_prompt_tokens * 4 - len(self._create_analysis_prompt("")), 200)
+        
+        chunks, current = [], ""
+        for paragraph in text.split('\n\n'):
+            pieces = [paragraph]
+            if len(paragraph) > budget:
+                # Oversized paragraph: fall back to line, then hard, splits
+                pieces = []
+                for line in paragraph.split('\n'):
+                    pieces.extend(line[i:i + budget] for i in range(0, max(len(line), 1), budget))
+            for piece in pieces:
+                separator = '\n\n' if piece is paragraph else '\n'
+                if current and len(current) + len(separator) + len(piece) > budget:
+                    chunks.append(current)
+                    current = ""
+                current = f"{current}{separator}{piece}" if current else piece
+        if current:
+            chunks.append(current)
+        
+        if len(chunks) > self.max_chunks:
+            dropped = sum(len(chunk) for chunk in chunks[self.max_chunks:])
+            print(f"✂️ Document truncated: {dropped} characters beyond {self.max_chunks} chunks not sent to the model")
+            chunks = chunks[:self.max_chunks]
+        
+        return chunks or [""]
+    
+    def _merge_analyses(self, analyses: List[Dict]) -> Dict:
+        """Reduce per-chunk analyses into one document analysis"""
+        merged = self._get_default_analysis()
+        placeholders = ("", "not specified", "general", "n/a", "none")
+        
+        # Document type: most frequent specific type, earliest chunk wins ties
+        types = [a.get("document_type") for a in analyses if a.get("document_type") not in (None, "", "Other")]
+        if types:
+            merged["document_type"] = max(types, key=lambda t: (types.count(t), -types.index(t)))
+        
+        skills, seen_skills = [], set()
+        achievements, seen_achievements = [], set()
+        for analysis in analyses:
+            for skill in analysis.get("skills", []):
+                if isinstance(skill, str) and skill.strip().lower() not in seen_skills:
+                    seen_skills.add(skill.strip().lower())
+                    skills.append(skill.strip())
+            
+            metadata = analysis.get("metadata", {})
+            for key, value in metadata.items():
+                if key == "key_achievements":
+                    for achievement in value if isinstance(value, list) else [value]:
+                        if isinstance(achievement, str) and achievement.lower() not in seen_achievements:
+                            seen_achievements.add(achievement.lower())
+                            achievements.append(achievement)
+                elif str(merged["metadata"].get(key, "")).strip().lower() in placeholders:
+                    # First chunk that actually states a value wins
+                    if str(value).strip().lower() not in placeholders:
+                        merged["metadata"][key] = value
+        
+        merged["skills"] = skills
+        merged["metadata"]["key_achievements"] = achievements
+        return merged
+    
+    def _record_source(self, analysis: Dict, source: str, reason: str = None) -> Dict:
+        """Record which path produced an analysis (also kept in the stored metadata)"""
+        analysis["analysis_source"] = source
+        metadata = analysis.setdefault("metadata", {})
+        metadata["analysis_source"] = source
+        if reason is not None:
+            analysis["fallback_reason"] = reason
+            metadata["fallback_reason"] = reason
+        return analysis
+    
+    def status(self) -> Dict:
+        """Breaker state and deadline settings for health reporting"""
+        return {
+            "configured": self.is_ready(),
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "timeout_seconds": self.timeout,
+            "hedged": self.hedged
+        }
+    
+    def close(self):
+        """Stop the Gemini threads (calls still running are abandoned)"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
     
     def _create_analysis_prompt(self, text: str) -> str:
         """Create prompt for Gemini API"""
@@ -67,22 +361,40 @@ Important:
 """
     
     def _parse_ai_response(self, response_text: str) -> Dict:
-        """Parse AI response and extract JSON"""
-        try:
-            # Try to find JSON in the response
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            
-            if json_match:
-                json_str = json_match.group(0)
-                analysis = json.loads(json_str)
+        """Parse AI response and extract JSON.
+        
+        The reply is scanned once for top-level ``{...}`` spans (braces inside
+        JSON strings are skipped); the first one that decodes to an object is
+        the analysis, so prose or code fences around it are ignored (an
+        unmatched ``{`` in the prose before it is not). Raises AIResponseError
+        if there is no such object or it has the wrong shape.
+        """
+        for start, end in _object_spans(response_text):
+            try:
+                candidate = json.loads(response_text[start:end])
+            except json.JSONDecodeError:
+                continue
+            if isinstance(candidate, dict):
+                analysis = self._validate_analysis(candidate)
+                if analysis is None:
+                    raise AIResponseError(f"Model reply JSON is not an analysis (keys: {', '.join(list(candidate)[:5])})")
                 return analysis
-            else:
-                # If no JSON found, return default structure
-                return self._get_default_analysis()
         
-        except json.JSONDecodeError:
-            print("⚠️ Could not parse AI response as JSON")
-            return self._get_default_analysis()
+        raise AIResponseError(f"No analysis JSON object in the model reply ({len(response_text)} chars)")
+    
+    def _validate_analysis(self, candidate) -> Optional[Dict]:
+        """Coerce a decoded object into the analysis shape, or None if it isn't one"""
+        if not isinstance(candidate, dict) or not any(key in candidate for key in ("document_type", "skills", "metadata")):
+            return None
+        
+        analysis = self._get_default_analysis()
+        if isinstance(candidate.get("document_type"), str) and candidate["document_type"].strip():
+            analysis["document_type"] = candidate["document_type"].strip()
+        if isinstance(candidate.get("skills"), list):
+            analysis["skills"] = [skill.strip() for skill in candidate["skills"] if isinstance(skill, str) and skill.strip()]
+        if isinstance(candidate.get("metadata"), dict):
+            analysis["metadata"].update(candidate["metadata"])
+        return analysis
     
     def _fallback_analysis(self, text: str) -> Dict:
         """Rule-based fallback analysis when AI is not available"""
@@ -0,0 +1,85 @@
+"""Compare database size and read/write latency for each compression codec.
+
+Usage: python benchmarks/bench_compression.py [num_documents]
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from compression import available_codecs  # noqa: E402
+from database import Database, DocumentRecord  # noqa: E402
+
+WORDS = (
+    "certificate of completion this is to certify that has successfully completed the course "
+    "python machine learning data science university institute grade semester credits "
+    "internship project training workshop participation award excellence department"
+).split()
+
+
+def make_records(num_documents: int):
+    rng = random.Random(1)
+    records = []
+    for i in range(num_documents):
+        # Multi-page transcript-like text with repeated headers
+        pages = []
+        for page in range(rng.randint(1, 6)):
+            header = "INDIAN INSTITUTE OF TECHNOLOGY - OFFICIAL TRANSCRIPT"
+            body = " ".join(rng.choice(WORDS) for _ in range(rng.randint(150, 400)))
+            pages.append(f"{header}\nPage {page + 1}\n{body}")
+        jobs = [
+            {"id": j, "match_score": round(rng.random() * 100, 1), "matching_skills": rng.randint(1, 4)}
+            for j in rng.sample(range(1, 21), 5)
+        ]
+        records.append(DocumentRecord(
+            username=f"user{i % 50}",
+            original_filename=f"doc{i}.pdf",
+            file_path=f"uploads/user{i % 50}/doc{i}.pdf",
+            ocr_text="\n\n".join(pages),
+            document_type="Academic Transcript",
+            skills=json.dumps(["Python", "Machine Learning", "Data Science"]),
+            metadata=json.dumps({
+                "institution": "Indian Institute of Technology",
+                "duration": "2019-2023",
+                "grade_or_score": "8.7 CGPA",
+                "field_of_study": "Computer Science",
+                "key_achievements": ["Dean's list"] * 3
+            }),
+            job_recommendations=json.dumps(jobs),
+            timestamp="2024-01-01T00:00:00"
+        ))
+    return records
+
+
+def main():
+    num_documents = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    records = make_records(num_documents)
+    rng = random.Random(2)
+    lookups = [rng.randint(1, num_documents) for _ in range(2000)]
+
+    print(f"{'codec':<6} {'file MB':>8} {'insert s':>9} {'get_by_id ms':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for codec in available_codecs():
+            path = os.path.join(tmp, f"{codec}.db")
+            db = Database(path, compression=codec)
+            db.init_db()
+
+            start = time.perf_counter()
+            for i in range(0, len(records), 500):
+                db.insert_documents(records[i:i + 500])
+            insert_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for doc_id in lookups:
+                db.get_document_by_id(doc_id)
+            lookup_ms = (time.perf_counter() - start) / len(lookups) * 1000
+
+            print(f"{codec:<6} {os.path.getsize(path) / 1e6:>8.1f} {insert_seconds:>9.2f} {lookup_ms:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
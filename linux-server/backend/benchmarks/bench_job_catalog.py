@@ -0,0 +1,76 @@
+"""Measure job catalog load time, memory footprint and match latency.
+
+Usage: python benchmarks/bench_job_catalog.py [num_jobs]
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from job_matcher import JobMatcher  # noqa: E402
+
+
+def make_catalog(path: str, num_jobs: int, vocabulary_size: int = 2000):
+    rng = random.Random(42)
+    vocabulary = [f"skill-{i}" for i in range(vocabulary_size)]
+    jobs = [
+        {
+            "id": i,
+            "title": f"Job {i}",
+            "company": f"Company {i % 500}",
+            "location": "Remote",
+            "type": "Full-time",
+            "experience": "1-3 years",
+            "salary": "₹8-12 LPA",
+            "required_skills": rng.sample(vocabulary, rng.randint(3, 8)),
+            "description": "Synthetic posting for benchmarking.",
+            "posted_date": "1 day ago"
+        }
+        for i in range(1, num_jobs + 1)
+    ]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(jobs, f)
+    return vocabulary
+
+
+def main():
+    num_jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "jobs.json")
+        vocabulary = make_catalog(path, num_jobs)
+        print(f"Catalog file: {os.path.getsize(path) / 1e6:.1f} MB, {num_jobs} jobs")
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        matcher = JobMatcher(catalog_path=path)
+        load_seconds = time.perf_counter() - start
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"Load + index: {load_seconds:.2f}s, resident {current / 1e6:.1f} MB, peak {peak / 1e6:.1f} MB")
+
+        rng = random.Random(7)
+        queries = [rng.sample(vocabulary, 6) for _ in range(200)]
+        start = time.perf_counter()
+        for skills in queries:
+            matcher.recommend(skills)
+        cold = (time.perf_counter() - start) / len(queries)
+        start = time.perf_counter()
+        for skills in queries:
+            matcher.recommend(skills)
+        warm = (time.perf_counter() - start) / len(queries)
+        print(f"recommend(): {cold * 1000:.2f} ms cold, {warm * 1000:.3f} ms cached")
+
+        batch_queries = [rng.sample(vocabulary, 6) for _ in range(200)]
+        start = time.perf_counter()
+        matcher.recommend_batch(batch_queries)
+        batch = (time.perf_counter() - start) / len(batch_queries)
+        print(f"recommend_batch(): {batch * 1000:.2f} ms per document (batch of {len(batch_queries)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Track process RSS while extracting text from a long generated PDF.
+
+Memory should stay flat as pages are processed: only one page and its
+rendered buffers are alive at a time.
+
+Usage: python benchmarks/bench_pdf_memory.py [num_pages] [--scanned]
+
+--scanned makes every page an image so each one goes through EasyOCR
+(slow; loads the OCR model). Without it pages carry a text layer.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from contextlib import closing
+
+import fitz
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from memory_guard import current_rss_mb  # noqa: E402
+from ocr_service import OCRService  # noqa: E402
+
+LINES = [
+    "OFFICIAL TRANSCRIPT - INSTITUTE OF TECHNOLOGY",
+    "Course: Machine Learning and Data Science      Grade: A",
+    "Course: Database Systems with PostgreSQL        Grade: A-",
+    "Course: Cloud Computing on AWS and Docker       Grade: B+",
+    "This is to certify that the student has successfully completed the program.",
+]
+
+
+def make_pdf(path: str, num_pages: int, scanned: bool):
+    with fitz.open() as pdf:
+        for page_num in range(num_pages):
+            page = pdf.new_page()
+            for i, line in enumerate(LINES * 6):
+                page.insert_text((50, 60 + i * 22), f"{line} ({page_num + 1})", fontsize=11)
+            if scanned:
+                # Replace the text layer with a rendered image of the page
+                pix = page.get_pixmap(matrix=fitz.Matrix(1.5, 1.5))
+                rect = page.rect
+                pdf.delete_page(page_num)
+                page = pdf.new_page(width=rect.width, height=rect.height)
+                page.insert_image(rect, pixmap=pix)
+                pix = None
+        pdf.save(path, garbage=3, deflate=True)
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    num_pages = int(args[0]) if args else 500
+    scanned = "--scanned" in sys.argv
+
+    service = OCRService()
+    if scanned:
+        asyncio.run(service.initialize())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "long.pdf")
+        make_pdf(pdf_path, num_pages, scanned)
+        print(f"{num_pages} {'scanned' if scanned else 'text'} pages, "
+              f"{os.path.getsize(pdf_path) / 1024 / 1024:.1f} MB on disk")
+
+        baseline = current_rss_mb()
+        print(f"RSS before extraction: {baseline:.1f} MB")
+        print(f"{'pages':>6} {'rss MB':>8} {'delta MB':>9} {'s/page':>7}")
+
+        step = max(1, num_pages // 10)
+        samples = []
+        chars = 0
+        start = time.perf_counter()
+        with closing(service.iter_pdf_pages(pdf_path)) as pages:
+            for page_num, text in enumerate(pages, 1):
+                chars += len(text)
+                if page_num % step == 0 or page_num == num_pages:
+                    rss = current_rss_mb()
+                    samples.append(rss)
+                    elapsed = time.perf_counter() - start
+                    print(f"{page_num:>6} {rss:>8.1f} {rss - baseline:>9.1f} {elapsed / page_num:>7.3f}")
+
+        # Flat memory: the second half of the run should not grow past the first
+        first_half = max(samples[:len(samples) // 2] or samples)
+        print(f"\nExtracted {chars:,} characters")
+        print(f"Peak RSS {max(samples):.1f} MB; growth over second half {max(samples) - first_half:+.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Compare JSON serialization time and bytes on the wire for API payloads.
+
+"default" is what FastAPI does for a returned dict (jsonable_encoder, then
+json.dumps); "orjson" is FastJSONResponse returned directly. Sizes are
+shown raw, gzip-compressed and (if installed) brotli-compressed.
+
+Usage: python benchmarks/bench_responses.py [rounds]
+"""
+import json
+import os
+import random
+import sys
+import time
+import zlib
+
+from fastapi.encoders import jsonable_encoder
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from http_compression import brotli  # noqa: E402
+from job_matcher import JobMatcher  # noqa: E402
+from responses import FastJSONResponse, orjson  # noqa: E402
+
+WORDS = (
+    "certificate of completion this is to certify that has successfully completed the course "
+    "python machine learning data science university institute grade semester credits"
+).split()
+
+
+def make_document(rng: random.Random, matcher: JobMatcher, doc_id: int) -> dict:
+    skills = rng.sample(["python", "sql", "machine learning", "react", "aws", "docker", "java", "excel"], 4)
+    return {
+        "id": doc_id,
+        "username": f"user{doc_id % 20}",
+        "original_filename": f"certificate_{doc_id}.pdf",
+        "file_path": f"uploads/ab/cd/{doc_id:032x}_certificate_{doc_id}.pdf",
+        "ocr_text": " ".join(rng.choice(WORDS) for _ in range(1200)),
+        "document_type": "Course Certificate",
+        "skills": skills,
+        "metadata": {"institution": "Coursera", "duration": "6 weeks", "analysis_source": "gemini"},
+        "job_recommendations": matcher.hydrate(matcher.recommend(skills)),
+        "timestamp": "2026-01-15T10:30:00",
+        "created_at": "2026-01-15 10:30:01"
+    }
+
+
+def make_payloads(matcher: JobMatcher) -> dict:
+    rng = random.Random(7)
+    documents = [make_document(rng, matcher, i) for i in range(1, 201)]
+    summary_keys = ("id", "username", "original_filename", "document_type", "timestamp", "created_at")
+    return {
+        "GET /documents (500 rows)": {
+            "status": "success",
+            "count": 500,
+            "documents": [{key: documents[i % 200][key] for key in summary_keys} for i in range(500)]
+        },
+        "GET /documents/{id}": {"status": "success", "document": documents[0]},
+        "POST /upload (10 files)": {"results": [
+            {
+                "filename": doc["original_filename"],
+                "status": "success",
+                "document_id": doc["id"],
+                "data": {
+                    "document_type": doc["document_type"],
+                    "skills": doc["skills"],
+                    "metadata": doc["metadata"],
+                    "job_recommendations": doc["job_recommendations"],
+                    "ocr_preview": doc["ocr_text"][:500] + "..."
+                }
+            }
+            for doc in documents[:10]
+        ]},
+    }
+
+
+def default_render(payload) -> bytes:
+    return json.dumps(
+        jsonable_encoder(payload), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def fast_render(payload) -> bytes:
+    return FastJSONResponse(payload).body
+
+
+def timed(func, payload, rounds: int):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        result = func(payload)
+    return (time.perf_counter() - start) / rounds * 1000, result
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    matcher = JobMatcher()
+    print(f"orjson: {'yes' if orjson else 'no'}, brotli: {'yes' if brotli else 'no'}\n")
+    print(f"{'payload':<34} {'default ms':>10} {'orjson ms':>10} {'raw KB':>8} {'gzip KB':>8} {'gzip ms':>8} {'br KB':>7} {'br ms':>6}")
+
+    for name, payload in make_payloads(matcher).items():
+        default_ms, _ = timed(default_render, payload, rounds)
+        fast_ms, body = timed(fast_render, payload, rounds)
+        gzip_ms, gzipped = timed(lambda data: zlib.compress(data, 6), body, rounds)
+        row = f"{name:<34} {default_ms:>10.2f} {fast_ms:>10.2f} {len(body) / 1024:>8.1f} {len(gzipped) / 1024:>8.1f} {gzip_ms:>8.2f}"
+        if brotli:
+            br_ms, compressed = timed(lambda data: brotli.compress(data, quality=4), body, rounds)
+            row += f" {len(compressed) / 1024:>7.1f} {br_ms:>6.2f}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+"""Offline bulk importer for backfilling archives of documents.
+
+Walks a directory tree and runs every PDF/JPG/PNG through the same OCR, AI
+analysis and job matching pipeline as ``/upload``, without going through HTTP.
+OCR and analysis run across a process pool; rows are inserted in large
+transactions into the same store as the API (PostgreSQL when DATABASE_URL is
+set, otherwise SQLite). Progress is recorded in a JSON Lines manifest so an
+interrupted import can simply be re-run with the same arguments. If a worker
+process dies, the files the pool held are recorded as failed and the pool is
+restarted.
+
+Usage:
+    python bulk_import.py /archive/certificates --username archive --workers 4
+    python bulk_import.py /archive/by-user --username-from-dir
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set
+
+from database import DocumentRecord
+from document_store import DocumentStore, SQLiteDocumentStore, create_document_store
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.jpg', '.jpeg', '.png')
+
+# Per-process services, created once by the pool initializer
+_worker = {}
+
+
+def _init_worker():
+    """Load OCR and AI services once per worker process"""
+    from ocr_service import OCRService
+    from ai_service import AIService
+
+    loop = asyncio.new_event_loop()
+    ocr_service = OCRService()
+    loop.run_until_complete(ocr_service.initialize())
+    _worker.update(loop=loop, ocr=ocr_service, ai=AIService())
+
+
+def _process_file(file_path: str) -> Dict:
+    """OCR, analyze and fingerprint one file inside a worker process"""
+    from dedup import file_digest, simhash, to_hex
+
+    loop = _worker["loop"]
+    try:
+        ocr_text = loop.run_until_complete(_worker["ocr"].extract_text(file_path))
+        if not ocr_text or len(ocr_text.strip()) < 10:
+            return {"path": file_path, "error": "Could not extract sufficient text from document"}
+
+        analysis = loop.run_until_complete(_worker["ai"].analyze_document(ocr_text))
+        # Same fingerprints as /upload, so later uploads are checked against imported documents
+        fingerprint = {
+            "content_hash": file_digest(file_path),
+            "image_hash": to_hex(_worker["ocr"].image_hash(file_path)),
+            "text_hash": to_hex(simhash(ocr_text))
+        }
+        return {"path": file_path, "ocr_text": ocr_text, "analysis": analysis, "fingerprint": fingerprint}
+    except Exception as e:
+        return {"path": file_path, "error": str(e)}
+
+
+class Manifest:
+    """Append-only JSON Lines log of import progress.
+
+    A batch is logged as ``pending`` before its transaction and ``done`` after
+    it commits. On resume, files of a pending batch are checked against the
+    database, so a crash between commit and log never duplicates rows.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.done: Set[str] = set()
+        self.failed: Set[str] = set()
+        self.next_batch = 0
+        self._pending: Dict[int, List[str]] = {}
+
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        self._replay(json.loads(line))
+
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def _replay(self, entry: Dict):
+        status = entry["status"]
+        if status == "pending":
+            self._pending[entry["batch"]] = entry["files"]
+            self.next_batch = max(self.next_batch, entry["batch"] + 1)
+        elif status == "done":
+            self.done.update(self._pending.pop(entry["batch"], []))
+        elif status == "failed":
+            self.failed.add(entry["file"])
+
+    async def recover(self, db: DocumentStore):
+        """Settle batches that were pending when the previous run crashed"""
+        for batch, files in list(self._pending.items()):
+            committed = await db.get_existing_file_paths(files)
+            self.done.update(committed)
+            self._write({"batch": batch, "status": "done"})
+            del self._pending[batch]
+
+    def begin_batch(self, files: List[str]) -> int:
+        batch = self.next_batch
+        self.next_batch += 1
+        self._write({"batch": batch, "status": "pending", "files": files})
+        return batch
+
+    def end_batch(self, batch: int, files: List[str]):
+        self._write({"batch": batch, "status": "done"})
+        self.done.update(files)
+
+    def record_failure(self, file_path: str, error: str):
+        self._write({"file": file_path, "status": "failed", "error": error})
+        self.failed.add(file_path)
+
+    def _write(self, entry: Dict):
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+def iter_files(root: Path) -> Iterator[Path]:
+    """Yield supported documents under root in a stable order"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.lower().endswith(SUPPORTED_EXTENSIONS):
+                yield Path(dirpath) / filename
+
+
+class BulkImporter:
+    # Give up once the pool breaks this many times in a row without finishing a file
+    MAX_IDLE_RESTARTS = 3
+
+    def __init__(
+        self,
+        db: DocumentStore,
+        manifest: Manifest,
+        root: Path,
+        username: Optional[str],
+        workers: int,
+        batch_size: int,
+        retry_failed: bool = False
+    ):
+        from job_matcher import JobMatcher
+
+        self.db = db
+        self.manifest = manifest
+        self.root = root
+        self.username = username
+        self.workers = workers
+        self.batch_size = batch_size
+        self.retry_failed = retry_failed
+        self.job_matcher = JobMatcher()
+
+        self.imported = 0
+        self.failed = 0
+        self.skipped = 0
+        self._batch: List[Dict] = []
+        self._started = time.perf_counter()
+        self._completed = 0
+        self._completed_at_restart = 0
+        self._idle_restarts = 0
+
+    def _username_for(self, path: Path) -> str:
+        if self.username:
+            return self.username
+        # --username-from-dir: first directory below the root
+        relative = path.relative_to(self.root)
+        return relative.parts[0] if len(relative.parts) > 1 else "archive"
+
+    def _pending_files(self) -> Iterator[str]:
+        for path in iter_files(self.root):
+            file_path = str(path.resolve())
+            if file_path in self.manifest.done or (file_path in self.manifest.failed and not self.retry_failed):
+                self.skipped += 1
+                continue
+            yield file_path
+
+    async def run(self):
+        files = self._pending_files()
+        max_in_flight = self.workers * 4
+        loop = asyncio.get_running_loop()
+        pool = self._start_pool()
+        in_flight: Dict[asyncio.Future, str] = {}
+
+        try:
+            for file_path in files:
+                try:
+                    in_flight[loop.run_in_executor(pool, _process_file, file_path)] = file_path
+                except BrokenProcessPool:
+                    # Broke since the last wait: everything it still holds has failed
+                    await self._settle(in_flight)
+                    pool = self._restart_pool(pool)
+                    in_flight[loop.run_in_executor(pool, _process_file, file_path)] = file_path
+
+                if len(in_flight) >= max_in_flight and await self._settle(in_flight, asyncio.FIRST_COMPLETED):
+                    await self._settle(in_flight)
+                    pool = self._restart_pool(pool)
+
+            while in_flight:
+                await self._settle(in_flight, asyncio.FIRST_COMPLETED)
+        finally:
+            pool.shutdown()
+
+        await self._flush()
+        self._report(final=True)
+
+    def _start_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+
+    def _restart_pool(self, pool: ProcessPoolExecutor) -> ProcessPoolExecutor:
+        """Replace a pool whose worker died (e.g. killed by the OOM killer)"""
+        pool.shutdown()
+        if self._completed == self._completed_at_restart:
+            self._idle_restarts += 1
+            if self._idle_restarts >= self.MAX_IDLE_RESTARTS:
+                raise BrokenProcessPool(
+                    f"Worker pool broke {self._idle_restarts} times in a row without finishing a file"
+                )
+        else:
+            self._idle_restarts = 0
+        self._completed_at_restart = self._completed
+
+        print("⚠️ A worker process died; restarting the pool")
+        return self._start_pool()
+
+    async def _settle(self, in_flight: Dict[asyncio.Future, str], return_when=asyncio.ALL_COMPLETED) -> bool:
+        """Collect finished files; True if the pool broke under any of them.
+
+        A broken pool fails every file it held, and those are recorded as
+        failed in the manifest (re-run with --retry-failed to try again).
+        """
+        if not in_flight:
+            return False
+        finished, _ = await asyncio.wait(in_flight, return_when=return_when)
+
+        broken = False
+        for future in finished:
+            file_path = in_flight.pop(future)
+            try:
+                result = future.result()
+                self._completed += 1
+            except BrokenProcessPool as e:
+                broken = True
+                result = {"path": file_path, "error": f"Worker process died: {e}"}
+            await self._collect(result)
+        return broken
+
+    async def _collect(self, result: Dict):
+        if "error" in result:
+            print(f"❌ {result['path']}: {result['error']}")
+            self.manifest.record_failure(result["path"], result["error"])
+            self.failed += 1
+            return
+
+        self._batch.append(result)
+        if len(self._batch) >= self.batch_size:
+            await self._flush()
+
+    async def _flush(self):
+        """Match jobs for the batch and insert it in one transaction"""
+        if not self._batch:
+            return
+
+        batch, self._batch = self._batch, []
+        recommendations = self.job_matcher.recommend_batch(
+            [result["analysis"].get("skills", []) for result in batch]
+        )
+
+        records = []
+        for result, recs in zip(batch, recommendations):
+            path = Path(result["path"])
+            analysis = result["analysis"]
+            records.append(DocumentRecord(
+                username=self._username_for(path),
+                original_filename=path.name,
+                file_path=result["path"],
+                ocr_text=result["ocr_text"],
+                document_type=analysis.get("document_type", "Unknown"),
+                skills=json.dumps(analysis.get("skills", [])),
+                metadata=json.dumps(analysis.get("metadata", {})),
+                job_recommendations=json.dumps(recs),
+                timestamp=datetime.now().isoformat(),
+                **result["fingerprint"]
+            ))
+
+        files = [result["path"] for result in batch]
+        batch_id = self.manifest.begin_batch(files)
+        await self.db.insert_documents(records)
+        self.manifest.end_batch(batch_id, files)
+
+        self.imported += len(records)
+        self._report()
+
+    def _report(self, final: bool = False):
+        elapsed = time.perf_counter() - self._started
+        rate = self.imported / elapsed if elapsed > 0 else 0.0
+        prefix = "✅ Import finished:" if final else "📥"
+        print(
+            f"{prefix} {self.imported} imported, {self.failed} failed, {self.skipped} skipped "
+            f"in {elapsed:.0f}s ({rate:.2f} docs/s, {rate * 3600:.0f} docs/h)"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import an archive of documents")
+    parser.add_argument("root", help="Directory tree to import")
+    owner = parser.add_mutually_exclusive_group(required=True)
+    owner.add_argument("--username", help="Username to assign to every imported document")
+    owner.add_argument("--username-from-dir", action="store_true",
+                       help="Use the first directory below root as the username")
+    parser.add_argument("--db", help="SQLite database path (default: DATABASE_URL if set, else DATABASE_PATH)")
+    parser.add_argument("--manifest", help="Progress manifest (default: <db>.import-manifest.jsonl, "
+                                           "or import-manifest.jsonl for PostgreSQL)")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="OCR worker processes (each loads its own EasyOCR model)")
+    parser.add_argument("--batch-size", type=int, default=200, help="Documents per insert transaction")
+    parser.add_argument("--retry-failed", action="store_true", help="Retry files that failed in earlier runs")
+    args = parser.parse_args()
+
+    root = Path(args.root).resolve()
+    if not root.is_dir():
+        parser.error(f"Not a directory: {root}")
+
+    asyncio.run(import_archive(args, root))
+
+
+async def import_archive(args, root: Path):
+    db = create_document_store(args.db)
+    await db.init_db()
+    default_manifest = f"{db.db.db_path}.import-manifest.jsonl" if isinstance(db, SQLiteDocumentStore) else "import-manifest.jsonl"
+    manifest = Manifest(args.manifest or default_manifest)
+
+    try:
+        await manifest.recover(db)
+        print(f"📂 Importing {root} into {db.backend} ({len(manifest.done)} files already imported)")
+        await BulkImporter(
+            db, manifest, root,
+            username=args.username,
+            workers=max(1, args.workers),
+            batch_size=max(1, args.batch_size),
+            retry_failed=args.retry_failed
+        ).run()
+    finally:
+        manifest.close()
+        await db.close()
+
+
+if __name__ == "__main__":
+    main()
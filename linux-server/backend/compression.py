@@ -0,0 +1,91 @@
+"""Transparent compression for large text columns.
+
+Compressed values are stored as BLOBs with a short codec prefix; anything
+else (plain TEXT from older rows or values below the size threshold) is
+returned unchanged, so compressed and uncompressed rows can coexist.
+"""
+import threading
+import zlib
+from typing import Optional, Union
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional
+    zstandard = None
+
+PREFIXES = {
+    "zlib": b"zl1:",
+    "zstd": b"zs1:",
+}
+
+# Values shorter than this are not worth compressing
+DEFAULT_MIN_BYTES = 256
+
+# zstandard (de)compressor objects must not be shared between threads, and
+# database calls run in worker threads, so each thread gets its own pair
+_zstd_local = threading.local()
+
+
+def _zstd_compressor():
+    compressor = getattr(_zstd_local, "compressor", None)
+    if compressor is None:
+        compressor = _zstd_local.compressor = zstandard.ZstdCompressor(level=3)
+    return compressor
+
+
+def _zstd_decompressor():
+    decompressor = getattr(_zstd_local, "decompressor", None)
+    if decompressor is None:
+        decompressor = _zstd_local.decompressor = zstandard.ZstdDecompressor()
+    return decompressor
+
+
+def available_codecs() -> list:
+    codecs = ["none", "zlib"]
+    if zstandard:
+        codecs.append("zstd")
+    return codecs
+
+
+def check_codec(codec: str) -> str:
+    """Validate a codec name, raising ValueError if it cannot be used here"""
+    codec = (codec or "none").lower()
+    if codec not in ("none", "zlib", "zstd"):
+        raise ValueError(f"Unknown compression codec: {codec}")
+    if codec == "zstd" and zstandard is None:
+        raise ValueError("zstd compression requires the 'zstandard' package")
+    return codec
+
+
+def compress_text(value: Optional[str], codec: str, min_bytes: int = DEFAULT_MIN_BYTES) -> Union[str, bytes, None]:
+    """Compress a text value for storage (returns it unchanged when not worthwhile)"""
+    if value is None or codec == "none":
+        return value
+
+    raw = value.encode("utf-8")
+    if len(raw) < min_bytes:
+        return value
+
+    if codec == "zstd":
+        payload = _zstd_compressor().compress(raw)
+    else:
+        payload = zlib.compress(raw, 6)
+
+    if len(payload) + len(PREFIXES[codec]) >= len(raw):
+        return value
+    return PREFIXES[codec] + payload
+
+
+def decompress_text(value: Union[str, bytes, memoryview, None]) -> Optional[str]:
+    """Decode a stored value back to text, whatever codec (if any) it was written with"""
+    if value is None or isinstance(value, str):
+        return value
+
+    value = bytes(value)
+    if value.startswith(PREFIXES["zlib"]):
+        return zlib.decompress(value[len(PREFIXES["zlib"]):]).decode("utf-8")
+    if value.startswith(PREFIXES["zstd"]):
+        if zstandard is None:
+            raise ValueError("Row is zstd-compressed but the 'zstandard' package is not installed")
+        return _zstd_decompressor().decompress(value[len(PREFIXES["zstd"]):]).decode("utf-8")
+    return value.decode("utf-8")
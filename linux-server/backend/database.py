@@ -1,9 +1,15 @@
 import sqlite3
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterator, Optional, Sequence
 from dataclasses import dataclass
 import json
+import os
 from datetime import datetime
 
+from compression import check_codec, compress_text, decompress_text
+
+# Large columns that are stored compressed when DB_COMPRESSION is enabled
+COMPRESSED_COLUMNS = ("ocr_text", "metadata", "job_recommendations")
+
 
 @dataclass
 class DocumentRecord:
@@ -17,11 +23,20 @@ class DocumentRecord:
     job_recommendations: str  # JSON string
     timestamp: str
     id: Optional[int] = None
+    # Duplicate detection fingerprints (see dedup.py); hashes are hex strings
+    content_hash: Optional[str] = None
+    image_hash: Optional[str] = None
+    text_hash: Optional[str] = None
 
 
 class Database:
-    def __init__(self, db_path: str = "documents.db"):
+    def __init__(self, db_path: str = "documents.db", compression: Optional[str] = None):
         self.db_path = db_path
+        self.compression = check_codec(compression or os.getenv("DB_COMPRESSION", "none"))
+    
+    def _compress(self, value: Optional[str]):
+        """Encode a large text column with the configured codec"""
+        return compress_text(value, self.compression)
         
     def get_connection(self):
         """Get database connection"""
@@ -59,6 +74,31 @@ class Database:
             CREATE INDEX IF NOT EXISTS idx_timestamp ON documents(timestamp)
         """)
         
+        # Columns added after the initial schema
+        existing_columns = {row['name'] for row in cursor.execute("PRAGMA table_info(documents)")}
+        for column in ("file_removed_at", "content_hash", "image_hash", "text_hash"):
+            if column not in existing_columns:
+                cursor.execute(f"ALTER TABLE documents ADD COLUMN {column} TEXT")
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_username_content_hash ON documents(username, content_hash)
+        """)
+        
+        # Checkpoints for batch re-analysis / re-matching jobs
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS reprocess_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                params TEXT NOT NULL,
+                status TEXT NOT NULL,
+                last_document_id INTEGER DEFAULT 0,
+                processed INTEGER DEFAULT 0,
+                failed INTEGER DEFAULT 0,
+                error TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
         conn.commit()
         conn.close()
         print("✅ Database initialized")
@@ -71,18 +111,22 @@ class Database:
         cursor.execute("""
             INSERT INTO documents (
                 username, original_filename, file_path, ocr_text,
-                document_type, skills, metadata, job_recommendations, timestamp
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                document_type, skills, metadata, job_recommendations, timestamp,
+                content_hash, image_hash, text_hash
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
             record.username,
             record.original_filename,
             record.file_path,
-            record.ocr_text,
+            self._compress(record.ocr_text),
             record.document_type,
             record.skills,
-            record.metadata,
-            record.job_recommendations,
-            record.timestamp
+            self._compress(record.metadata),
+            self._compress(record.job_recommendations),
+            record.timestamp,
+            record.content_hash,
+            record.image_hash,
+            record.text_hash
         ))
         
         doc_id = cursor.lastrowid
@@ -91,6 +135,64 @@ class Database:
         
         return doc_id
     
+    def insert_documents(self, records: List[DocumentRecord]) -> int:
+        """Insert many document records in a single transaction"""
+        if not records:
+            return 0
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.executemany("""
+                INSERT INTO documents (
+                    username, original_filename, file_path, ocr_text,
+                    document_type, skills, metadata, job_recommendations, timestamp,
+                    content_hash, image_hash, text_hash
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [
+                (
+                    record.username,
+                    record.original_filename,
+                    record.file_path,
+                    self._compress(record.ocr_text),
+                    record.document_type,
+                    record.skills,
+                    self._compress(record.metadata),
+                    self._compress(record.job_recommendations),
+                    record.timestamp,
+                    record.content_hash,
+                    record.image_hash,
+                    record.text_hash
+                )
+                for record in records
+            ])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        
+        return len(records)
+    
+    def get_existing_file_paths(self, file_paths: List[str]) -> set:
+        """Return which of the given file paths already have a document row"""
+        if not file_paths:
+            return set()
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            f"SELECT file_path FROM documents WHERE file_path IN ({','.join('?' for _ in file_paths)})",
+            file_paths
+        )
+        existing = {row['file_path'] for row in cursor.fetchall()}
+        conn.close()
+        
+        return existing
+    
     def get_all_documents(self, username: Optional[str] = None) -> List[Dict]:
         """Get all documents, optionally filtered by username"""
         conn = self.get_connection()
@@ -117,6 +219,40 @@ class Database:
         
         return [dict(row) for row in rows]
     
+    def get_document_hashes(self, username: str) -> List[Dict]:
+        """Duplicate detection fingerprints of a user's documents"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT id, content_hash, image_hash, text_hash
+            FROM documents
+            WHERE username = ?
+              AND (content_hash IS NOT NULL OR image_hash IS NOT NULL OR text_hash IS NOT NULL)
+        """, (username,))
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [dict(row) for row in rows]
+    
+    def get_ocr_texts(self, doc_ids: List[int]) -> Dict[int, str]:
+        """OCR text of the given documents, by id (missing ids are left out)"""
+        if not doc_ids:
+            return {}
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            f"SELECT id, ocr_text FROM documents WHERE id IN ({','.join('?' for _ in doc_ids)})",
+            list(doc_ids)
+        )
+        texts = {row['id']: decompress_text(row['ocr_text']) or "" for row in cursor.fetchall()}
+        conn.close()
+        
+        return texts
+    
     def get_document_by_id(self, doc_id: int) -> Optional[Dict]:
         """Get detailed document information by ID"""
         conn = self.get_connection()
@@ -130,27 +266,344 @@ class Database:
         conn.close()
         
         if row:
-            doc = dict(row)
-            # Parse JSON fields
-            doc['skills'] = json.loads(doc['skills']) if doc['skills'] else []
-            doc['metadata'] = json.loads(doc['metadata']) if doc['metadata'] else {}
-            doc['job_recommendations'] = json.loads(doc['job_recommendations']) if doc['job_recommendations'] else []
-            return doc
+            return self._row_to_document(row)
+        
+        return None
+    
+    def _row_to_document(self, row: sqlite3.Row) -> Dict:
+        """Decompress and parse the stored columns of a documents row"""
+        return parse_document_row(dict(row))
+    
+    @staticmethod
+    def _selection_filter(
+        ids: Optional[List[int]] = None,
+        username: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        required: bool = True
+    ):
+        """Build a WHERE clause selecting documents by ids, user and/or date range"""
+        clauses, params = [], []
+        if ids is not None:
+            if not ids:
+                raise ValueError("No documents selected (ids is empty)")
+            clauses.append(f"id IN ({','.join('?' for _ in ids)})")
+            params.extend(ids)
+        if username:
+            clauses.append("username = ?")
+            params.append(username)
+        if date_from:
+            clauses.append("timestamp >= ?")
+            params.append(date_from)
+        if date_to:
+            clauses.append("timestamp < ?")
+            params.append(date_to)
+        if not clauses:
+            if required:
+                raise ValueError("Select documents by ids, username and/or date range")
+            return "1 = 1", params
+        return " AND ".join(clauses), params
+    
+    def get_documents(self, **selection) -> List[Dict]:
+        """Get full documents matching a selection (see _selection_filter)"""
+        where, params = self._selection_filter(**selection)
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute(f"SELECT * FROM documents WHERE {where} ORDER BY id", params)
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [self._row_to_document(row) for row in rows]
+    
+    def iter_documents(
+        self,
+        columns: Optional[List[str]] = None,
+        batch_size: int = 500,
+        **selection
+    ) -> Iterator[Dict]:
+        """Stream documents in id order through a cursor, batch_size rows at a time.
+        
+        Selection filters are optional here (no filter exports everything).
+        The connection may be advanced from different threads (e.g. by a
+        streaming HTTP response), but never concurrently.
+        """
+        select = ", ".join(columns) if columns else "*"
+        where, params = self._selection_filter(**selection, required=False)
+        
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        try:
+            cursor = conn.execute(f"SELECT {select} FROM documents WHERE {where} ORDER BY id", params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield self._row_to_document(row)
+        finally:
+            conn.close()
+    
+    def delete_documents(self, **selection) -> List[str]:
+        """Delete all documents matching a selection in one transaction.
+        
+        Returns the file paths of the deleted documents so their originals can
+        be removed afterwards.
+        """
+        where, params = self._selection_filter(**selection)
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            # BEGIN IMMEDIATE so no row can slip in between the SELECT and the DELETE
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute(f"SELECT file_path FROM documents WHERE {where}", params)
+            file_paths = [row['file_path'] for row in cursor.fetchall()]
+            cursor.execute(f"DELETE FROM documents WHERE {where}", params)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        
+        return file_paths
+    
+    def get_documents_for_reprocessing(
+        self,
+        after_id: int,
+        limit: int,
+        document_ids: Optional[List[int]] = None,
+        username: Optional[str] = None
+    ) -> List[Dict]:
+        """Get the next chunk of documents (ordered by id) to reprocess"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        query = "SELECT id, ocr_text, skills, metadata FROM documents WHERE id > ?"
+        params: list = [after_id]
+        
+        if document_ids:
+            query += f" AND id IN ({','.join('?' for _ in document_ids)})"
+            params.extend(document_ids)
+        if username:
+            query += " AND username = ?"
+            params.append(username)
+        
+        query += " ORDER BY id LIMIT ?"
+        params.append(limit)
+        
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [self._row_to_document(row) for row in rows]
+    
+    def bulk_update_documents(self, updates: List[Dict], checkpoint: Optional[Dict] = None) -> int:
+        """Update analysis fields of many documents in a single transaction.
+        
+        Each update is a dict with an ``id`` plus any of ``document_type``,
+        ``skills``, ``metadata`` and ``job_recommendations`` (JSON strings).
+        If ``checkpoint`` is given (``job_id`` plus reprocess job columns) it is
+        written in the same transaction, so a crash never loses or repeats a chunk.
+        """
+        if not updates and not checkpoint:
+            return 0
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        updated = 0
+        
+        try:
+            for update in updates:
+                fields = [key for key in ("document_type", "skills", "metadata", "job_recommendations") if key in update]
+                if not fields:
+                    continue
+                assignments = ", ".join(f"{field} = ?" for field in fields)
+                cursor.execute(
+                    f"UPDATE documents SET {assignments} WHERE id = ?",
+                    [
+                        self._compress(update[field]) if field in COMPRESSED_COLUMNS else update[field]
+                        for field in fields
+                    ] + [update["id"]]
+                )
+                updated += cursor.rowcount
+            
+            if checkpoint:
+                fields = {key: value for key, value in checkpoint.items() if key != "job_id"}
+                assignments = ", ".join(f"{key} = ?" for key in fields)
+                cursor.execute(
+                    f"UPDATE reprocess_jobs SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                    list(fields.values()) + [checkpoint["job_id"]]
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        
+        return updated
+    
+    def create_reprocess_job(self, params: Dict) -> int:
+        """Create a new reprocess job checkpoint"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            INSERT INTO reprocess_jobs (params, status) VALUES (?, ?)
+        """, (json.dumps(params), "pending"))
+        
+        job_id = cursor.lastrowid
+        conn.commit()
+        conn.close()
+        
+        return job_id
+    
+    def get_reprocess_job(self, job_id: int) -> Optional[Dict]:
+        """Get a reprocess job and its checkpoint"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT * FROM reprocess_jobs WHERE id = ?", (job_id,))
+        row = cursor.fetchone()
+        conn.close()
+        
+        if row:
+            job = dict(row)
+            job['params'] = json.loads(job['params'])
+            return job
         
         return None
     
-    def delete_document(self, doc_id: int) -> bool:
-        """Delete a document by ID"""
+    def get_reprocess_jobs(self, status: Optional[str] = None) -> List[Dict]:
+        """List reprocess jobs, optionally filtered by status"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        if status:
+            cursor.execute("SELECT * FROM reprocess_jobs WHERE status = ? ORDER BY id", (status,))
+        else:
+            cursor.execute("SELECT * FROM reprocess_jobs ORDER BY id DESC")
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        jobs = []
+        for row in rows:
+            job = dict(row)
+            job['params'] = json.loads(job['params'])
+            jobs.append(job)
+        return jobs
+    
+    def update_reprocess_job(self, job_id: int, **fields) -> None:
+        """Update status/checkpoint columns of a reprocess job"""
+        allowed = ("status", "last_document_id", "processed", "failed", "error")
+        fields = {key: value for key, value in fields.items() if key in allowed}
+        if not fields:
+            return
+        
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute("DELETE FROM documents WHERE id = ?", (doc_id,))
-        deleted = cursor.rowcount > 0
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        cursor.execute(
+            f"UPDATE reprocess_jobs SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+            list(fields.values()) + [job_id]
+        )
         
         conn.commit()
         conn.close()
+    
+    def migrate_compression(self, codec: Optional[str] = None, batch_size: int = 500) -> Dict:
+        """Re-encode existing rows with a codec (default: the configured one).
+        
+        Works in id order with one transaction per batch, so it can run against
+        a live database and be safely interrupted. Returns row and byte counts.
+        """
+        codec = check_codec(codec or self.compression)
+        columns = ", ".join(COMPRESSED_COLUMNS)
+        stats = {"codec": codec, "rows": 0, "bytes_before": 0, "bytes_after": 0}
+        last_id = 0
+        
+        conn = self.get_connection()
+        try:
+            while True:
+                rows = conn.execute(
+                    f"SELECT id, {columns} FROM documents WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, batch_size)
+                ).fetchall()
+                if not rows:
+                    break
+                
+                updates = []
+                for row in rows:
+                    values = []
+                    for column in COMPRESSED_COLUMNS:
+                        stored = row[column]
+                        encoded = compress_text(decompress_text(stored), codec)
+                        stats["bytes_before"] += _stored_size(stored)
+                        stats["bytes_after"] += _stored_size(encoded)
+                        values.append(encoded)
+                    updates.append(values + [row["id"]])
+                
+                assignments = ", ".join(f"{column} = ?" for column in COMPRESSED_COLUMNS)
+                conn.executemany(f"UPDATE documents SET {assignments} WHERE id = ?", updates)
+                conn.commit()
+                
+                stats["rows"] += len(rows)
+                last_id = rows[-1]["id"]
+        finally:
+            conn.close()
+        
+        return stats
+    
+    def vacuum(self):
+        """Rebuild the database file to return freed pages to the filesystem"""
+        conn = self.get_connection()
+        conn.execute("VACUUM")
+        conn.close()
+    
+    def get_expired_originals(self, cutoff: str, after_id: int, limit: int, path_prefixes: Sequence[str] = ()) -> List[Dict]:
+        """Documents processed before cutoff whose original file is still kept.
+        
+        With path_prefixes, only files under one of those paths are returned
+        (imported files elsewhere are never removed, so never marked either).
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        where, params = "id > ? AND timestamp < ? AND file_removed_at IS NULL", [after_id, cutoff]
+        if path_prefixes:
+            where += " AND (" + " OR ".join("substr(file_path, 1, ?) = ?" for _ in path_prefixes) + ")"
+            for prefix in path_prefixes:
+                params.extend((len(prefix), prefix))
         
-        return deleted
+        cursor.execute(f"""
+            SELECT id, file_path FROM documents
+            WHERE {where}
+            ORDER BY id LIMIT ?
+        """, (*params, limit))
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [dict(row) for row in rows]
+    
+    def mark_originals_removed(self, doc_ids: List[int]) -> None:
+        """Record that the original files of these documents were dropped"""
+        if not doc_ids:
+            return
+        
+        conn = self.get_connection()
+        conn.executemany(
+            "UPDATE documents SET file_removed_at = ? WHERE id = ?",
+            [(datetime.now().isoformat(), doc_id) for doc_id in doc_ids]
+        )
+        conn.commit()
+        conn.close()
     
     def get_total_documents(self) -> int:
         """Get total number of documents"""
@@ -215,3 +668,27 @@ class Database:
             return True
         except Exception:
             return False
+
+
+def parse_document_row(doc: Dict) -> Dict:
+    """Decompress and parse the stored columns of a documents row (any backend)"""
+    for column in COMPRESSED_COLUMNS:
+        if column in doc:
+            doc[column] = decompress_text(doc[column])
+    # Parse JSON fields
+    if 'skills' in doc:
+        doc['skills'] = json.loads(doc['skills']) if doc['skills'] else []
+    if 'metadata' in doc:
+        doc['metadata'] = json.loads(doc['metadata']) if doc['metadata'] else {}
+    if 'job_recommendations' in doc:
+        doc['job_recommendations'] = json.loads(doc['job_recommendations']) if doc['job_recommendations'] else []
+    return doc
+
+
+def _stored_size(value) -> int:
+    """Size in bytes of a stored column value"""
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    return len(value)
@@ -0,0 +1,408 @@
+"""Duplicate and near-duplicate detection for uploads.
+
+Each document gets three fingerprints:
+
+- ``content_hash``: SHA-256 of the file, for exact re-uploads.
+- ``image_hash``: 64-bit difference hash (dHash) of the first page/image.
+- ``text_hash``: 64-bit SimHash over word pairs of the OCR text.
+
+Exact re-uploads are caught before OCR. Near duplicates (rescans, photos)
+are found after OCR: the hashes only shortlist candidates, because two
+certificates printed from one template differ in a handful of words and
+hash as close as a noisy rescan of the same one. Each candidate's stored
+OCR text is then compared token by token, allowing for OCR confusions,
+and documents carrying different certificate/roll numbers never match.
+
+Fingerprints of recently active users are cached in memory: exact hashes
+in a dict, image/text hashes as numpy arrays, so a near lookup is a
+vectorized Hamming distance scan (well under a millisecond for thousands
+of documents). Candidate texts are compared on word counts first, and only
+the few words that differ are matched fuzzily.
+"""
+import asyncio
+import difflib
+import hashlib
+import os
+import re
+import time
+from collections import Counter, OrderedDict, defaultdict
+from dataclasses import dataclass
+from itertools import chain
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+POLICIES = ("flag", "reuse")
+
+_TOKEN = re.compile(r"\w+")
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+# Characters OCR commonly confuses, folded together before comparing tokens
+_CONFUSABLE = str.maketrans("015|", "olsl")
+
+
+def file_digest(file_path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def dhash(gray: np.ndarray, size: int = 8) -> Optional[int]:
+    """Difference hash of a grayscale image: brighter-than-right-neighbour bits"""
+    height, width = gray.shape[:2]
+    if height < size or width < size + 1:
+        return None
+    # Area-average down to size x (size + 1) cells
+    rows = np.linspace(0, height, size + 1).astype(int)
+    cols = np.linspace(0, width, size + 2).astype(int)
+    cells = np.add.reduceat(np.add.reduceat(gray.astype(np.float64), rows[:-1], axis=0), cols[:-1], axis=1)
+    cells /= np.outer(np.diff(rows), np.diff(cols))
+    bits = (cells[:, 1:] > cells[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def simhash(text: str, shingle: int = 2, min_shingles: int = 10) -> Optional[int]:
+    """64-bit SimHash of word shingles (None for text too short to compare)"""
+    tokens = _TOKEN.findall(text.lower())
+    if len(tokens) < shingle + min_shingles - 1:
+        return None
+    shingles = {" ".join(tokens[i:i + shingle]) for i in range(len(tokens) - shingle + 1)}
+
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big") for s in shingles),
+        dtype=np.uint64, count=len(shingles)
+    )
+    bits = (hashes[:, None] >> np.arange(63, -1, -1, dtype=np.uint64)) & np.uint64(1)
+    votes = bits.sum(axis=0) * 2 > len(hashes)
+    return int.from_bytes(np.packbits(votes).tobytes(), "big")
+
+
+def to_hex(value: Optional[int]) -> Optional[str]:
+    return f"{value:016x}" if value is not None else None
+
+
+def from_hex(value: Optional[str]) -> Optional[int]:
+    return int(value, 16) if value else None
+
+
+@dataclass
+class Fingerprint:
+    content_hash: Optional[str] = None
+    image_hash: Optional[int] = None
+    text_hash: Optional[int] = None
+
+
+@dataclass
+class DuplicateMatch:
+    document_id: int
+    kind: str  # "exact" or "near"
+    image_distance: Optional[int] = None
+    text_distance: Optional[int] = None
+    document: Optional[Dict] = None  # the matched document, as stored
+
+    def to_dict(self) -> Dict:
+        return {
+            "duplicate_of": self.document_id,
+            "kind": self.kind,
+            "image_distance": self.image_distance,
+            "text_distance": self.text_distance
+        }
+
+
+def _canonical(token: str) -> str:
+    return token.lower().translate(_CONFUSABLE).replace("rn", "m")
+
+
+def _is_identifier(token: str) -> bool:
+    """Certificate numbers, roll numbers, verification codes..."""
+    has_digit = any(c.isdigit() for c in token)
+    return len(token) >= 6 and has_digit and (len(token) >= 8 or any(c.isalpha() for c in token))
+
+
+def _similar(a: str, b: str, cutoff: float = 0.75) -> bool:
+    if a.startswith(b) or b.startswith(a):
+        return abs(len(a) - len(b)) <= 2 and min(len(a), len(b)) >= 3
+    if len(a) <= 3 or len(b) <= 3 or abs(len(a) - len(b)) > 3:
+        return False
+    matcher = difflib.SequenceMatcher(None, a, b)
+    return matcher.quick_ratio() >= cutoff and matcher.ratio() >= cutoff
+
+
+@dataclass
+class TextProfile:
+    """Canonical word counts and identifiers of one OCR text"""
+    words: Counter
+    ids: Set[str]
+    size: int
+
+    @classmethod
+    def of(cls, text: str) -> "TextProfile":
+        tokens = _TOKEN.findall(text)
+        return cls(
+            Counter(_canonical(t) for t in tokens),
+            {_canonical(t) for t in tokens if _is_identifier(t)},
+            len(tokens)
+        )
+
+
+def _pair_variants(mine: List[str], theirs: List[str]) -> Tuple[List[str], List[str]]:
+    """Drop pairs of tokens that are OCR variants of each other.
+
+    A misread rarely touches both ends of a word, so each token is only
+    compared with the tokens sharing its first or last two characters.
+    """
+    index: Dict[str, List[int]] = defaultdict(list)
+    for i, token in enumerate(theirs):
+        index[token[:2]].append(i)
+        index["$" + token[-2:]].append(i)
+
+    used: Set[int] = set()
+    left = []
+    for token in mine:
+        for i in chain(index.get(token[:2], ()), index.get("$" + token[-2:], ())):
+            if i not in used and _similar(token, theirs[i]):
+                used.add(i)
+                break
+        else:
+            left.append(token)
+    return left, [token for i, token in enumerate(theirs) if i not in used]
+
+
+def _join_split(joined: List[str], parts: List[str]) -> Tuple[List[str], List[str]]:
+    """Drop tokens that are two words of the other side read as one"""
+    available = Counter(parts)
+    left = []
+    for token in joined:
+        for i in range(1, len(token)):
+            head, tail = token[:i], token[i:]
+            if available[head] and available[tail] and (head != tail or available[head] > 1):
+                available[head] -= 1
+                available[tail] -= 1
+                break
+        else:
+            left.append(token)
+    return left, list(available.elements())
+
+
+def same_profile(profile: TextProfile, other: TextProfile, tolerance: float = 0.03, max_noise: float = 0.25) -> bool:
+    """Whether two profiled OCR texts read the same document (allowing for OCR noise)"""
+    if profile.ids and other.ids and not (profile.ids & other.ids) and not any(
+        difflib.SequenceMatcher(None, a, b).ratio() >= 0.8 for a in profile.ids for b in other.ids
+    ):
+        return False
+
+    size = max(profile.size, other.size)
+    if not size:
+        return True
+    # A rescan only loses the words its OCR misread: texts sharing fewer
+    # words than that are different documents, decided without fuzzy matching
+    shared = sum((profile.words & other.words).values())
+    if size - shared > max_noise * size:
+        return False
+
+    # Only the residue left after exact matching is compared fuzzily
+    mine = list((profile.words - other.words).elements())
+    theirs = list((other.words - profile.words).elements())
+    mine, theirs = _pair_variants(mine, theirs)
+    mine, theirs = _join_split(mine, theirs)
+    theirs, mine = _join_split(theirs, mine)
+    return len(mine) + len(theirs) <= max(1, int(tolerance * size))
+
+
+def same_document(text: str, other: str, tolerance: float = 0.03) -> bool:
+    """Whether two OCR texts read the same document (allowing for OCR noise)"""
+    return same_profile(TextProfile.of(text), TextProfile.of(other), tolerance)
+
+
+class HashIndex:
+    """64-bit hashes of one user's documents, searched by Hamming distance"""
+
+    def __init__(self):
+        self.hashes: Dict[int, int] = {}
+        self._ids: Optional[np.ndarray] = None
+        self._values: Optional[np.ndarray] = None
+
+    def add(self, doc_id: int, value: int):
+        self.hashes[doc_id] = value
+        self._ids = None
+
+    def remove(self, doc_id: int):
+        if self.hashes.pop(doc_id, None) is not None:
+            self._ids = None
+
+    def near(self, value: int, max_distance: int) -> List[Tuple[int, int]]:
+        """(doc_id, distance) of hashes within max_distance, closest first"""
+        if not self.hashes:
+            return []
+        if self._ids is None:
+            self._ids = np.fromiter(self.hashes.keys(), dtype=np.int64, count=len(self.hashes))
+            self._values = np.fromiter(self.hashes.values(), dtype=np.uint64, count=len(self.hashes))
+        xor = self._values ^ np.uint64(value)
+        distances = _POPCOUNT[xor.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+        hits = np.flatnonzero(distances <= max_distance)
+        order = hits[np.argsort(distances[hits], kind="stable")]
+        return [(int(self._ids[i]), int(distances[i])) for i in order]
+
+
+class UserIndex:
+    """Duplicate fingerprints of one user's documents"""
+
+    def __init__(self):
+        self.exact: Dict[str, int] = {}
+        self.images = HashIndex()
+        self.texts = HashIndex()
+
+    def add(self, doc_id: int, fingerprint: Fingerprint):
+        if fingerprint.content_hash:
+            self.exact.setdefault(fingerprint.content_hash, doc_id)
+        if fingerprint.image_hash is not None:
+            self.images.add(doc_id, fingerprint.image_hash)
+        if fingerprint.text_hash is not None:
+            self.texts.add(doc_id, fingerprint.text_hash)
+
+    def remove(self, doc_id: int):
+        for content_hash in [h for h, i in self.exact.items() if i == doc_id]:
+            del self.exact[content_hash]
+        self.images.remove(doc_id)
+        self.texts.remove(doc_id)
+
+
+class DuplicateDetector:
+    """Per-user duplicate lookup backed by the document store.
+
+    A user's fingerprints are loaded from the store in one query and
+    cached, so the exact check before OCR is a dict lookup and the near
+    check shortlists in memory. Cached indexes are reloaded after
+    DUP_CACHE_SECONDS (uploads and deletes through other workers show up
+    by then), and at most DUP_CACHE_USERS users are kept, least recently
+    used first out. Stored rows are read only to confirm near duplicates
+    (OCR text alone) and, when asked for, to return the matched document.
+    """
+
+    def __init__(self, store, policy: Optional[str] = None):
+        self.store = store
+        self.default_policy = policy or os.getenv("DUPLICATE_POLICY", "flag")
+        self.image_distance = int(os.getenv("DUP_IMAGE_MAX_DISTANCE", "10"))
+        self.text_distance = int(os.getenv("DUP_TEXT_MAX_DISTANCE", "20"))
+        self.text_tolerance = float(os.getenv("DUP_TEXT_TOLERANCE", "0.03"))
+        self.max_candidates = int(os.getenv("DUP_MAX_CANDIDATES", "5"))
+        self.cache_seconds = float(os.getenv("DUP_CACHE_SECONDS", "60"))
+        self.cache_users = int(os.getenv("DUP_CACHE_USERS", "1000"))
+        # username -> (loaded_at, index), least recently used first
+        self._users: "OrderedDict[str, Tuple[float, UserIndex]]" = OrderedDict()
+        self._load_lock = asyncio.Lock()
+
+    def policy(self, requested: Optional[str]) -> str:
+        policy = (requested or self.default_policy).lower()
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown duplicate_policy '{policy}' (use {' or '.join(POLICIES)})")
+        return policy
+
+    def _cached(self, username: str) -> Optional[UserIndex]:
+        entry = self._users.get(username)
+        if entry is None or time.monotonic() - entry[0] > self.cache_seconds:
+            return None
+        self._users.move_to_end(username)
+        return entry[1]
+
+    async def _user_index(self, username: str) -> UserIndex:
+        index = self._cached(username)
+        if index is not None:
+            return index
+        async with self._load_lock:
+            index = self._cached(username)
+            if index is None:
+                loaded_at = time.monotonic()
+                index = UserIndex()
+                for row in await self.store.get_document_hashes(username):
+                    index.add(row["id"], Fingerprint(
+                        row["content_hash"], from_hex(row["image_hash"]), from_hex(row["text_hash"])
+                    ))
+                self._users[username] = (loaded_at, index)
+                self._users.move_to_end(username)
+                while len(self._users) > self.cache_users:
+                    self._users.popitem(last=False)
+        return index
+
+    async def _load(self, index: UserIndex, match: DuplicateMatch) -> Optional[DuplicateMatch]:
+        match.document = await self.store.get_document_by_id(match.document_id)
+        if match.document is None:
+            index.remove(match.document_id)  # deleted since it was indexed
+            return None
+        return match
+
+    def _confirm(self, ocr_text: str, candidates: List[Tuple[int, str]]) -> Optional[int]:
+        """First candidate whose stored text reads the same document"""
+        profile = TextProfile.of(ocr_text)
+        for doc_id, text in candidates:
+            if same_profile(profile, TextProfile.of(text), self.text_tolerance):
+                return doc_id
+        return None
+
+    async def find(
+        self,
+        username: str,
+        fingerprint: Fingerprint,
+        ocr_text: Optional[str] = None,
+        load_document: bool = False
+    ) -> Optional[DuplicateMatch]:
+        """An existing document of the user that this one duplicates.
+
+        Without ``ocr_text`` only exact re-uploads are checked (before OCR).
+        With ``load_document`` the match carries the stored document (for
+        the "reuse" policy); otherwise only its id is known.
+        """
+        index = await self._user_index(username)
+
+        doc_id = index.exact.get(fingerprint.content_hash) if fingerprint.content_hash else None
+        if doc_id is not None:
+            match = DuplicateMatch(doc_id, "exact")
+            if not load_document:
+                return match
+            match = await self._load(index, match)
+            if match is not None:
+                return match
+
+        if ocr_text is None or fingerprint.text_hash is None:
+            return None
+
+        # Shortlist by text hash; documents whose page image also matches go first
+        image_distances = dict(index.images.near(fingerprint.image_hash, self.image_distance)) if fingerprint.image_hash is not None else {}
+        candidates = index.texts.near(fingerprint.text_hash, self.text_distance)
+        candidates.sort(key=lambda candidate: candidate[0] not in image_distances)
+        candidates = candidates[:self.max_candidates]
+        if not candidates:
+            return None
+
+        # Only the OCR text of the shortlist is read
+        texts = await self.store.get_ocr_texts([doc_id for doc_id, _ in candidates])
+        for doc_id, _ in candidates:
+            if doc_id not in texts:
+                index.remove(doc_id)  # deleted since it was indexed
+        doc_id = await asyncio.to_thread(
+            self._confirm, ocr_text, [(doc_id, texts[doc_id]) for doc_id, _ in candidates if doc_id in texts]
+        )
+        if doc_id is None:
+            return None
+
+        match = DuplicateMatch(doc_id, "near", image_distances.get(doc_id), dict(candidates)[doc_id])
+        return await self._load(index, match) if load_document else match
+
+    def add(self, username: str, doc_id: int, fingerprint: Fingerprint):
+        """Index a new document if the user's fingerprints are cached (else the next load reads it)"""
+        entry = self._users.get(username)
+        if entry is not None:
+            entry[1].add(doc_id, fingerprint)
+
+    def remove(self, doc_id: int):
+        """Drop a deleted document from every cached index"""
+        for _, index in self._users.values():
+            index.remove(doc_id)
+
+    def forget(self, username: Optional[str] = None):
+        """Drop the cached index of a user (or of everyone), e.g. after a bulk delete"""
+        if username is None:
+            self._users.clear()
+        else:
+            self._users.pop(username, None)
@@ -0,0 +1,218 @@
+"""Async storage interface used by the API, with SQLite and PostgreSQL backends.
+
+``create_document_store()`` picks the backend from the environment:
+``DATABASE_URL=postgresql://...`` selects PostgreSQL (asyncpg connection pool),
+otherwise the SQLite file at ``DATABASE_PATH`` is used through ``Database``.
+"""
+import asyncio
+import os
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, List, Optional, Sequence
+
+from database import Database, DocumentRecord
+
+
+class DocumentStore(ABC):
+    """Everything the API needs from a database backend.
+
+    Selections (``**selection``) take ``ids``, ``username``, ``date_from`` and
+    ``date_to`` like ``Database._selection_filter``.
+    """
+
+    backend = "unknown"
+
+    @abstractmethod
+    async def init_db(self):
+        """Create tables/indexes and open connections"""
+
+    async def close(self):
+        """Release connections"""
+
+    @abstractmethod
+    async def check_health(self) -> bool: ...
+
+    @abstractmethod
+    async def insert_document(self, record: DocumentRecord) -> int: ...
+
+    @abstractmethod
+    async def insert_documents(self, records: List[DocumentRecord]) -> int: ...
+
+    @abstractmethod
+    async def get_existing_file_paths(self, file_paths: List[str]) -> set:
+        """Which of the given file paths already have a document row"""
+
+    @abstractmethod
+    async def get_all_documents(self, username: Optional[str] = None) -> List[Dict]: ...
+
+    @abstractmethod
+    async def get_document_by_id(self, doc_id: int) -> Optional[Dict]: ...
+
+    @abstractmethod
+    async def get_document_hashes(self, username: str) -> List[Dict]:
+        """id, content_hash, image_hash and text_hash of a user's documents"""
+
+    @abstractmethod
+    async def get_ocr_texts(self, doc_ids: List[int]) -> Dict[int, str]:
+        """OCR text of the given documents by id, without the other columns"""
+
+    @abstractmethod
+    async def get_documents(self, **selection) -> List[Dict]: ...
+
+    @abstractmethod
+    def iter_documents(self, columns: Optional[List[str]] = None, batch_size: int = 500, **selection) -> AsyncIterator[Dict]:
+        """Stream documents in id order without loading them all"""
+
+    @abstractmethod
+    async def delete_documents(self, **selection) -> List[str]: ...
+
+    @abstractmethod
+    async def get_total_documents(self) -> int: ...
+
+    @abstractmethod
+    async def get_statistics(self) -> Dict: ...
+
+    @abstractmethod
+    async def get_documents_for_reprocessing(
+        self,
+        after_id: int,
+        limit: int,
+        document_ids: Optional[List[int]] = None,
+        username: Optional[str] = None
+    ) -> List[Dict]: ...
+
+    @abstractmethod
+    async def bulk_update_documents(self, updates: List[Dict], checkpoint: Optional[Dict] = None) -> int: ...
+
+    @abstractmethod
+    async def create_reprocess_job(self, params: Dict) -> int: ...
+
+    @abstractmethod
+    async def get_reprocess_job(self, job_id: int) -> Optional[Dict]: ...
+
+    @abstractmethod
+    async def get_reprocess_jobs(self, status: Optional[str] = None) -> List[Dict]: ...
+
+    @abstractmethod
+    async def update_reprocess_job(self, job_id: int, **fields) -> None: ...
+
+    @abstractmethod
+    async def get_expired_originals(self, cutoff: str, after_id: int, limit: int, path_prefixes: Sequence[str] = ()) -> List[Dict]: ...
+
+    @abstractmethod
+    async def mark_originals_removed(self, doc_ids: List[int]) -> None: ...
+
+
+class SQLiteDocumentStore(DocumentStore):
+    """The existing SQLite ``Database``, with each call run in a worker thread"""
+
+    backend = "sqlite"
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    async def init_db(self):
+        await asyncio.to_thread(self.db.init_db)
+
+    async def check_health(self) -> bool:
+        return await asyncio.to_thread(self.db.check_health)
+
+    async def insert_document(self, record: DocumentRecord) -> int:
+        return await asyncio.to_thread(self.db.insert_document, record)
+
+    async def insert_documents(self, records: List[DocumentRecord]) -> int:
+        return await asyncio.to_thread(self.db.insert_documents, records)
+
+    async def get_existing_file_paths(self, file_paths: List[str]) -> set:
+        return await asyncio.to_thread(self.db.get_existing_file_paths, file_paths)
+
+    async def get_all_documents(self, username: Optional[str] = None) -> List[Dict]:
+        return await asyncio.to_thread(self.db.get_all_documents, username)
+
+    async def get_document_by_id(self, doc_id: int) -> Optional[Dict]:
+        return await asyncio.to_thread(self.db.get_document_by_id, doc_id)
+
+    async def get_document_hashes(self, username: str) -> List[Dict]:
+        return await asyncio.to_thread(self.db.get_document_hashes, username)
+
+    async def get_ocr_texts(self, doc_ids: List[int]) -> Dict[int, str]:
+        return await asyncio.to_thread(self.db.get_ocr_texts, doc_ids)
+
+    async def get_documents(self, **selection) -> List[Dict]:
+        return await asyncio.to_thread(lambda: self.db.get_documents(**selection))
+
+    async def iter_documents(self, columns: Optional[List[str]] = None, batch_size: int = 500, **selection) -> AsyncIterator[Dict]:
+        iterator = self.db.iter_documents(columns, batch_size, **selection)
+
+        def next_batch() -> List[Dict]:
+            batch = []
+            for doc in iterator:
+                batch.append(doc)
+                if len(batch) >= batch_size:
+                    break
+            return batch
+
+        try:
+            while True:
+                batch = await asyncio.to_thread(next_batch)
+                if not batch:
+                    break
+                for doc in batch:
+                    yield doc
+        finally:
+            iterator.close()
+
+    async def delete_documents(self, **selection) -> List[str]:
+        return await asyncio.to_thread(lambda: self.db.delete_documents(**selection))
+
+    async def get_total_documents(self) -> int:
+        return await asyncio.to_thread(self.db.get_total_documents)
+
+    async def get_statistics(self) -> Dict:
+        return await asyncio.to_thread(self.db.get_statistics)
+
+    async def get_documents_for_reprocessing(
+        self,
+        after_id: int,
+        limit: int,
+        document_ids: Optional[List[int]] = None,
+        username: Optional[str] = None
+    ) -> List[Dict]:
+        return await asyncio.to_thread(self.db.get_documents_for_reprocessing, after_id, limit, document_ids, username)
+
+    async def bulk_update_documents(self, updates: List[Dict], checkpoint: Optional[Dict] = None) -> int:
+        return await asyncio.to_thread(self.db.bulk_update_documents, updates, checkpoint)
+
+    async def create_reprocess_job(self, params: Dict) -> int:
+        return await asyncio.to_thread(self.db.create_reprocess_job, params)
+
+    async def get_reprocess_job(self, job_id: int) -> Optional[Dict]:
+        return await asyncio.to_thread(self.db.get_reprocess_job, job_id)
+
+    async def get_reprocess_jobs(self, status: Optional[str] = None) -> List[Dict]:
+        return await asyncio.to_thread(self.db.get_reprocess_jobs, status)
+
+    async def update_reprocess_job(self, job_id: int, **fields) -> None:
+        await asyncio.to_thread(lambda: self.db.update_reprocess_job(job_id, **fields))
+
+    async def get_expired_originals(self, cutoff: str, after_id: int, limit: int, path_prefixes: Sequence[str] = ()) -> List[Dict]:
+        return await asyncio.to_thread(self.db.get_expired_originals, cutoff, after_id, limit, path_prefixes)
+
+    async def mark_originals_removed(self, doc_ids: List[int]) -> None:
+        await asyncio.to_thread(self.db.mark_originals_removed, doc_ids)
+
+
+def create_document_store(database_path: Optional[str] = None) -> DocumentStore:
+    """Build the store configured by DATABASE_URL / DATABASE_PATH.
+
+    An explicit ``database_path`` (e.g. a CLI's ``--db``) always selects
+    that SQLite file.
+    """
+    database_url = os.getenv("DATABASE_URL", "")
+    if database_path is None and database_url.startswith(("postgres://", "postgresql://")):
+        from postgres_store import PostgresDocumentStore
+        return PostgresDocumentStore(
+            database_url,
+            min_size=int(os.getenv("DATABASE_POOL_MIN", "1")),
+            max_size=int(os.getenv("DATABASE_POOL_MAX", "10"))
+        )
+    return SQLiteDocumentStore(Database(database_path or os.getenv("DATABASE_PATH", "documents.db")))
@@ -0,0 +1,75 @@
+"""Export documents to NDJSON, CSV or Parquet without loading the table into memory.
+
+Reads from the same store as the API: PostgreSQL when DATABASE_URL is set,
+otherwise the SQLite file at DATABASE_PATH (or --db).
+
+Usage:
+    python export_cli.py --format csv --output documents.csv
+    python export_cli.py --format parquet --columns id,username,skills,metadata --output docs.parquet
+    python export_cli.py --username alice --date-from 2024-01-01 > alice.ndjson
+"""
+import argparse
+import asyncio
+import sys
+from contextlib import redirect_stdout
+
+import exporter
+from document_store import create_document_store
+
+
+async def export(args, columns) -> None:
+    store = create_document_store(args.db)
+    with redirect_stdout(sys.stderr):  # keep stdout for the export itself
+        await store.init_db()
+    try:
+        documents = store.iter_documents(
+            columns=columns,
+            username=args.username,
+            date_from=args.date_from,
+            date_to=args.date_to
+        )
+
+        if args.format == "parquet":
+            written = await exporter.write_parquet_async(documents, columns, args.output)
+            print(f"✅ Exported {written} documents to {args.output}", file=sys.stderr)
+            return
+
+        out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+        try:
+            async for chunk in exporter.export_stream_async(documents, args.format, columns, flatten=not args.no_flatten):
+                out.write(chunk)
+        finally:
+            if out is not sys.stdout.buffer:
+                out.close()
+    finally:
+        await store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export processed documents")
+    parser.add_argument("--db", help="SQLite database path (default: DATABASE_URL if set, else DATABASE_PATH)")
+    parser.add_argument("--format", choices=exporter.FORMATS, default="ndjson")
+    parser.add_argument("--columns", help=f"Comma separated subset of: {', '.join(exporter.EXPORT_COLUMNS)}")
+    parser.add_argument("--username", help="Only this user's documents")
+    parser.add_argument("--date-from", help="ISO timestamp (inclusive)")
+    parser.add_argument("--date-to", help="ISO timestamp (exclusive)")
+    parser.add_argument("--no-flatten", action="store_true", help="Keep JSON fields nested (NDJSON only)")
+    parser.add_argument("--output", default="-", help="Output file (default: stdout)")
+    args = parser.parse_args()
+
+    try:
+        columns = exporter.parse_columns(args.columns)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.format == "parquet":
+        if not exporter.parquet_available():
+            parser.error("Parquet export requires the 'pyarrow' package")
+        if args.output == "-":
+            parser.error("Parquet export needs --output")
+
+    asyncio.run(export(args, columns))
+
+
+if __name__ == "__main__":
+    main()
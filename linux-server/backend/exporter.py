@@ -0,0 +1,225 @@
+"""Streaming export of documents as NDJSON, CSV or Parquet.
+
+Rows come from ``iter_documents``, which walks the table with a cursor in
+batches, so memory use does not depend on the table size; the encoders
+consume the async iterator of a ``DocumentStore``.
+"""
+import asyncio
+import csv
+import io
+import json
+import tempfile
+from typing import AsyncIterable, AsyncIterator, Dict, List, Optional
+
+EXPORT_COLUMNS = [
+    "id", "username", "original_filename", "file_path", "ocr_text", "document_type",
+    "skills", "metadata", "job_recommendations", "timestamp", "created_at", "file_removed_at"
+]
+
+DEFAULT_COLUMNS = [
+    "id", "username", "original_filename", "document_type", "skills",
+    "metadata", "job_recommendations", "timestamp"
+]
+
+# Metadata keys that get their own column when flattening
+METADATA_KEYS = [
+    "institution", "duration", "grade_or_score", "field_of_study",
+    "key_achievements", "analysis_source", "fallback_reason"
+]
+
+FORMATS = ("ndjson", "csv", "parquet")
+
+LIST_SEPARATOR = "; "
+
+
+def parse_columns(value: Optional[str]) -> List[str]:
+    """Validate a comma separated column list (default: everything but OCR text)"""
+    if not value:
+        return list(DEFAULT_COLUMNS)
+    columns = [column.strip() for column in value.split(",") if column.strip()]
+    unknown = [column for column in columns if column not in EXPORT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown export columns: {', '.join(unknown)}")
+    return columns
+
+
+def flat_fieldnames(columns: List[str]) -> List[str]:
+    """Output field names once JSON columns are flattened"""
+    fields = []
+    for column in columns:
+        if column == "metadata":
+            fields.extend(f"metadata_{key}" for key in METADATA_KEYS)
+        elif column == "job_recommendations":
+            fields.extend(["job_ids", "job_scores"])
+        else:
+            fields.append(column)
+    return fields
+
+
+def flatten_document(doc: Dict, columns: List[str]) -> Dict:
+    """Turn the JSON columns of a document into scalar fields"""
+    row = {}
+    for column in columns:
+        value = doc.get(column)
+        if column == "skills":
+            row["skills"] = LIST_SEPARATOR.join(value or [])
+        elif column == "metadata":
+            metadata = value or {}
+            for key in METADATA_KEYS:
+                item = metadata.get(key)
+                row[f"metadata_{key}"] = LIST_SEPARATOR.join(map(str, item)) if isinstance(item, list) else item
+        elif column == "job_recommendations":
+            recommendations = value or []
+            row["job_ids"] = LIST_SEPARATOR.join(str(rec.get("id")) for rec in recommendations)
+            row["job_scores"] = LIST_SEPARATOR.join(str(rec.get("match_score")) for rec in recommendations)
+        else:
+            row[column] = value
+    return row
+
+
+def ndjson_line(doc: Dict, columns: List[str], flatten: bool = True) -> bytes:
+    row = flatten_document(doc, columns) if flatten else {column: doc.get(column) for column in columns}
+    return (json.dumps(row, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+
+class CSVChunker:
+    """Buffers CSV rows and hands them out in chunks"""
+
+    def __init__(self, columns: List[str], rows_per_chunk: int = 500):
+        self.columns = columns
+        self.rows_per_chunk = rows_per_chunk
+        self.buffer = io.StringIO()
+        self.writer = csv.DictWriter(self.buffer, fieldnames=flat_fieldnames(columns), extrasaction="ignore")
+        self.writer.writeheader()
+        self.pending = 0
+
+    def add(self, doc: Dict) -> Optional[bytes]:
+        """Add a row; returns a chunk once rows_per_chunk rows are buffered"""
+        self.writer.writerow(flatten_document(doc, self.columns))
+        self.pending += 1
+        if self.pending >= self.rows_per_chunk:
+            return self.flush()
+        return None
+
+    def flush(self) -> bytes:
+        chunk = self.buffer.getvalue().encode("utf-8")
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        self.pending = 0
+        return chunk
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class ParquetBatchWriter:
+    """Writes flattened documents to a Parquet sink one row group at a time"""
+
+    def __init__(self, columns: List[str], sink, rows_per_group: int = 5000):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.columns = columns
+        self.fields = flat_fieldnames(columns)
+        self.schema = pa.schema([
+            pa.field(name, pa.int64() if name == "id" else pa.string()) for name in self.fields
+        ])
+        self.rows_per_group = rows_per_group
+        self.writer = pq.ParquetWriter(sink, self.schema, compression="zstd")
+        self.rows: List[Dict] = []
+        self.written = 0
+
+    def buffer(self, doc: Dict) -> bool:
+        """Queue a document; True once a full row group is waiting for flush()"""
+        self.rows.append(flatten_document(doc, self.columns))
+        return len(self.rows) >= self.rows_per_group
+
+    def flush(self):
+        """Encode and write the queued rows as one row group"""
+        arrays = {
+            name: [row.get(name) if name == "id" or row.get(name) is None else str(row.get(name)) for row in self.rows]
+            for name in self.fields
+        }
+        self.writer.write_table(self.pa.Table.from_pydict(arrays, schema=self.schema))
+        self.written += len(self.rows)
+        self.rows = []
+
+    def close(self) -> int:
+        if self.rows or self.written == 0:
+            self.flush()
+        self.writer.close()
+        return self.written
+
+
+def _check_format(export_format: str):
+    if export_format not in FORMATS:
+        raise ValueError(f"Unknown export format: {export_format}")
+    if export_format == "parquet" and not parquet_available():
+        raise ValueError("Parquet export requires the 'pyarrow' package")
+
+
+async def _aiter_ndjson(documents: AsyncIterable[Dict], columns: List[str], flatten: bool) -> AsyncIterator[bytes]:
+    async for doc in documents:
+        yield ndjson_line(doc, columns, flatten)
+
+
+async def _aiter_csv(documents: AsyncIterable[Dict], columns: List[str], rows_per_chunk: int = 500) -> AsyncIterator[bytes]:
+    chunker = CSVChunker(columns, rows_per_chunk)
+    async for doc in documents:
+        chunk = chunker.add(doc)
+        if chunk:
+            yield chunk
+    yield chunker.flush()
+
+
+async def write_parquet_async(documents: AsyncIterable[Dict], columns: List[str], sink, rows_per_group: int = 5000) -> int:
+    """Write documents to a Parquet file/sink one row group at a time.
+
+    Encoding/compressing row groups runs in a thread, so a large export
+    does not stall the event loop.
+    """
+    writer = ParquetBatchWriter(columns, sink, rows_per_group)
+    async for doc in documents:
+        if writer.buffer(doc):
+            await asyncio.to_thread(writer.flush)
+    return await asyncio.to_thread(writer.close)
+
+
+async def _aiter_parquet(documents: AsyncIterable[Dict], columns: List[str], chunk_size: int = 1 << 20) -> AsyncIterator[bytes]:
+    """Stream a Parquet export.
+
+    Parquet needs its footer written last, so the file is spooled to a
+    temporary file on disk and streamed from there.
+    """
+    with tempfile.TemporaryFile() as spool:
+        await write_parquet_async(documents, columns, spool)
+
+        await asyncio.to_thread(spool.seek, 0)
+        while True:
+            chunk = await asyncio.to_thread(spool.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def export_stream_async(documents: AsyncIterable[Dict], export_format: str, columns: List[str], flatten: bool = True) -> AsyncIterator[bytes]:
+    """Encode documents in the requested format as a stream of byte chunks"""
+    _check_format(export_format)
+    if export_format == "ndjson":
+        return _aiter_ndjson(documents, columns, flatten)
+    if export_format == "csv":
+        return _aiter_csv(documents, columns)
+    return _aiter_parquet(documents, columns)
+
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
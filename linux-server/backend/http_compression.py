@@ -0,0 +1,161 @@
+import os
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # optional dependency; gzip only without it
+    brotli = None
+
+# Parquet, images and PDFs are already compressed
+COMPRESSIBLE_TYPES = (
+    "application/json", "application/x-ndjson", "application/javascript",
+    "application/xml", "text/"
+)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick "br" or "gzip" from an Accept-Encoding header (None for identity)"""
+    offered: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            offered[name.strip().lower()] = quality
+
+    def quality_of(encoding: str) -> float:
+        return offered.get(encoding, offered.get("*", 0.0))
+
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    best = max(candidates, key=quality_of)  # ties keep the first, i.e. brotli
+    return best if quality_of(best) > 0 else None
+
+
+class _Compressor:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)  # 31: gzip container
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress a chunk and flush it so streamed output is not held back"""
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.finish()
+        return self._zlib.flush(zlib.Z_FINISH)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses with brotli or gzip.
+
+    The encoding is negotiated from Accept-Encoding (brotli preferred when
+    the ``brotli`` package is installed). Whole responses smaller than
+    ``minimum_size`` are sent as is; streamed responses of compressible
+    types (e.g. NDJSON/CSV exports) are compressed chunk by chunk.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: Optional[int] = None,
+        gzip_level: Optional[int] = None,
+        brotli_quality: Optional[int] = None
+    ):
+        self.app = app
+        self.minimum_size = minimum_size if minimum_size is not None else int(os.getenv("HTTP_COMPRESSION_MIN_BYTES", "1024"))
+        self.gzip_level = gzip_level or int(os.getenv("HTTP_GZIP_LEVEL", "6"))
+        self.brotli_quality = brotli_quality or int(os.getenv("HTTP_BROTLI_QUALITY", "4"))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = negotiate_encoding(accept_encoding) if accept_encoding else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressingResponder(send, encoding, self)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressingResponder:
+    def __init__(self, send, encoding: str, settings: CompressionMiddleware):
+        self._send = send
+        self.encoding = encoding
+        self.settings = settings
+        self.start_message: Optional[dict] = None
+        self.compressor: Optional[_Compressor] = None
+        self.passthrough = False
+
+    def _headers(self) -> List[Tuple[bytes, bytes]]:
+        return list(self.start_message.get("headers", []))
+
+    def _should_compress(self) -> bool:
+        content_type = b""
+        for name, value in self._headers():
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type":
+                content_type = value
+        return content_type.decode("latin-1").startswith(COMPRESSIBLE_TYPES)
+
+    def _compressed_headers(self, content_length: Optional[int]) -> List[Tuple[bytes, bytes]]:
+        headers = [(name, value) for name, value in self._headers() if name not in (b"content-length", b"vary")]
+        vary = [value for name, value in self._headers() if name == b"vary"]
+        headers.append((b"vary", b", ".join(vary + [b"Accept-Encoding"])))
+        headers.append((b"content-encoding", self.encoding.encode()))
+        if content_length is not None:
+            headers.append((b"content-length", str(content_length).encode()))
+        return headers
+
+    async def send(self, message: dict):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None:
+            # First body message decides how the response is sent
+            if not self._should_compress() or (not more_body and len(body) < self.settings.minimum_size):
+                self.passthrough = True
+                await self._send(self.start_message)
+                await self._send(message)
+                return
+
+            self.compressor = _Compressor(self.encoding, self.settings.gzip_level, self.settings.brotli_quality)
+            if not more_body:
+                compressed = self.compressor.compress(body) + self.compressor.finish()
+                await self._send({**self.start_message, "headers": self._compressed_headers(len(compressed))})
+                await self._send({"type": "http.response.body", "body": compressed})
+                return
+            await self._send({**self.start_message, "headers": self._compressed_headers(None)})
+
+        chunk = self.compressor.compress(body) if body else b""
+        if not more_body:
+            chunk += self.compressor.finish()
+        await self._send({"type": "http.response.body", "body": chunk, "more_body": more_body})
@@ -0,0 +1,107 @@
+import csv
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_CATALOG_PATH = Path(__file__).parent / "data" / "jobs.json"
+
+
+def load_catalog(path: str, table: str = "jobs") -> List[Dict]:
+    """Load job postings from a JSON, JSON Lines, CSV or SQLite file.
+
+    JSON files hold a list of jobs (or ``{"jobs": [...]}``). In CSV files and
+    SQLite tables ``required_skills`` is either a JSON list or a ``;``/``|``
+    separated string.
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+
+    if suffix == ".json":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        jobs = data["jobs"] if isinstance(data, dict) else data
+    elif suffix in (".jsonl", ".ndjson"):
+        with open(path, encoding="utf-8") as f:
+            jobs = [json.loads(line) for line in f if line.strip()]
+    elif suffix == ".csv":
+        with open(path, encoding="utf-8", newline="") as f:
+            jobs = [dict(row) for row in csv.DictReader(f)]
+    elif suffix in (".db", ".sqlite", ".sqlite3"):
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        conn.row_factory = sqlite3.Row
+        try:
+            jobs = [dict(row) for row in conn.execute(f'SELECT * FROM "{table}"')]
+        finally:
+            conn.close()
+    else:
+        raise ValueError(f"Unsupported job catalog format: {path.suffix}")
+
+    return [_normalize_job(job) for job in jobs]
+
+
+def _normalize_job(job: Dict) -> Dict:
+    """Coerce a raw catalog row into the job dict shape used by the API"""
+    skills = job.get("required_skills") or []
+    if isinstance(skills, str):
+        skills = skills.strip()
+        if skills.startswith("["):
+            skills = json.loads(skills)
+        else:
+            separator = "|" if "|" in skills else ";"
+            skills = [skill.strip() for skill in skills.split(separator) if skill.strip()]
+
+    job["id"] = int(job["id"])
+    job["required_skills"] = list(skills)
+    return job
+
+
+class CatalogWatcher:
+    """Polls a catalog file and reloads it in a background thread when it changes.
+
+    The new catalog is loaded and indexed entirely off the request path; the
+    ``on_change`` callback is expected to swap it in with a single assignment.
+    """
+
+    def __init__(self, path: str, on_change: Callable[[List[Dict]], None], interval: float = 5.0, table: str = "jobs"):
+        self.path = Path(path)
+        self.on_change = on_change
+        self.interval = interval
+        self.table = table
+        self._last_mtime: Optional[float] = self._mtime()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="job-catalog-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval + 1)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            mtime = self._mtime()
+            if mtime is None or mtime == self._last_mtime:
+                continue
+            try:
+                jobs = load_catalog(str(self.path), self.table)
+                self.on_change(jobs)
+                self._last_mtime = mtime
+            except Exception as e:
+                # Keep serving the previous catalog; retry on the next change
+                print(f"⚠️ Could not reload job catalog {self.path}: {str(e)}")
+                self._last_mtime = mtime
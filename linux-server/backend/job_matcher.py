@@ -1,294 +1,332 @@
-from typing import List, Dict
+from typing import List, Dict, Tuple, Optional
+from collections import OrderedDict
+import os
 import random
+import threading
+import time
+
+import numpy as np
+from scipy import sparse
+
+from job_catalog import CatalogWatcher, DEFAULT_CATALOG_PATH, load_catalog
+
+
+class CatalogIndex:
+    """Immutable snapshot of the job catalog plus its sparse skill matrix.
+
+    A new snapshot is built for every catalog (re)load and swapped in with a
+    single attribute assignment, so readers never see a half-built index.
+    """
+
+    # Upper bound on memoized skill -> vocabulary column lookups
+    MAX_SKILL_LOOKUPS = 50_000
+    # Length of the substrings indexed for fuzzy matching
+    GRAM = 3
+
+    def __init__(self, jobs: List[Dict], version: int):
+        self.jobs = jobs
+        self.version = version
+        self.jobs_by_id = {job["id"]: job for job in jobs}
+
+        # Vocabulary of lowercase catalog skills -> column
+        self.vocabulary: Dict[str, int] = {}
+        rows, cols = [], []
+        for position, job in enumerate(jobs):
+            for skill in {skill.lower() for skill in job["required_skills"]}:
+                rows.append(position)
+                cols.append(self.vocabulary.setdefault(skill, len(self.vocabulary)))
+        self.vocabulary_list = list(self.vocabulary)
+
+        # Substring index for fuzzy lookups: every GRAM-long substring of a
+        # vocabulary skill (and every shorter one) -> the columns containing it
+        self._grams: Dict[str, set] = {}
+        for job_skill, column in self.vocabulary.items():
+            for length in range(1, self.GRAM + 1):
+                for start in range(len(job_skill) - length + 1):
+                    self._grams.setdefault(job_skill[start:start + length], set()).add(column)
+        self._longest_skill = max(map(len, self.vocabulary), default=0)
+
+        # Binary job x skill matrix and per-job required skill counts
+        shape = (len(jobs), max(len(self.vocabulary), 1))
+        self.binary = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=shape
+        )
+        self.skill_counts = np.array([len(job["required_skills"]) for job in jobs], dtype=np.float32)
+
+        # Smoothed IDF so rare skills weigh more; rows L2-normalized for cosine scoring
+        document_frequency = np.bincount(cols, minlength=shape[1]).astype(np.float32)
+        self.idf = np.log((1 + len(jobs)) / (1 + document_frequency)) + 1
+        weighted = self.binary.multiply(self.idf).tocsr()
+        norms = np.sqrt(weighted.multiply(weighted).sum(axis=1)).A1
+        norms[norms == 0] = 1
+        self.weights = sparse.diags(1 / norms).dot(weighted).tocsr()
+
+        self._skill_columns: Dict[str, np.ndarray] = {}
+        self._lookup_lock = threading.Lock()
+
+    def skill_columns(self, skill: str) -> np.ndarray:
+        """Vocabulary columns matching a user skill.
+
+        An exact vocabulary hit wins; otherwise fall back to fuzzy substring
+        matching in either direction (e.g. "react" vs "react native").
+        """
+        columns = self._skill_columns.get(skill)
+        if columns is None:
+            if skill in self.vocabulary:
+                columns = np.array([self.vocabulary[skill]], dtype=np.int32)
+            else:
+                columns = np.array(sorted(self._fuzzy_columns(skill)), dtype=np.int32)
+            with self._lookup_lock:
+                if len(self._skill_columns) >= self.MAX_SKILL_LOOKUPS:
+                    self._skill_columns.clear()
+                self._skill_columns[skill] = columns
+        return columns
+
+    def _fuzzy_columns(self, skill: str) -> set:
+        """Columns of vocabulary skills that contain or are contained in ``skill``"""
+        # Vocabulary skills inside the user skill: look up its substrings
+        found = set()
+        for start in range(len(skill)):
+            for end in range(start + 1, min(len(skill), start + self._longest_skill) + 1):
+                column = self.vocabulary.get(skill[start:end])
+                if column is not None:
+                    found.add(column)
+
+        # Vocabulary skills containing the user skill: intersect the columns
+        # holding each of its substrings, then check the survivors
+        if len(skill) <= self.GRAM:
+            return found | self._grams.get(skill, set())
+        postings = sorted(
+            (self._grams.get(skill[start:start + self.GRAM], set()) for start in range(len(skill) - self.GRAM + 1)),
+            key=len
+        )
+        candidates = postings[0].intersection(*postings[1:])
+        return found | {column for column in candidates if skill in self.vocabulary_list[column]}
 
 
 class JobMatcher:
-    def __init__(self):
-        # Mock job database with realistic job postings
-        self.job_database = [
-            {
-                "id": 1,
-                "title": "Full Stack Developer",
-                "company": "TechCorp Solutions",
-                "location": "Bangalore, India",
-                "type": "Full-time",
-                "experience": "2-4 years",
-                "salary": "₹8-12 LPA",
-                "required_skills": ["Python", "React", "Node.js", "MongoDB", "REST API"],
-                "description": "Looking for a full stack developer to build scalable web applications.",
-                "posted_date": "2 days ago"
-            },
-            {
-                "id": 2,
-                "title": "Data Scientist",
-                "company": "DataMinds Analytics",
-                "location": "Hyderabad, India",
-                "type": "Full-time",
-                "experience": "1-3 years",
-                "salary": "₹10-15 LPA",
-                "required_skills": ["Python", "Machine Learning", "Pandas", "Scikit-Learn", "SQL"],
-                "description": "Join our team to work on cutting-edge ML projects and data analysis.",
-                "posted_date": "1 week ago"
-            },
-            {
-                "id": 3,
-                "title": "Frontend Developer",
-                "company": "WebWorks India",
-                "location": "Pune, India",
-                "type": "Full-time",
-                "experience": "1-2 years",
-                "salary": "₹6-9 LPA",
-                "required_skills": ["React", "JavaScript", "HTML", "CSS", "TypeScript"],
-                "description": "Create beautiful and responsive user interfaces for our clients.",
-                "posted_date": "3 days ago"
-            },
-            {
-                "id": 4,
-                "title": "Backend Developer",
-                "company": "CloudTech Systems",
-                "location": "Mumbai, India",
-                "type": "Full-time",
-                "experience": "2-5 years",
-                "salary": "₹9-14 LPA",
-                "required_skills": ["Java", "Spring", "MySQL", "REST API", "Microservices"],
-                "description": "Build robust backend systems and APIs for enterprise applications.",
-                "posted_date": "5 days ago"
-            },
-            {
-                "id": 5,
-                "title": "Machine Learning Engineer",
-                "company": "AI Innovations Lab",
-                "location": "Bangalore, India",
-                "type": "Full-time",
-                "experience": "2-4 years",
-                "salary": "₹12-18 LPA",
-                "required_skills": ["Python", "TensorFlow", "PyTorch", "Deep Learning", "NLP"],
-                "description": "Work on state-of-the-art AI models and deploy them at scale.",
-                "posted_date": "1 day ago"
-            },
-            {
-                "id": 6,
-                "title": "DevOps Engineer",
-                "company": "InfraCloud Technologies",
-                "location": "Remote",
-                "type": "Full-time",
-                "experience": "2-4 years",
-                "salary": "₹10-16 LPA",
-                "required_skills": ["Docker", "Kubernetes", "AWS", "Jenkins", "CI/CD"],
-                "description": "Manage cloud infrastructure and automate deployment pipelines.",
-                "posted_date": "4 days ago"
-            },
-            {
-                "id": 7,
-                "title": "Mobile App Developer",
-                "company": "AppGenius Studio",
-                "location": "Delhi NCR, India",
-                "type": "Full-time",
-                "experience": "1-3 years",
-                "salary": "₹7-11 LPA",
-                "required_skills": ["React Native", "Flutter", "Android", "iOS", "JavaScript"],
-                "description": "Develop cross-platform mobile applications for diverse clients.",
-                "posted_date": "1 week ago"
-            },
-            {
-                "id": 8,
-                "title": "Data Analyst",
-                "company": "Business Intelligence Corp",
-                "location": "Chennai, India",
-                "type": "Full-time",
-                "experience": "0-2 years",
-                "salary": "₹5-8 LPA",
-                "required_skills": ["SQL", "Python", "Data Science", "Excel", "Tableau"],
-                "description": "Analyze business data and create insightful reports and dashboards.",
-                "posted_date": "2 days ago"
-            },
-            {
-                "id": 9,
-                "title": "Cloud Solutions Architect",
-                "company": "CloudFirst Consulting",
-                "location": "Bangalore, India",
-                "type": "Full-time",
-                "experience": "4-6 years",
-                "salary": "₹15-22 LPA",
-                "required_skills": ["AWS", "Azure", "GCP", "Cloud Computing", "Microservices"],
-                "description": "Design and implement cloud-native solutions for enterprise clients.",
-                "posted_date": "3 days ago"
-            },
-            {
-                "id": 10,
-                "title": "Python Developer",
-                "company": "CodeCraft Solutions",
-                "location": "Hyderabad, India",
-                "type": "Full-time",
-                "experience": "1-3 years",
-                "salary": "₹6-10 LPA",
-                "required_skills": ["Python", "Django", "Flask", "PostgreSQL", "REST API"],
-                "description": "Develop backend services and APIs using Python frameworks.",
-                "posted_date": "6 days ago"
-            },
-            {
-                "id": 11,
-                "title": "UI/UX Designer",
-                "company": "DesignHub Creative",
-                "location": "Pune, India",
-                "type": "Full-time",
-                "experience": "2-4 years",
-                "salary": "₹7-12 LPA",
-                "required_skills": ["Figma", "Adobe XD", "Prototyping", "User Research", "Design"],
-                "description": "Create intuitive and beautiful user experiences for digital products.",
-                "posted_date": "4 days ago"
-            },
-            {
-                "id": 12,
-                "title": "Cybersecurity Analyst",
-                "company": "SecureNet Technologies",
-                "location": "Mumbai, India",
-                "type": "Full-time",
-                "experience": "2-5 years",
-                "salary": "₹9-15 LPA",
-                "required_skills": ["Cybersecurity", "Network Security", "Penetration Testing", "Security"],
-                "description": "Protect our systems and data from security threats and vulnerabilities.",
-                "posted_date": "1 week ago"
-            },
-            {
-                "id": 13,
-                "title": "Software Engineer Intern",
-                "company": "StartupHub India",
-                "location": "Bangalore, India",
-                "type": "Internship",
-                "experience": "0-1 years",
-                "salary": "₹15,000-25,000/month",
-                "required_skills": ["Python", "JavaScript", "Git", "Problem Solving"],
-                "description": "Learn and grow with our dynamic startup team. Fresh graduates welcome!",
-                "posted_date": "2 days ago"
-            },
-            {
-                "id": 14,
-                "title": "Blockchain Developer",
-                "company": "CryptoTech Ventures",
-                "location": "Remote",
-                "type": "Full-time",
-                "experience": "2-4 years",
-                "salary": "₹12-20 LPA",
-                "required_skills": ["Blockchain", "Solidity", "Ethereum", "Web3", "Smart Contracts"],
-                "description": "Build decentralized applications and smart contracts on blockchain.",
-                "posted_date": "5 days ago"
-            },
-            {
-                "id": 15,
-                "title": "QA Automation Engineer",
-                "company": "TestPro Solutions",
-                "location": "Chennai, India",
-                "type": "Full-time",
-                "experience": "2-4 years",
-                "salary": "₹7-11 LPA",
-                "required_skills": ["Selenium", "Python", "Java", "Testing", "Automation"],
-                "description": "Automate testing processes and ensure software quality.",
-                "posted_date": "3 days ago"
-            },
-            {
-                "id": 16,
-                "title": "AI Research Scientist",
-                "company": "DeepMind Research Lab",
-                "location": "Bangalore, India",
-                "type": "Full-time",
-                "experience": "3-6 years",
-                "salary": "₹18-28 LPA",
-                "required_skills": ["Deep Learning", "AI", "Research", "Python", "TensorFlow"],
-                "description": "Conduct cutting-edge research in artificial intelligence and publish papers.",
-                "posted_date": "1 week ago"
-            },
-            {
-                "id": 17,
-                "title": "Project Manager - IT",
-                "company": "GlobalTech Enterprises",
-                "location": "Mumbai, India",
-                "type": "Full-time",
-                "experience": "5-8 years",
-                "salary": "₹15-25 LPA",
-                "required_skills": ["Project Management", "Agile", "Scrum", "Leadership", "Communication"],
-                "description": "Lead and manage IT projects from conception to delivery.",
-                "posted_date": "4 days ago"
-            },
-            {
-                "id": 18,
-                "title": "React Native Developer",
-                "company": "MobileFirst Apps",
-                "location": "Hyderabad, India",
-                "type": "Full-time",
-                "experience": "1-3 years",
-                "salary": "₹7-12 LPA",
-                "required_skills": ["React Native", "JavaScript", "Mobile Development", "React", "Redux"],
-                "description": "Build high-performance mobile apps using React Native framework.",
-                "posted_date": "2 days ago"
-            },
-            {
-                "id": 19,
-                "title": "Database Administrator",
-                "company": "DataSafe Systems",
-                "location": "Pune, India",
-                "type": "Full-time",
-                "experience": "3-5 years",
-                "salary": "₹9-14 LPA",
-                "required_skills": ["SQL", "MySQL", "PostgreSQL", "Database", "Performance Tuning"],
-                "description": "Manage and optimize database systems for high availability and performance.",
-                "posted_date": "6 days ago"
-            },
-            {
-                "id": 20,
-                "title": "Technical Content Writer",
-                "company": "TechDocs Media",
-                "location": "Remote",
-                "type": "Full-time",
-                "experience": "1-3 years",
-                "salary": "₹5-8 LPA",
-                "required_skills": ["Technical Writing", "Documentation", "Communication", "Research"],
-                "description": "Create technical documentation, tutorials, and blog posts for developers.",
-                "posted_date": "5 days ago"
-            }
-        ]
-    
-    def find_matching_jobs(self, user_skills: List[str], max_results: int = 5) -> List[Dict]:
+    def __init__(self, catalog_path: Optional[str] = None):
+        # LRU cache of recommendations keyed by normalized skill set
+        self.cache_size = int(os.getenv("JOB_CACHE_SIZE", "1024"))
+        self._cache: "OrderedDict[Tuple, List[Dict]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        # Job catalog loaded from disk (JSON, CSV or SQLite)
+        self.catalog_path = catalog_path or os.getenv("JOB_CATALOG_PATH") or str(DEFAULT_CATALOG_PATH)
+        self.catalog_table = os.getenv("JOB_CATALOG_TABLE", "jobs")
+        self.catalog_load_seconds = 0.0
+        self._index = CatalogIndex([], 0)
+        self._watcher: Optional[CatalogWatcher] = None
+        self.reload_catalog()
+
+    @property
+    def job_database(self) -> List[Dict]:
+        return self._index.jobs
+
+    @property
+    def jobs_by_id(self) -> Dict[int, Dict]:
+        return self._index.jobs_by_id
+
+    @property
+    def catalog_version(self) -> int:
+        return self._index.version
+
+    def reload_catalog(self):
+        """Load the catalog file and swap it in"""
+        start = time.perf_counter()
+        jobs = load_catalog(self.catalog_path, self.catalog_table)
+        self.set_catalog(jobs)
+        self.catalog_load_seconds = time.perf_counter() - start
+        print(f"💼 Loaded {len(jobs)} jobs from {self.catalog_path} in {self.catalog_load_seconds:.2f}s")
+
+    def start_auto_reload(self, interval: Optional[float] = None):
+        """Watch the catalog file and hot-reload it in the background on change"""
+        if self._watcher is None:
+            interval = interval or float(os.getenv("JOB_CATALOG_POLL_SECONDS", "5"))
+            self._watcher = CatalogWatcher(self.catalog_path, self._on_catalog_change, interval, self.catalog_table)
+        self._watcher.start()
+
+    def stop_auto_reload(self):
+        if self._watcher:
+            self._watcher.stop()
+
+    def _on_catalog_change(self, jobs: List[Dict]):
+        start = time.perf_counter()
+        self.set_catalog(jobs)
+        print(f"🔄 Job catalog reloaded: {len(jobs)} jobs indexed in {time.perf_counter() - start:.2f}s")
+
+    def set_catalog(self, jobs: List[Dict]):
+        """Replace the job catalog and invalidate cached recommendations"""
+        # Build the index outside the lock; only the swap itself is serialized
+        index = CatalogIndex(jobs, self._index.version + 1)
+        with self._cache_lock:
+            self._index = index
+            self._cache.clear()
+
+    @staticmethod
+    def normalize_skills(user_skills: List[str]) -> Tuple[str, ...]:
+        """Normalize a skill list into a hashable, order-independent key"""
+        return tuple(sorted({skill.strip().lower() for skill in user_skills if skill and skill.strip()}))
+
+    def recommend(self, user_skills: List[str], max_results: int = 5, pad_random: bool = False) -> List[Dict]:
+        """Get compact recommendations (job id + scores) for a skill set.
+
+        Results are cached per normalized skill set; the cache is cleared
+        whenever the catalog changes. Random padding is added after the
+        lookup, so it is never cached.
+        """
+        return self.recommend_batch([user_skills], max_results, pad_random)[0]
+
+    def recommend_batch(self, skill_sets: List[List[str]], max_results: int = 5, pad_random: bool = False) -> List[List[Dict]]:
+        """Get compact recommendations for many documents, scoring cache misses in one pass"""
+        keys = [(self.normalize_skills(skills), max_results) for skills in skill_sets]
+        results: List[Optional[List[Dict]]] = [None] * len(keys)
+        misses: Dict[Tuple, List[int]] = {}
+
+        with self._cache_lock:
+            for i, key in enumerate(keys):
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    self.cache_hits += 1
+                    results[i] = cached
+                else:
+                    self.cache_misses += 1
+                    misses.setdefault(key, []).append(i)
+            index = self._index
+
+        if misses:
+            miss_keys = list(misses)
+            scored = self._score_batch(index, [list(key[0]) for key in miss_keys], max_results)
+
+            with self._cache_lock:
+                for key, recommendations in zip(miss_keys, scored):
+                    for i in misses[key]:
+                        results[i] = recommendations
+                    # Don't cache results computed against a catalog that was swapped meanwhile
+                    if index is self._index:
+                        self._cache[key] = recommendations
+                        if len(self._cache) > self.cache_size:
+                            self._cache.popitem(last=False)
+
+        results = [[rec.copy() for rec in recommendations] for recommendations in results]
+        if pad_random:
+            for recommendations in results:
+                self._pad_random(index, recommendations, max_results)
+        return results
+
+    @staticmethod
+    def _pad_random(index: CatalogIndex, recommendations: List[Dict], max_results: int):
+        """Fill up a short result list with random (unmatched) jobs"""
+        remaining = max_results - len(recommendations)
+        if remaining <= 0:
+            return
+        matched_ids = {rec["id"] for rec in recommendations}
+        other_jobs = [job for job in index.jobs if job["id"] not in matched_ids]
+        for job in random.sample(other_jobs, min(remaining, len(other_jobs))):
+            recommendations.append({"id": job["id"], "match_score": 0, "matching_skills": 0})
+
+    def hydrate(self, recommendations: List[Dict]) -> List[Dict]:
+        """Expand stored recommendations into full job objects from the catalog.
+
+        Rows written before recommendations were stored compactly already hold
+        full job dicts; those are refreshed from the catalog when the job still
+        exists and returned as stored otherwise.
+        """
+        jobs_by_id = self.jobs_by_id
+        hydrated = []
+        for rec in recommendations:
+            job = jobs_by_id.get(rec.get("id"))
+            if job is None:
+                if "title" in rec:
+                    hydrated.append(rec)
+                continue
+            job_with_score = job.copy()
+            job_with_score["match_score"] = rec.get("match_score", 0)
+            job_with_score["matching_skills"] = rec.get("matching_skills", 0)
+            hydrated.append(job_with_score)
+        return hydrated
+
+    def cache_info(self) -> Dict:
+        """Recommendation cache and catalog statistics"""
+        return {
+            "catalog_version": self.catalog_version,
+            "catalog_size": len(self.job_database),
+            "catalog_load_seconds": round(self.catalog_load_seconds, 3),
+            "size": len(self._cache),
+            "max_size": self.cache_size,
+            "hits": self.cache_hits,
+            "misses": self.cache_misses
+        }
+
+    def find_matching_jobs(self, user_skills: List[str], max_results: int = 5, pad_random: bool = False) -> List[Dict]:
         """Find jobs matching user skills"""
-        if not user_skills:
-            # Return random jobs if no skills provided
-            return random.sample(self.job_database, min(max_results, len(self.job_database)))
-        
-        # Normalize skills for comparison
-        user_skills_lower = [skill.lower() for skill in user_skills]
-        
-        # Calculate match scores for each job
-        job_scores = []
-        for job in self.job_database:
-            job_skills_lower = [skill.lower() for skill in job["required_skills"]]
-            
-            # Count matching skills
-            matches = sum(1 for skill in user_skills_lower if any(job_skill in skill or skill in job_skill for job_skill in job_skills_lower))
-            
-            if matches > 0:
-                match_percentage = (matches / len(job["required_skills"])) * 100
-                job_with_score = job.copy()
-                job_with_score["match_score"] = round(match_percentage, 1)
-                job_with_score["matching_skills"] = matches
-                job_scores.append(job_with_score)
-        
-        # Sort by match score
-        job_scores.sort(key=lambda x: (x["match_score"], x["matching_skills"]), reverse=True)
-        
-        # Return top matches
-        top_matches = job_scores[:max_results]
-        
-        # If not enough matches, add some random jobs
-        if len(top_matches) < max_results:
-            remaining = max_results - len(top_matches)
-            matched_ids = {job["id"] for job in top_matches}
-            other_jobs = [job for job in self.job_database if job["id"] not in matched_ids]
-            additional = random.sample(other_jobs, min(remaining, len(other_jobs)))
-            
-            for job in additional:
-                job_copy = job.copy()
-                job_copy["match_score"] = 0
-                job_copy["matching_skills"] = 0
-                top_matches.append(job_copy)
-        
-        return top_matches
+        return self.hydrate(self.recommend(user_skills, max_results, pad_random))
+
+    def _score_batch(
+        self,
+        index: CatalogIndex,
+        skill_sets: List[List[str]],
+        max_results: int
+    ) -> List[List[Dict]]:
+        """Score the catalog against many skill sets with IDF-weighted cosine similarity.
+
+        ``match_score`` is the cosine similarity (as a percentage) between the
+        IDF-weighted skill vectors of the job and the document;
+        ``matching_skills`` counts document skills that match any of the job's
+        required skills. Ties are broken by catalog order, so results are
+        deterministic.
+        """
+        num_docs = len(skill_sets)
+        num_skills = index.binary.shape[1]
+
+        # User skill x vocabulary matrix, plus the document each user skill belongs to
+        skill_rows, skill_cols, owners = [], [], []
+        row = 0
+        for doc, skills in enumerate(skill_sets):
+            for skill in skills:
+                columns = index.skill_columns(skill)
+                skill_rows.extend([row] * len(columns))
+                skill_cols.extend(columns.tolist())
+                owners.append(doc)
+                row += 1
+        user_skills = sparse.csr_matrix(
+            (np.ones(len(skill_rows), dtype=np.float32), (skill_rows, skill_cols)), shape=(row, num_skills)
+        )
+        assignment = sparse.csr_matrix(
+            (np.ones(row, dtype=np.float32), (owners, np.arange(row))), shape=(num_docs, row)
+        )
+
+        # Document skill vectors: IDF-weighted, L2-normalized union of matched columns
+        documents = (assignment @ user_skills).sign().multiply(index.idf).tocsr()
+        norms = np.sqrt(documents.multiply(documents).sum(axis=1)).A1
+        norms[norms == 0] = 1
+        documents = sparse.diags(1 / norms).dot(documents)
+
+        # Job x document cosine scores and matching skill counts, all in one pass
+        scores = (index.weights @ documents.T).tocsc()
+        matches = ((index.binary @ user_skills.T).sign() @ assignment.T).tocsc()
+
+        results = []
+        for doc in range(num_docs):
+            start, end = scores.indptr[doc], scores.indptr[doc + 1]
+            positions = scores.indices[start:end]
+            doc_scores = np.round(scores.data[start:end].astype(np.float64) * 100, 1)
+            doc_matches = matches[:, doc].toarray().ravel()[positions] if len(positions) else positions
+
+            # Sort by match score, then matching skills, then catalog order
+            order = np.lexsort((positions, -doc_matches, -doc_scores))[:max_results]
+            top_matches = [
+                {
+                    "id": index.jobs[positions[i]]["id"],
+                    "match_score": float(doc_scores[i]),
+                    "matching_skills": int(doc_matches[i])
+                }
+                for i in order
+            ]
+
+            results.append(top_matches)
+
+        return results
@@ -1,20 +1,31 @@
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+from fastapi import FastAPI, File, UploadFile, Form, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from typing import List, Optional
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Optional, Sequence
 import os
-import shutil
 from datetime import datetime
 import json
 import asyncio
-from pathlib import Path
+import time
 
-from database import Database, DocumentRecord
+from database import DocumentRecord
+from document_store import create_document_store
 from ocr_service import OCRService
+from reader_pool import parse_languages
 from ai_service import AIService
 from job_matcher import JobMatcher
+from reprocessor import Reprocessor
+from storage import UploadStorage
+from scheduler import FairScheduler, RateLimitExceeded
+from profiling import Profiler
+from dedup import DuplicateDetector, DuplicateMatch, Fingerprint, file_digest, simhash, to_hex
+import profiling
+from responses import FastJSONResponse
+from http_compression import CompressionMiddleware
+import exporter
 
-app = FastAPI(title="AI Document Parser API")
+app = FastAPI(title="AI Document Parser API", default_response_class=FastJSONResponse)
 
 # CORS middleware for frontend access
 app.add_middleware(
@@ -25,25 +36,52 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# brotli/gzip for large JSON payloads, negotiated per request
+app.add_middleware(CompressionMiddleware)
+
 # Initialize services
-db = Database()
+db = create_document_store()
 ocr_service = OCRService()
 ai_service = AIService()
 job_matcher = JobMatcher()
+reprocessor = Reprocessor(db, ai_service, job_matcher)
+
+# Sharded storage for uploaded originals
+storage = UploadStorage(os.getenv("UPLOAD_DIR", "uploads"))
+
+# Fair, rate-limited scheduling of OCR work across users
+scheduler = FairScheduler()
+profiler = Profiler()
 
-# Create uploads directory
-UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
+# Per-user exact and near-duplicate lookup at ingest
+duplicates = DuplicateDetector(db)
 
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize services on startup"""
-    db.init_db()
+    await db.init_db()
     await ocr_service.initialize()
+    await storage.start(db)
+    scheduler.start()
+    if os.getenv("JOB_CATALOG_AUTO_RELOAD", "1") == "1":
+        job_matcher.start_auto_reload()
+    resumed = await reprocessor.resume_interrupted()
+    if resumed:
+        print(f"🔁 Resumed reprocess jobs: {resumed}")
     print("✅ Server started successfully")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background workers"""
+    job_matcher.stop_auto_reload()
+    await storage.stop()
+    scheduler.stop()
+    ai_service.close()
+    await db.close()
+
+
 @app.get("/")
 async def root():
     return {"message": "AI Document Parser API", "status": "running"}
@@ -54,7 +92,7 @@ async def health_check():
     """Server health check endpoint"""
     try:
         # Check database
-        db_status = db.check_health()
+        db_status = await db.check_health()
         
         # Check OCR service
         ocr_status = ocr_service.is_ready()
@@ -63,7 +101,7 @@ async def health_check():
         ai_status = ai_service.is_ready()
         
         # Get system stats
-        total_docs = db.get_total_documents()
+        total_docs = await db.get_total_documents()
         
         return {
             "status": "healthy" if all([db_status, ocr_status, ai_status]) else "degraded",
@@ -73,6 +111,7 @@ async def health_check():
                 "ocr": "online" if ocr_status else "offline",
                 "ai": "online" if ai_status else "offline"
             },
+            "ai": ai_service.status(),
             "stats": {
                 "total_documents_processed": total_docs,
                 "uptime": "running"
@@ -89,56 +128,127 @@ async def health_check():
 @app.post("/upload")
 async def upload_documents(
     username: str = Form(...),
-    files: List[UploadFile] = File(...)
+    files: List[UploadFile] = File(...),
+    languages: Optional[str] = Form(None),
+    duplicate_policy: Optional[str] = Form(None),
+    x_profile: Optional[str] = Header(None)
 ):
-    """Upload and process multiple documents"""
-    results = []
+    """Upload and process multiple documents.
+    
+    ``languages`` (e.g. "hi,en") picks the OCR reader; by default the
+    script is detected per document. ``duplicate_policy`` is "flag" (store
+    and mark duplicates) or "reuse" (return the existing document).
+    ``X-Profile: 1`` profiles each file and returns its ``profile_id``.
+    """
+    ocr_languages = parse_languages(languages)
+    try:
+        policy = duplicates.policy(duplicate_policy)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    profile_requested = profiler.wants(x_profile)
+    valid_files = [
+        file for file in files
+        if file.filename.lower().endswith(('.pdf', '.jpg', '.jpeg', '.png'))
+    ]
+    
+    # Per-user rate limit and global queue limit for OCR work
+    try:
+        scheduler.admit(username, len(valid_files))
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except RateLimitExceeded as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
     
-    for file in files:
+    async def handle(file: UploadFile):
+        # Validate file type
+        if file not in valid_files:
+            return {
+                "filename": file.filename,
+                "status": "error",
+                "error": "Invalid file type. Only PDF, JPG, PNG allowed."
+            }
+        
+        handed_over = False
         try:
-            # Validate file type
-            if not file.filename.lower().endswith(('.pdf', '.jpg', '.jpeg', '.png')):
-                results.append({
-                    "filename": file.filename,
-                    "status": "error",
-                    "error": "Invalid file type. Only PDF, JPG, PNG allowed."
-                })
-                continue
-            
-            # Create user directory
-            user_dir = UPLOAD_DIR / username
-            user_dir.mkdir(exist_ok=True)
-            
-            # Save file with timestamp
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            file_ext = Path(file.filename).suffix
-            safe_filename = f"{timestamp}_{file.filename}"
-            file_path = user_dir / safe_filename
-            
-            # Save uploaded file
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
+            # Save uploaded file into sharded storage
+            file_path = await asyncio.to_thread(storage.save, file.filename, file.file)
             
-            # Process document
-            result = await process_document(username, str(file_path), file.filename)
-            results.append(result)
+            # Process document (OCR is queued fairly across users); it owns the reservation from here
+            handed_over = True
+            return await process_document(username, file_path, file.filename, ocr_languages, policy, profile_requested)
             
         except Exception as e:
-            results.append({
+            return {
                 "filename": file.filename,
                 "status": "error",
                 "error": str(e)
-            })
+            }
+        finally:
+            if not handed_over:
+                scheduler.release(username)
     
-    return {"results": results}
+    results = await asyncio.gather(*(handle(file) for file in files))
+    return FastJSONResponse({"results": list(results)})
 
 
-async def process_document(username: str, file_path: str, original_filename: str):
+async def process_document(
+    username: str,
+    file_path: str,
+    original_filename: str,
+    languages: Optional[Sequence[str]] = None,
+    duplicate_policy: str = "flag",
+    profile_requested: bool = False
+):
     """Process a single document through OCR and AI analysis"""
+    profile = profiler.begin(username, original_filename, profile_requested)
     try:
+        with profiling.activate(profile):
+            result = await _process_document(username, file_path, original_filename, languages, duplicate_policy)
+    finally:
+        # Also stops the sampler thread when the upload is cancelled
+        profile_id = await profiler.finish(profile)
+    
+    if profile_id:
+        result["profile_id"] = profile_id
+    return result
+
+
+async def _process_document(
+    username: str,
+    file_path: str,
+    original_filename: str,
+    languages: Optional[Sequence[str]] = None,
+    duplicate_policy: str = "flag"
+):
+    """Run one admitted upload; its scheduler reservation is released unless OCR was queued"""
+    submitted = False
+    try:
+        # Step 0: Exact re-upload check, before any OCR work
+        with profiling.stage("duplicate_check"):
+            fingerprint = Fingerprint(content_hash=await asyncio.to_thread(file_digest, file_path))
+            duplicate = await duplicates.find(username, fingerprint, load_document=duplicate_policy == "reuse")
+        if duplicate and duplicate_policy == "reuse":
+            return _reuse_duplicate(original_filename, file_path, duplicate)
+        
         # Step 1: OCR - Extract text
         print(f"🔍 Processing OCR for {original_filename}...")
-        ocr_text = await ocr_service.extract_text(file_path)
+        profile = profiling.current()
+        queued_at = time.perf_counter()
+        
+        async def run_ocr():
+            if profile is not None:
+                profile.record("ocr_queue_wait", time.perf_counter() - queued_at)
+            with profiling.stage("ocr"):
+                return await ocr_service.extract_text(file_path, languages)
+        
+        # Scheduler workers run jobs in their own task, so hand the profile over.
+        # submit() takes over the reservation before it first awaits.
+        submitted = True
+        ocr_text = await scheduler.submit(username, lambda: profiling.run_with(profile, run_ocr()))
         
         if not ocr_text or len(ocr_text.strip()) < 10:
             return {
@@ -147,41 +257,72 @@ async def process_document(username: str, file_path: str, original_filename: str
                 "error": "Could not extract sufficient text from document"
             }
         
+        # Near duplicates (rescans, photos of the same document) need the text
+        with profiling.stage("duplicate_check"):
+            fingerprint.image_hash = await asyncio.to_thread(ocr_service.image_hash, file_path)
+            fingerprint.text_hash = await asyncio.to_thread(simhash, ocr_text)
+            if duplicate is None:
+                duplicate = await duplicates.find(username, fingerprint, ocr_text, load_document=duplicate_policy == "reuse")
+        if duplicate:
+            print(f"♻️ {original_filename} duplicates document {duplicate.document_id} ({duplicate.kind})")
+            if duplicate_policy == "reuse":
+                return _reuse_duplicate(original_filename, file_path, duplicate)
+        
+        ocr_preview = ocr_text[:500] + "..." if len(ocr_text) > 500 else ocr_text
+        
         # Step 2: AI Analysis - Categorize and extract skills
         print(f"🤖 Analyzing document with AI...")
-        ai_analysis = await ai_service.analyze_document(ocr_text)
+        with profiling.stage("ai_analysis"):
+            ai_analysis = await ai_service.analyze_document(ocr_text)
         
         # Step 3: Job Matching
         print(f"💼 Finding relevant jobs...")
-        job_recommendations = job_matcher.find_matching_jobs(ai_analysis.get("skills", []))
+        with profiling.stage("job_matching", sample=True):
+            job_recommendations = await asyncio.to_thread(job_matcher.recommend, ai_analysis.get("skills", []))
+        
+        metadata = ai_analysis.get("metadata", {})
+        if duplicate:
+            metadata = {**metadata, "duplicate_of": duplicate.document_id}
         
         # Step 4: Save to database
         doc_record = DocumentRecord(
+            content_hash=fingerprint.content_hash,
+            image_hash=to_hex(fingerprint.image_hash),
+            text_hash=to_hex(fingerprint.text_hash),
             username=username,
             original_filename=original_filename,
             file_path=file_path,
             ocr_text=ocr_text,
             document_type=ai_analysis.get("document_type", "Unknown"),
             skills=json.dumps(ai_analysis.get("skills", [])),
-            metadata=json.dumps(ai_analysis.get("metadata", {})),
+            metadata=json.dumps(metadata),
             job_recommendations=json.dumps(job_recommendations),
             timestamp=datetime.now().isoformat()
         )
+        # The record holds the only remaining reference to the full text
+        del ocr_text
         
-        doc_id = db.insert_document(doc_record)
+        with profiling.stage("db_insert"):
+            doc_id = await db.insert_document(doc_record)
+        del doc_record
+        duplicates.add(username, doc_id, fingerprint)
         
-        return {
+        result = {
             "filename": original_filename,
             "status": "success",
             "document_id": doc_id,
             "data": {
                 "document_type": ai_analysis.get("document_type"),
                 "skills": ai_analysis.get("skills", []),
-                "metadata": ai_analysis.get("metadata", {}),
-                "job_recommendations": job_recommendations,
-                "ocr_preview": ocr_text[:500] + "..." if len(ocr_text) > 500 else ocr_text
+                "metadata": metadata,
+                "analysis_source": ai_analysis.get("analysis_source"),
+                "job_recommendations": job_matcher.hydrate(job_recommendations),
+                "ocr_preview": ocr_preview
             }
         }
+        if duplicate:
+            result["duplicate"] = {**duplicate.to_dict(), "policy": duplicate_policy}
+        return result
         
     except Exception as e:
         print(f"❌ Error processing document: {str(e)}")
@@ -190,18 +331,44 @@ async def process_document(username: str, file_path: str, original_filename: str
             "status": "error",
             "error": str(e)
         }
+    finally:
+        # Also runs when the client disconnects (CancelledError) before OCR was queued
+        if not submitted:
+            scheduler.release(username)
+
+
+def _reuse_duplicate(original_filename: str, file_path: str, duplicate: DuplicateMatch):
+    """Result for an upload answered with the user's existing document"""
+    # The existing document keeps its own copy of the file
+    storage.schedule_delete(file_path)
+    document = duplicate.document
+    ocr_text = document.get("ocr_text") or ""
+    return {
+        "filename": original_filename,
+        "status": "success",
+        "document_id": duplicate.document_id,
+        "duplicate": {**duplicate.to_dict(), "policy": "reuse"},
+        "data": {
+            "document_type": document.get("document_type"),
+            "skills": document.get("skills", []),
+            "metadata": document.get("metadata", {}),
+            "analysis_source": (document.get("metadata") or {}).get("analysis_source"),
+            "job_recommendations": job_matcher.hydrate(document.get("job_recommendations", [])),
+            "ocr_preview": ocr_text[:500] + "..." if len(ocr_text) > 500 else ocr_text
+        }
+    }
 
 
 @app.get("/documents")
 async def get_all_documents(username: Optional[str] = None):
     """Get all processed documents, optionally filtered by username"""
     try:
-        documents = db.get_all_documents(username)
-        return {
+        documents = await db.get_all_documents(username)
+        return FastJSONResponse({
             "status": "success",
             "count": len(documents),
             "documents": documents
-        }
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -210,13 +377,14 @@ async def get_all_documents(username: Optional[str] = None):
 async def get_document(document_id: int):
     """Get detailed information about a specific document"""
     try:
-        document = db.get_document_by_id(document_id)
+        document = await db.get_document_by_id(document_id)
         if not document:
             raise HTTPException(status_code=404, detail="Document not found")
-        return {
+        document["job_recommendations"] = job_matcher.hydrate(document["job_recommendations"])
+        return FastJSONResponse({
             "status": "success",
             "document": document
-        }
+        })
     except HTTPException:
         raise
     except Exception as e:
@@ -227,18 +395,14 @@ async def get_document(document_id: int):
 async def delete_document(document_id: int):
     """Delete a document and its associated file"""
     try:
-        # Get document info
-        document = db.get_document_by_id(document_id)
-        if not document:
+        # Delete from database
+        file_paths = await db.delete_documents(ids=[document_id])
+        if not file_paths:
             raise HTTPException(status_code=404, detail="Document not found")
+        duplicates.remove(document_id)
         
-        # Delete file from filesystem
-        file_path = Path(document["file_path"])
-        if file_path.exists():
-            file_path.unlink()
-        
-        # Delete from database
-        db.delete_document(document_id)
+        # Delete file from filesystem in the background
+        storage.schedule_delete(file_paths[0])
         
         return {
             "status": "success",
@@ -250,11 +414,218 @@ async def delete_document(document_id: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+class DocumentSelection(BaseModel):
+    ids: Optional[List[int]] = None
+    username: Optional[str] = None
+    date_from: Optional[str] = None  # ISO timestamp, inclusive
+    date_to: Optional[str] = None  # ISO timestamp, exclusive
+
+
+@app.post("/documents/bulk-delete")
+async def bulk_delete_documents(selection: DocumentSelection):
+    """Delete documents by ids, user and/or date range in a single transaction"""
+    try:
+        file_paths = await db.delete_documents(**selection.dict())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    # Every filter is ANDed, so only that user's documents can be gone
+    duplicates.forget(selection.username)
+    
+    # Original files are removed by the background reaper
+    for file_path in file_paths:
+        storage.schedule_delete(file_path)
+    
+    return {
+        "status": "success",
+        "deleted": len(file_paths),
+        "files_scheduled_for_removal": sum(1 for file_path in file_paths if storage.owns(file_path))
+    }
+
+
+@app.post("/documents/bulk-export")
+async def bulk_export_documents(selection: DocumentSelection, format: str = "ndjson", flatten: bool = False):
+    """Stream full documents selected by ids, user and/or date range.
+
+    Rows are read through a cursor as in ``/export``, so memory does not
+    grow with the selection. NDJSON keeps JSON fields nested unless
+    ``flatten`` is set, with job recommendations expanded from the catalog.
+    """
+    filters = selection.dict()
+    if selection.ids is not None and not selection.ids:
+        raise HTTPException(status_code=400, detail="No documents selected (ids is empty)")
+    if not any(filters.values()):
+        raise HTTPException(status_code=400, detail="Select documents by ids, username and/or date range")
+    
+    try:
+        columns = list(exporter.EXPORT_COLUMNS)
+        documents = _hydrate_recommendations(db.iter_documents(columns=columns, **filters))
+        stream = exporter.export_stream_async(documents, format, columns, flatten)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    filename = f"documents-{datetime.now().strftime('%Y%m%d_%H%M%S')}.{format}"
+    return StreamingResponse(
+        stream,
+        media_type=exporter.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+async def _hydrate_recommendations(documents):
+    async for document in documents:
+        document["job_recommendations"] = job_matcher.hydrate(document["job_recommendations"])
+        yield document
+
+
+@app.get("/export")
+async def export_documents(
+    format: str = "ndjson",
+    columns: Optional[str] = None,
+    username: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    flatten: bool = True
+):
+    """Stream documents as NDJSON, CSV or Parquet (constant memory)"""
+    try:
+        selected = exporter.parse_columns(columns)
+        documents = db.iter_documents(
+            columns=selected,
+            username=username,
+            date_from=date_from,
+            date_to=date_to
+        )
+        stream = exporter.export_stream_async(documents, format, selected, flatten)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    filename = f"documents-{datetime.now().strftime('%Y%m%d_%H%M%S')}.{format}"
+    return StreamingResponse(
+        stream,
+        media_type=exporter.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+class ReprocessRequest(BaseModel):
+    document_ids: Optional[List[int]] = None
+    username: Optional[str] = None
+    reanalyze: bool = True
+    rematch: bool = True
+    chunk_size: int = Field(50, ge=1, le=500)  # documents (with full OCR text) held in memory
+    concurrency: int = Field(4, ge=1, le=16)  # simultaneous AI calls
+
+
+@app.post("/reprocess")
+async def start_reprocess(request: ReprocessRequest):
+    """Re-run AI analysis and/or job matching from stored OCR text (no re-OCR)"""
+    try:
+        job_id = await reprocessor.create_job(
+            document_ids=request.document_ids,
+            username=request.username,
+            reanalyze=request.reanalyze,
+            rematch=request.rematch,
+            chunk_size=request.chunk_size,
+            concurrency=request.concurrency
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    reprocessor.start(job_id)
+    return {
+        "status": "success",
+        "job": await db.get_reprocess_job(job_id)
+    }
+
+
+@app.get("/reprocess")
+async def list_reprocess_jobs():
+    """List reprocess jobs with their checkpoints"""
+    return {
+        "status": "success",
+        "jobs": await db.get_reprocess_jobs()
+    }
+
+
+@app.get("/reprocess/{job_id}")
+async def get_reprocess_job(job_id: int):
+    """Get progress of a reprocess job"""
+    job = await db.get_reprocess_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Reprocess job not found")
+    return {
+        "status": "success",
+        "job": job
+    }
+
+
+@app.post("/reprocess/{job_id}/resume")
+async def resume_reprocess_job(job_id: int):
+    """Resume a failed or interrupted reprocess job from its checkpoint"""
+    job = await db.get_reprocess_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Reprocess job not found")
+    if job["status"] == "completed":
+        raise HTTPException(status_code=400, detail="Reprocess job already completed")
+    
+    started = reprocessor.start(job_id)
+    return {
+        "status": "success",
+        "message": f"Reprocess job {job_id} {'resumed' if started else 'is already running'}"
+    }
+
+
+def _check_profile_access(token: Optional[str]):
+    if not profiler.authorized(token):
+        raise HTTPException(status_code=403, detail="Send X-Admin-Token (set PROFILE_ADMIN_TOKEN to enable)")
+
+
+@app.get("/admin/profiles")
+async def list_profiles(limit: int = 100, x_admin_token: Optional[str] = Header(None)):
+    """List saved document profiles (stage timings only), newest first"""
+    _check_profile_access(x_admin_token)
+    profiles = await asyncio.to_thread(profiler.list_profiles, limit)
+    return {
+        "status": "success",
+        "count": len(profiles),
+        "profiles": profiles
+    }
+
+
+@app.get("/admin/profiles/{profile_id}")
+async def get_profile(profile_id: str, x_admin_token: Optional[str] = Header(None)):
+    """Get a saved profile with its stage timings and hottest stacks"""
+    _check_profile_access(x_admin_token)
+    profile = await asyncio.to_thread(profiler.load, profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return {
+        "status": "success",
+        "profile": profile
+    }
+
+
+@app.get("/admin/profiles/{profile_id}/folded", response_class=PlainTextResponse)
+async def get_profile_stacks(profile_id: str, x_admin_token: Optional[str] = Header(None)):
+    """All samples of a profile in collapsed-stack format (for flame graphs)"""
+    _check_profile_access(x_admin_token)
+    folded = await asyncio.to_thread(profiler.load_folded, profile_id)
+    if folded is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(folded)
+
+
 @app.get("/stats")
 async def get_statistics():
     """Get server statistics"""
     try:
-        stats = db.get_statistics()
+        stats = await db.get_statistics()
+        stats["job_recommendation_cache"] = job_matcher.cache_info()
+        stats["storage"] = storage.disk_usage()
+        stats["ocr_queue"] = scheduler.stats()
+        stats["ocr_readers"] = ocr_service.pool.stats()
         return {
             "status": "success",
             "stats": stats
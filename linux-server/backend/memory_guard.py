@@ -0,0 +1,68 @@
+import gc
+import os
+from typing import Callable, Optional
+
+
+class MemoryLimitExceeded(Exception):
+    """Raised when a job grows the process by more than its memory ceiling"""
+
+
+def current_rss_mb() -> Optional[float]:
+    """Resident set size of this process in MB (None where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as statm:
+            resident_pages = int(statm.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+class MemoryGuard:
+    """Per-job memory ceiling, checked between units of work (e.g. PDF pages).
+
+    Create one when a job starts: it records the process RSS as a baseline
+    and ``check`` fails the job once RSS has grown by more than ``limit_mb``
+    since then. Memory the job does not own but may cause to be allocated,
+    such as OCR readers loaded on demand, is reported by ``shared_mb`` (the
+    size currently loaded, so it drops on eviction) and not charged to the
+    job. RSS cannot be split between threads, so growth from jobs running
+    at the same time still counts; size the limit for OCR_CONCURRENCY. ``limit_mb`` defaults to
+    OCR_JOB_MAX_MB (0 disables the check).
+    """
+
+    def __init__(self, limit_mb: Optional[float] = None, shared_mb: Optional[Callable[[], float]] = None):
+        self.limit_mb = limit_mb if limit_mb is not None else float(os.getenv("OCR_JOB_MAX_MB", "0"))
+        self.shared_mb = shared_mb or (lambda: 0.0)
+        self.peak_mb = 0.0
+        self._baseline = self._footprint() if self.limit_mb > 0 else None
+        self._collected_at: Optional[float] = None
+
+    def _footprint(self) -> Optional[float]:
+        rss = current_rss_mb()
+        return rss - self.shared_mb() if rss is not None else None
+
+    def growth_mb(self) -> Optional[float]:
+        """Memory grown since the job started (None when unmeasured)"""
+        footprint = self._footprint()
+        if footprint is None or self._baseline is None:
+            return None
+        return footprint - self._baseline
+
+    def check(self, stage: str = ""):
+        if self.limit_mb <= 0:
+            return
+        growth = self.growth_mb()
+        if growth is None:
+            return
+        if growth > self.limit_mb and (self._collected_at is None or growth > self._collected_at):
+            # Garbage that has not been collected yet should not fail the job;
+            # only collect again once the job has grown past the last attempt
+            gc.collect()
+            growth = self.growth_mb()
+            self._collected_at = growth
+        self.peak_mb = max(self.peak_mb, growth)
+        if growth > self.limit_mb:
+            where = f" at {stage}" if stage else ""
+            raise MemoryLimitExceeded(
+                f"Memory limit exceeded{where}: job grew by {growth:.0f} MB, limit is {self.limit_mb:.0f} MB"
+            )
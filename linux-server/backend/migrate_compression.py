@@ -0,0 +1,47 @@
+"""Re-encode the large columns of existing documents with a compression codec.
+
+SQLite only: PostgreSQL (DATABASE_URL) compresses large values itself.
+
+Usage:
+    python migrate_compression.py --codec zlib --vacuum
+    python migrate_compression.py --codec none      # decompress everything again
+"""
+import argparse
+import os
+
+from compression import available_codecs
+from database import Database
+from document_store import SQLiteDocumentStore, create_document_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compress (or decompress) stored OCR text and JSON columns")
+    parser.add_argument("--db", help="SQLite database path (default: DATABASE_PATH)")
+    parser.add_argument("--codec", default=os.getenv("DB_COMPRESSION", "zlib"), choices=available_codecs())
+    parser.add_argument("--batch-size", type=int, default=500, help="Rows per transaction")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM afterwards to shrink the file")
+    args = parser.parse_args()
+
+    store = create_document_store(args.db)
+    if not isinstance(store, SQLiteDocumentStore):
+        parser.error("DATABASE_URL selects PostgreSQL, which compresses large values itself; "
+                     "pass --db to convert a SQLite file")
+    db_path = store.db.db_path
+    db = Database(db_path, compression=args.codec)
+    size_before = os.path.getsize(db_path)
+
+    stats = db.migrate_compression(batch_size=args.batch_size)
+    print(
+        f"✅ Re-encoded {stats['rows']} rows with {stats['codec']}: "
+        f"{stats['bytes_before'] / 1e6:.1f} MB -> {stats['bytes_after'] / 1e6:.1f} MB of column data"
+    )
+
+    if args.vacuum:
+        db.vacuum()
+        print(f"🧹 Database file: {size_before / 1e6:.1f} MB -> {os.path.getsize(db_path) / 1e6:.1f} MB")
+    else:
+        print("ℹ️ Run with --vacuum to return freed space to the filesystem")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,101 +1,224 @@
-import easyocr
-from typing import Optional
+import asyncio
+import io
+import os
+from contextlib import closing
+from typing import Iterator, List, Optional, Sequence
 import cv2
 import numpy as np
 from pathlib import Path
 import fitz  # PyMuPDF for PDF handling
 
+import profiling
+from dedup import dhash
+from memory_guard import MemoryGuard
+from reader_pool import (
+    LanguageSet, ReaderPool, detect_script_languages, language_set,
+    parse_language_sets, parse_languages
+)
+
+
+def _easyocr_reader(languages: LanguageSet):
+    import easyocr  # imported on first load: it pulls in torch
+    return easyocr.Reader(list(languages), gpu=False)
+
 
 class OCRService:
-    def __init__(self):
-        self.reader = None
+    def __init__(self, languages: Optional[Sequence[str]] = None, pool: Optional[ReaderPool] = None):
+        self.default_languages = language_set(languages) if languages else parse_languages(os.getenv("OCR_LANGUAGES", "en"))
+        # Language sets that script detection may choose between, e.g. "en;hi,en"
+        self.language_sets: List[LanguageSet] = parse_language_sets(os.getenv("OCR_LANGUAGE_SETS", ""))
+        if self.default_languages not in self.language_sets:
+            self.language_sets.insert(0, self.default_languages)
+        self.probe_size = int(os.getenv("OCR_SCRIPT_PROBE_SIZE", "640"))
+        
+        self.pool = pool or ReaderPool(_easyocr_reader)
         self.is_initialized = False
     
     async def initialize(self):
-        """Initialize EasyOCR reader (lazy loading)"""
+        """Load the reader for the default languages (others load on first use)"""
         if not self.is_initialized:
             print("🔄 Initializing EasyOCR (this may take a moment)...")
-            # Initialize with English language
-            self.reader = easyocr.Reader(['en'], gpu=False)
+            await asyncio.to_thread(self.pool.preload, self.default_languages)
             self.is_initialized = True
             print("✅ EasyOCR initialized")
     
     def is_ready(self) -> bool:
         """Check if OCR service is ready"""
-        return self.is_initialized and self.reader is not None
+        return self.is_initialized
     
-    async def extract_text(self, file_path: str) -> str:
-        """Extract text from image or PDF file"""
+    async def extract_text(self, file_path: str, languages: Optional[Sequence[str]] = None) -> str:
+        """Extract text from image or PDF file.
+        
+        ``languages`` picks the reader (e.g. ["hi", "en"]); without it the
+        script is detected from the document.
+        """
         if not self.is_ready():
             await self.initialize()
         
         file_path = Path(file_path)
+        languages = language_set(languages) if languages else None
         
+        # Run the blocking OCR work off the event loop
         if file_path.suffix.lower() == '.pdf':
-            return await self._extract_from_pdf(str(file_path))
+            return await asyncio.to_thread(self._extract_from_pdf, str(file_path), languages)
         else:
-            return await self._extract_from_image(str(file_path))
+            return await asyncio.to_thread(self._extract_from_image, str(file_path), languages)
+    
+    def _readtext(self, image: np.ndarray, languages: LanguageSet):
+        """Run EasyOCR inference on a pooled reader for the language set"""
+        with profiling.stage("ocr_inference", sample=True):
+            with self.pool.acquire(languages) as reader:
+                return reader.readtext(image)
+    
+    def detect_languages(self, image: np.ndarray) -> LanguageSet:
+        """Pick the language set for an image with a quick pass over a thumbnail.
+        
+        Each candidate reader reads a downscaled copy and the one that
+        recognizes the most text with confidence wins. With a single
+        configured language set this costs nothing.
+        """
+        if len(self.language_sets) == 1:
+            return self.default_languages
+        
+        height, width = image.shape[:2]
+        scale = self.probe_size / max(height, width)
+        thumbnail = cv2.resize(image, (int(width * scale), int(height * scale))) if scale < 1 else image
+        
+        best, best_score = self.default_languages, 0.0
+        with profiling.stage("script_detection", sample=True):
+            for languages in self.language_sets:
+                results = self._readtext(thumbnail, languages)
+                score = sum(confidence * len(text.strip()) for _, text, confidence in results)
+                if score > best_score:
+                    best, best_score = languages, score
+        return best
     
-    async def _extract_from_image(self, image_path: str) -> str:
+    def _memory_guard(self) -> MemoryGuard:
+        """Memory ceiling for one job; readers it makes the pool load are not charged"""
+        return MemoryGuard(shared_mb=lambda: self.pool.loaded_mb)
+    
+    def _extract_from_image(self, image_path: str, languages: Optional[LanguageSet] = None) -> str:
         """Extract text from image file"""
         try:
+            guard = self._memory_guard()
+            
             # Read image
-            image = cv2.imread(image_path)
+            with profiling.stage("image_decode", sample=True):
+                image = cv2.imread(image_path)
             
             if image is None:
                 raise ValueError(f"Could not read image: {image_path}")
             
             # Perform OCR
-            results = self.reader.readtext(image)
+            results = self._readtext(image, languages or self.detect_languages(image))
+            del image
             
             # Extract text from results
             text_lines = [result[1] for result in results]
             extracted_text = '\n'.join(text_lines)
             
+            guard.check(image_path)
             return extracted_text
         
         except Exception as e:
             print(f"❌ Error in OCR extraction: {str(e)}")
             raise
     
-    async def _extract_from_pdf(self, pdf_path: str) -> str:
-        """Extract text from PDF file"""
-        try:
-            extracted_text = []
-            
-            # Open PDF
-            pdf_document = fitz.open(pdf_path)
-            
-            for page_num in range(len(pdf_document)):
-                page = pdf_document[page_num]
+    def iter_pdf_pages(self, pdf_path: str, languages: Optional[LanguageSet] = None) -> Iterator[str]:
+        """Yield the text of each PDF page in turn.
+        
+        Only one page (and at most one rendered pixmap) is in memory at a
+        time, and the document is closed even if the caller stops early or
+        an error is raised. Without ``languages``, the script of text pages
+        (or else a probe of the first scanned page) picks the reader used
+        for the scanned pages.
+        """
+        with fitz.open(pdf_path) as pdf_document:
+            for page_num in range(pdf_document.page_count):
+                page = pdf_document.load_page(page_num)
                 
                 # Try text extraction first (for text-based PDFs)
-                text = page.get_text()
-                
+                with profiling.stage("pdf_text", sample=True):
+                    text = page.get_text()
                 if text.strip():
-                    extracted_text.append(text)
+                    if languages is None:
+                        detected = detect_script_languages(text)
+                        # Latin text keeps the configured default reader
+                        languages = self.default_languages if detected == ("en",) else detected
                 else:
-                    # If no text, convert page to image and use OCR
-                    pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))  # 2x zoom for better quality
-                    img_array = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
-                    
-                    # Convert to RGB if needed
-                    if pix.n == 4:  # RGBA
-                        img_array = cv2.cvtColor(img_array, cv2.COLOR_RGBA2RGB)
-                    
-                    # Perform OCR on image
-                    results = self.reader.readtext(img_array)
-                    text_lines = [result[1] for result in results]
-                    extracted_text.append('\n'.join(text_lines))
+                    # If no text, render the page and use OCR
+                    text, languages = self._ocr_page(page, languages)
+                page = None
+                
+                yield text
+    
+    def _ocr_page(self, page, languages: Optional[LanguageSet]):
+        """OCR a rendered page, releasing the pixel buffers before returning.
+        
+        Returns the text and the language set used.
+        """
+        pix = None
+        img_array = None
+        try:
+            with profiling.stage("rasterize", sample=True):
+                pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))  # 2x zoom for better quality
+                
+                # View the pixmap's samples without copying them
+                img_array = np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+                
+                # Convert to RGB if needed
+                if pix.n == 4:  # RGBA
+                    img_array = cv2.cvtColor(img_array, cv2.COLOR_RGBA2RGB)
+            
+            if languages is None:
+                languages = self.detect_languages(img_array)
+            results = self._readtext(img_array, languages)
+        finally:
+            # The array may view the pixmap's memory, so drop it first
+            img_array = None
+            pix = None
+        
+        return '\n'.join(result[1] for result in results), languages
+    
+    def _extract_from_pdf(self, pdf_path: str, languages: Optional[LanguageSet] = None) -> str:
+        """Extract text from PDF file, page by page"""
+        try:
+            guard = self._memory_guard()
+            extracted_text = io.StringIO()
             
-            pdf_document.close()
+            with closing(self.iter_pdf_pages(pdf_path, languages)) as pages:
+                for page_num, text in enumerate(pages):
+                    if page_num:
+                        extracted_text.write('\n\n')
+                    extracted_text.write(text)
+                    guard.check(f"page {page_num + 1} of {Path(pdf_path).name}")
             
-            return '\n\n'.join(extracted_text)
+            return extracted_text.getvalue()
         
         except Exception as e:
             print(f"❌ Error in PDF extraction: {str(e)}")
             raise
     
+    def image_hash(self, file_path: str) -> Optional[int]:
+        """Perceptual hash of the image or first PDF page, for duplicate detection"""
+        try:
+            if file_path.lower().endswith('.pdf'):
+                with fitz.open(file_path) as pdf_document:
+                    if pdf_document.page_count == 0:
+                        return None
+                    # A small grayscale render is plenty for a 9x8 hash
+                    pix = pdf_document.load_page(0).get_pixmap(matrix=fitz.Matrix(0.5, 0.5), colorspace=fitz.csGRAY, alpha=False)
+                    value = dhash(np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(pix.height, pix.width))
+                    pix = None
+                    return value
+            
+            image = cv2.imread(file_path, cv2.IMREAD_REDUCED_GRAYSCALE_4)
+            return dhash(image) if image is not None else None
+        
+        except Exception as e:
+            print(f"⚠️ Could not hash {file_path}: {str(e)}")
+            return None
+    
     def preprocess_image(self, image: np.ndarray) -> np.ndarray:
         """Preprocess image for better OCR results"""
         # Convert to grayscale
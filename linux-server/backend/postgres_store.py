@@ -0,0 +1,359 @@
+"""PostgreSQL backend for the document store (asyncpg with a connection pool).
+
+The schema mirrors the SQLite one so rows look the same through either
+backend. Large text columns are stored uncompressed: PostgreSQL already
+compresses them through TOAST.
+"""
+import json
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+import asyncpg
+
+from database import DocumentRecord, parse_document_row
+from document_store import DocumentStore
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS documents (
+        id BIGSERIAL PRIMARY KEY,
+        username TEXT NOT NULL,
+        original_filename TEXT NOT NULL,
+        file_path TEXT NOT NULL,
+        ocr_text TEXT,
+        document_type TEXT,
+        skills TEXT,
+        metadata TEXT,
+        job_recommendations TEXT,
+        timestamp TEXT NOT NULL,
+        created_at TIMESTAMPTZ DEFAULT now(),
+        file_removed_at TEXT
+    )
+    """,
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS file_removed_at TEXT",
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS content_hash TEXT",
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS image_hash TEXT",
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS text_hash TEXT",
+    "CREATE INDEX IF NOT EXISTS idx_username_content_hash ON documents(username, content_hash)",
+    "CREATE INDEX IF NOT EXISTS idx_username ON documents(username)",
+    "CREATE INDEX IF NOT EXISTS idx_timestamp ON documents(timestamp)",
+    """
+    CREATE TABLE IF NOT EXISTS reprocess_jobs (
+        id BIGSERIAL PRIMARY KEY,
+        params TEXT NOT NULL,
+        status TEXT NOT NULL,
+        last_document_id BIGINT DEFAULT 0,
+        processed INTEGER DEFAULT 0,
+        failed INTEGER DEFAULT 0,
+        error TEXT,
+        created_at TIMESTAMPTZ DEFAULT now(),
+        updated_at TIMESTAMPTZ DEFAULT now()
+    )
+    """,
+]
+
+DOCUMENT_FIELDS = ("document_type", "skills", "metadata", "job_recommendations")
+REPROCESS_JOB_FIELDS = ("status", "last_document_id", "processed", "failed", "error")
+
+
+def _record_to_dict(record: asyncpg.Record) -> Dict:
+    """Convert a record, rendering timestamps like SQLite's CURRENT_TIMESTAMP"""
+    row = dict(record)
+    for key, value in row.items():
+        if isinstance(value, datetime):
+            row[key] = value.strftime("%Y-%m-%d %H:%M:%S")
+    return row
+
+
+def _selection_filter(
+    ids: Optional[List[int]] = None,
+    username: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    required: bool = True
+) -> Tuple[str, list]:
+    """Build a WHERE clause with $n placeholders selecting documents"""
+    clauses, params = [], []
+    if ids is not None:
+        if not ids:
+            raise ValueError("No documents selected (ids is empty)")
+        params.append(list(ids))
+        clauses.append(f"id = ANY(${len(params)}::bigint[])")
+    if username:
+        params.append(username)
+        clauses.append(f"username = ${len(params)}")
+    if date_from:
+        params.append(date_from)
+        clauses.append(f"timestamp >= ${len(params)}")
+    if date_to:
+        params.append(date_to)
+        clauses.append(f"timestamp < ${len(params)}")
+    if not clauses:
+        if required:
+            raise ValueError("Select documents by ids, username and/or date range")
+        return "TRUE", params
+    return " AND ".join(clauses), params
+
+
+def _parse_job(record: asyncpg.Record) -> Dict:
+    job = _record_to_dict(record)
+    job["params"] = json.loads(job["params"])
+    return job
+
+
+class PostgresDocumentStore(DocumentStore):
+    backend = "postgresql"
+
+    def __init__(self, dsn: str, min_size: int = 1, max_size: int = 10):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.pool: Optional[asyncpg.Pool] = None
+
+    async def init_db(self):
+        if self.pool is None:
+            self.pool = await asyncpg.create_pool(self.dsn, min_size=self.min_size, max_size=self.max_size)
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                for statement in SCHEMA:
+                    await conn.execute(statement)
+        print("✅ Database initialized (PostgreSQL)")
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def check_health(self) -> bool:
+        try:
+            await self.pool.fetchval("SELECT 1")
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _record_values(record: DocumentRecord) -> tuple:
+        return (
+            record.username,
+            record.original_filename,
+            record.file_path,
+            record.ocr_text,
+            record.document_type,
+            record.skills,
+            record.metadata,
+            record.job_recommendations,
+            record.timestamp,
+            record.content_hash,
+            record.image_hash,
+            record.text_hash
+        )
+
+    async def insert_document(self, record: DocumentRecord) -> int:
+        return await self.pool.fetchval("""
+            INSERT INTO documents (
+                username, original_filename, file_path, ocr_text,
+                document_type, skills, metadata, job_recommendations, timestamp,
+                content_hash, image_hash, text_hash
+            ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12)
+            RETURNING id
+        """, *self._record_values(record))
+
+    async def insert_documents(self, records: List[DocumentRecord]) -> int:
+        if not records:
+            return 0
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.executemany("""
+                    INSERT INTO documents (
+                        username, original_filename, file_path, ocr_text,
+                        document_type, skills, metadata, job_recommendations, timestamp,
+                        content_hash, image_hash, text_hash
+                    ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12)
+                """, [self._record_values(record) for record in records])
+        return len(records)
+
+    async def get_existing_file_paths(self, file_paths: List[str]) -> set:
+        if not file_paths:
+            return set()
+        rows = await self.pool.fetch(
+            "SELECT file_path FROM documents WHERE file_path = ANY($1::text[])", list(file_paths)
+        )
+        return {row["file_path"] for row in rows}
+
+    async def get_all_documents(self, username: Optional[str] = None) -> List[Dict]:
+        query = """
+            SELECT id, username, original_filename, document_type,
+                   timestamp, created_at
+            FROM documents
+        """
+        if username:
+            rows = await self.pool.fetch(query + " WHERE username = $1 ORDER BY created_at DESC", username)
+        else:
+            rows = await self.pool.fetch(query + " ORDER BY created_at DESC")
+        return [_record_to_dict(row) for row in rows]
+
+    async def get_ocr_texts(self, doc_ids: List[int]) -> Dict[int, str]:
+        if not doc_ids:
+            return {}
+        rows = await self.pool.fetch(
+            "SELECT id, ocr_text FROM documents WHERE id = ANY($1::bigint[])", list(doc_ids)
+        )
+        return {row["id"]: row["ocr_text"] or "" for row in rows}
+
+    async def get_document_by_id(self, doc_id: int) -> Optional[Dict]:
+        row = await self.pool.fetchrow("SELECT * FROM documents WHERE id = $1", doc_id)
+        return parse_document_row(_record_to_dict(row)) if row else None
+
+    async def get_document_hashes(self, username: str) -> List[Dict]:
+        rows = await self.pool.fetch("""
+            SELECT id, content_hash, image_hash, text_hash
+            FROM documents
+            WHERE username = $1
+              AND (content_hash IS NOT NULL OR image_hash IS NOT NULL OR text_hash IS NOT NULL)
+        """, username)
+        return [dict(row) for row in rows]
+
+    async def get_documents(self, **selection) -> List[Dict]:
+        where, params = _selection_filter(**selection)
+        rows = await self.pool.fetch(f"SELECT * FROM documents WHERE {where} ORDER BY id", *params)
+        return [parse_document_row(_record_to_dict(row)) for row in rows]
+
+    async def iter_documents(self, columns: Optional[List[str]] = None, batch_size: int = 500, **selection) -> AsyncIterator[Dict]:
+        select = ", ".join(columns) if columns else "*"
+        where, params = _selection_filter(**selection, required=False)
+
+        # Server-side cursor: rows are fetched batch_size at a time
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                query = f"SELECT {select} FROM documents WHERE {where} ORDER BY id"
+                async for row in conn.cursor(query, *params, prefetch=batch_size):
+                    yield parse_document_row(_record_to_dict(row))
+
+    async def delete_documents(self, **selection) -> List[str]:
+        where, params = _selection_filter(**selection)
+        rows = await self.pool.fetch(f"DELETE FROM documents WHERE {where} RETURNING file_path", *params)
+        return [row["file_path"] for row in rows]
+
+    async def get_total_documents(self) -> int:
+        return await self.pool.fetchval("SELECT COUNT(*) FROM documents")
+
+    async def get_statistics(self) -> Dict:
+        async with self.pool.acquire() as conn:
+            total = await conn.fetchval("SELECT COUNT(*) FROM documents")
+            by_type = {
+                row["document_type"]: row["count"]
+                for row in await conn.fetch("SELECT document_type, COUNT(*) AS count FROM documents GROUP BY document_type")
+            }
+            by_user = {
+                row["username"]: row["count"]
+                for row in await conn.fetch("SELECT username, COUNT(*) AS count FROM documents GROUP BY username")
+            }
+            recent = await conn.fetchval(
+                "SELECT COUNT(*) FROM documents WHERE created_at > now() - interval '1 day'"
+            )
+
+        return {
+            "total_documents": total,
+            "by_document_type": by_type,
+            "by_user": by_user,
+            "recent_24h": recent
+        }
+
+    async def get_documents_for_reprocessing(
+        self,
+        after_id: int,
+        limit: int,
+        document_ids: Optional[List[int]] = None,
+        username: Optional[str] = None
+    ) -> List[Dict]:
+        query = "SELECT id, ocr_text, skills, metadata FROM documents WHERE id > $1"
+        params: list = [after_id]
+        if document_ids:
+            params.append(list(document_ids))
+            query += f" AND id = ANY(${len(params)}::bigint[])"
+        if username:
+            params.append(username)
+            query += f" AND username = ${len(params)}"
+        params.append(limit)
+        query += f" ORDER BY id LIMIT ${len(params)}"
+
+        rows = await self.pool.fetch(query, *params)
+        return [parse_document_row(_record_to_dict(row)) for row in rows]
+
+    async def bulk_update_documents(self, updates: List[Dict], checkpoint: Optional[Dict] = None) -> int:
+        if not updates and not checkpoint:
+            return 0
+
+        updated = 0
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                for update in updates:
+                    fields = [field for field in DOCUMENT_FIELDS if field in update]
+                    if not fields:
+                        continue
+                    assignments = ", ".join(f"{field} = ${i + 1}" for i, field in enumerate(fields))
+                    status = await conn.execute(
+                        f"UPDATE documents SET {assignments} WHERE id = ${len(fields) + 1}",
+                        *[update[field] for field in fields], update["id"]
+                    )
+                    updated += int(status.split()[-1])
+
+                if checkpoint:
+                    await self._update_job(conn, checkpoint["job_id"], {
+                        key: value for key, value in checkpoint.items() if key != "job_id"
+                    })
+
+        return updated
+
+    async def create_reprocess_job(self, params: Dict) -> int:
+        return await self.pool.fetchval(
+            "INSERT INTO reprocess_jobs (params, status) VALUES ($1, $2) RETURNING id",
+            json.dumps(params), "pending"
+        )
+
+    async def get_reprocess_job(self, job_id: int) -> Optional[Dict]:
+        row = await self.pool.fetchrow("SELECT * FROM reprocess_jobs WHERE id = $1", job_id)
+        return _parse_job(row) if row else None
+
+    async def get_reprocess_jobs(self, status: Optional[str] = None) -> List[Dict]:
+        if status:
+            rows = await self.pool.fetch("SELECT * FROM reprocess_jobs WHERE status = $1 ORDER BY id", status)
+        else:
+            rows = await self.pool.fetch("SELECT * FROM reprocess_jobs ORDER BY id DESC")
+        return [_parse_job(row) for row in rows]
+
+    async def update_reprocess_job(self, job_id: int, **fields) -> None:
+        fields = {key: value for key, value in fields.items() if key in REPROCESS_JOB_FIELDS}
+        if not fields:
+            return
+        async with self.pool.acquire() as conn:
+            await self._update_job(conn, job_id, fields)
+
+    @staticmethod
+    async def _update_job(conn: asyncpg.Connection, job_id: int, fields: Dict):
+        assignments = ", ".join(f"{key} = ${i + 1}" for i, key in enumerate(fields))
+        await conn.execute(
+            f"UPDATE reprocess_jobs SET {assignments}, updated_at = now() WHERE id = ${len(fields) + 1}",
+            *fields.values(), job_id
+        )
+
+    async def get_expired_originals(self, cutoff: str, after_id: int, limit: int, path_prefixes: Sequence[str] = ()) -> List[Dict]:
+        where, params = "id > $1 AND timestamp < $2 AND file_removed_at IS NULL", [after_id, cutoff]
+        if path_prefixes:
+            params.extend(path_prefixes)
+            where += " AND (" + " OR ".join(f"starts_with(file_path, ${i})" for i in range(3, len(params) + 1)) + ")"
+        params.append(limit)
+        rows = await self.pool.fetch(f"""
+            SELECT id, file_path FROM documents
+            WHERE {where}
+            ORDER BY id LIMIT ${len(params)}
+        """, *params)
+        return [dict(row) for row in rows]
+
+    async def mark_originals_removed(self, doc_ids: List[int]) -> None:
+        if not doc_ids:
+            return
+        await self.pool.execute(
+            "UPDATE documents SET file_removed_at = $1 WHERE id = ANY($2::bigint[])",
+            datetime.now().isoformat(), list(doc_ids)
+        )
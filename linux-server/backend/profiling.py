@@ -0,0 +1,272 @@
+"""Opt-in per-document profiling: stage timings plus a sampling profiler.
+
+Code marks its stages with ``with profiling.stage("rasterize"):``. When no
+profile is active for the current document this is a single context
+variable lookup. ``asyncio.to_thread`` copies context variables, so stages
+inside OCR worker threads are attributed to the right document.
+
+cProfile only sees the thread it runs in, while the heavy work here runs
+in worker threads, so stacks are collected by a sampling thread instead.
+It only samples threads that are inside a ``sample=True`` stage of the
+profiled document, so concurrent requests do not pollute each other.
+Samples are written in collapsed-stack format (flamegraph.pl, speedscope).
+"""
+import asyncio
+import contextvars
+import hmac
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+_current: contextvars.ContextVar[Optional["Profile"]] = contextvars.ContextVar("profile", default=None)
+_NO_STAGE = nullcontext()
+
+PROFILE_ID = re.compile(r"^[\w-]+$")
+
+
+class Profile:
+    def __init__(self, username: str, filename: str, trigger: Optional[str], sample_interval: float):
+        self.id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.username = username
+        self.filename = filename
+        self.trigger = trigger  # "header", or None until the slow threshold is crossed
+        self.sample_interval = sample_interval
+        self.started_at = datetime.now().isoformat()
+        self.start = time.perf_counter()
+        self.total_seconds = 0.0
+
+        self.stages: Dict[str, Dict] = {}  # name -> seconds/count, in order of first use
+        self.samples: Dict[str, int] = {}  # collapsed stack -> count
+        self.sample_count = 0
+        self._active_threads: Dict[int, str] = {}  # thread id -> sampled stage
+        self._lock = threading.Lock()
+        self._sampler: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.slow_timer: Optional[asyncio.TimerHandle] = None
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            stage = self.stages.setdefault(name, {"seconds": 0.0, "count": 0})
+            stage["seconds"] += seconds
+            stage["count"] += 1
+
+    @contextmanager
+    def stage(self, name: str, sample: bool = False):
+        thread_id = threading.get_ident()
+        outer = self._active_threads.get(thread_id)
+        if sample:
+            self._active_threads[thread_id] = name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+            if sample:
+                # Nested stages hand sampling back to the enclosing one
+                if outer is None:
+                    self._active_threads.pop(thread_id, None)
+                else:
+                    self._active_threads[thread_id] = outer
+
+    def start_sampling(self, trigger: str):
+        if self._sampler is not None:
+            return
+        self.trigger = self.trigger or trigger
+        self._sampler = threading.Thread(target=self._sample_loop, name=f"profiler-{self.id}", daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        """Tell the sampler to stop without waiting for it (safe on the event loop)"""
+        self._stop.set()
+
+    def stop_sampling(self):
+        self.stop()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.sample_interval):
+            frames = sys._current_frames()
+            for thread_id, stage_name in list(self._active_threads.items()):
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < 64:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                key = ";".join([stage_name] + stack[::-1])
+                self.samples[key] = self.samples.get(key, 0) + 1
+                self.sample_count += 1
+
+    def summary(self) -> Dict:
+        return {
+            "id": self.id,
+            "username": self.username,
+            "filename": self.filename,
+            "trigger": self.trigger,
+            "started_at": self.started_at,
+            "total_seconds": round(self.total_seconds, 3),
+            "stages": {name: {"seconds": round(stage["seconds"], 3), "count": stage["count"]} for name, stage in self.stages.items()}
+        }
+
+    def to_dict(self, top: int = 50) -> Dict:
+        hottest = sorted(self.samples.items(), key=lambda item: item[1], reverse=True)[:top]
+        return {
+            **self.summary(),
+            "sample_interval_ms": round(self.sample_interval * 1000, 2),
+            "sample_count": self.sample_count,
+            "top_stacks": [{"stack": stack, "samples": count} for stack, count in hottest]
+        }
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.items())
+
+
+def current() -> Optional[Profile]:
+    return _current.get()
+
+
+def stage(name: str, sample: bool = False):
+    """Time a stage of the current document's profile (no-op when not profiling)"""
+    profile = _current.get()
+    if profile is None:
+        return _NO_STAGE
+    return profile.stage(name, sample)
+
+
+@contextmanager
+def activate(profile: Optional[Profile]):
+    """Make profile the current one for this task (and threads it starts)"""
+    token = _current.set(profile)
+    try:
+        yield profile
+    finally:
+        _current.reset(token)
+
+
+async def run_with(profile: Optional[Profile], coro):
+    """Await coro with profile active (for work handed to another task)"""
+    token = _current.set(profile)
+    try:
+        return await coro
+    finally:
+        _current.reset(token)
+
+
+class Profiler:
+    """Decides which documents to profile and stores the results.
+
+    A document is profiled when the request asks for it (X-Profile header,
+    only honoured when PROFILE_ALLOW_HEADER=1) or, if PROFILE_SLOW_SECONDS
+    is set, once it has been running that long: only stage timings are kept
+    until then and sampling starts when the threshold is crossed. Profiles
+    go to PROFILE_DIR, keeping the newest PROFILE_MAX_FILES. Saved profiles
+    are only served to requests carrying PROFILE_ADMIN_TOKEN.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        slow_seconds: Optional[float] = None,
+        allow_header: Optional[bool] = None,
+        sample_interval_ms: Optional[float] = None,
+        max_files: Optional[int] = None,
+        admin_token: Optional[str] = None
+    ):
+        self.directory = Path(directory or os.getenv("PROFILE_DIR", "profiles"))
+        self.slow_seconds = slow_seconds if slow_seconds is not None else float(os.getenv("PROFILE_SLOW_SECONDS", "0"))
+        self.allow_header = allow_header if allow_header is not None else os.getenv("PROFILE_ALLOW_HEADER", "0") == "1"
+        self.sample_interval = (sample_interval_ms or float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))) / 1000
+        self.max_files = max_files or int(os.getenv("PROFILE_MAX_FILES", "200"))
+        self.admin_token = admin_token if admin_token is not None else os.getenv("PROFILE_ADMIN_TOKEN", "")
+
+    def wants(self, header: Optional[str]) -> bool:
+        """Whether the X-Profile header value requests a profile"""
+        return self.allow_header and (header or "").strip().lower() in ("1", "true", "yes")
+
+    def authorized(self, token: Optional[str]) -> bool:
+        """Whether token grants access to saved profiles (never, without PROFILE_ADMIN_TOKEN)"""
+        return bool(self.admin_token) and hmac.compare_digest((token or "").encode(), self.admin_token.encode())
+
+    def begin(self, username: str, filename: str, requested: bool = False) -> Optional[Profile]:
+        """Start profiling a document, or return None when it is not profiled"""
+        if not requested and self.slow_seconds <= 0:
+            return None
+        profile = Profile(username, filename, "header" if requested else None, self.sample_interval)
+        if requested:
+            profile.start_sampling("header")
+        else:
+            profile.slow_timer = asyncio.get_running_loop().call_later(
+                self.slow_seconds, profile.start_sampling, "slow"
+            )
+        return profile
+
+    async def finish(self, profile: Optional[Profile]) -> Optional[str]:
+        """Stop a profile and save it if it was requested or slow; returns its id"""
+        if profile is None:
+            return None
+        if profile.slow_timer is not None:
+            profile.slow_timer.cancel()
+        profile.total_seconds = time.perf_counter() - profile.start
+        profile.stop()  # before any await, so the sampler stops even if this is cancelled
+        await asyncio.to_thread(profile.stop_sampling)
+
+        if profile.trigger is None:
+            if profile.total_seconds < self.slow_seconds:
+                return None
+            profile.trigger = "slow"
+
+        await asyncio.to_thread(self._save, profile)
+        print(f"🔬 Saved profile {profile.id} for {profile.filename} ({profile.total_seconds:.1f}s, {profile.trigger})")
+        return profile.id
+
+    def _save(self, profile: Profile):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / f"{profile.id}.json", "w", encoding="utf-8") as f:
+            json.dump(profile.to_dict(), f, indent=2)
+        with open(self.directory / f"{profile.id}.folded", "w", encoding="utf-8") as f:
+            f.write(profile.folded())
+
+        saved = sorted(self.directory.glob("*.json"))
+        for old in saved[:max(0, len(saved) - self.max_files)]:
+            old.unlink(missing_ok=True)
+            old.with_suffix(".folded").unlink(missing_ok=True)
+
+    def list_profiles(self, limit: int = 100) -> List[Dict]:
+        """Newest saved profiles, without their stacks"""
+        if not self.directory.exists():
+            return []
+        profiles = []
+        for path in sorted(self.directory.glob("*.json"), reverse=True)[:limit]:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            data.pop("top_stacks", None)
+            profiles.append(data)
+        return profiles
+
+    def _path(self, profile_id: str, suffix: str) -> Optional[Path]:
+        if not PROFILE_ID.match(profile_id):
+            return None
+        path = self.directory / f"{profile_id}{suffix}"
+        return path if path.exists() else None
+
+    def load(self, profile_id: str) -> Optional[Dict]:
+        path = self._path(profile_id, ".json")
+        if path is None:
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def load_folded(self, profile_id: str) -> Optional[str]:
+        path = self._path(profile_id, ".folded")
+        return path.read_text(encoding="utf-8") if path else None
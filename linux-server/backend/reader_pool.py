@@ -0,0 +1,238 @@
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from memory_guard import current_rss_mb
+
+LanguageSet = Tuple[str, ...]
+
+# Unicode blocks of scripts EasyOCR can read, mapped to its language code.
+# Each of these models also reads English, so a reader is (script, "en").
+SCRIPT_RANGES = [
+    (0x0900, 0x097F, "hi"),   # Devanagari
+    (0x0980, 0x09FF, "bn"),   # Bengali
+    (0x0B80, 0x0BFF, "ta"),   # Tamil
+    (0x0C00, 0x0C7F, "te"),   # Telugu
+    (0x0C80, 0x0CFF, "kn"),   # Kannada
+    (0x0600, 0x06FF, "ar"),   # Arabic
+    (0x0400, 0x04FF, "ru"),   # Cyrillic
+]
+
+
+def language_set(languages: Sequence[str]) -> LanguageSet:
+    """Canonical pool key for a list of language codes"""
+    return tuple(sorted({language.strip() for language in languages if language.strip()}))
+
+
+def parse_languages(value: Optional[str]) -> Optional[LanguageSet]:
+    """Parse "hi,en" into a language set (None if empty)"""
+    if not value:
+        return None
+    return language_set(value.split(",")) or None
+
+
+def parse_language_sets(value: str) -> List[LanguageSet]:
+    """Parse "en;hi,en;ta,en" into candidate language sets"""
+    return [languages for languages in map(parse_languages, value.split(";")) if languages]
+
+
+def detect_script_languages(text: str, min_share: float = 0.1) -> Optional[LanguageSet]:
+    """Pick a language set from the scripts used in text.
+
+    Returns the dominant non-Latin script plus English, ("en",) for Latin
+    text, or None when there is too little text to tell.
+    """
+    counts: Dict[str, int] = {}
+    letters = 0
+    for char in text:
+        if not char.isalpha():
+            continue
+        letters += 1
+        code = ord(char)
+        if code < 0x0400:
+            continue
+        for start, end, language in SCRIPT_RANGES:
+            if start <= code <= end:
+                counts[language] = counts.get(language, 0) + 1
+                break
+
+    if letters < 20:
+        return None
+    if counts:
+        language, count = max(counts.items(), key=lambda item: item[1])
+        if count >= max(5, letters * min_share):
+            return language_set([language, "en"])
+    return ("en",)
+
+
+class ReaderSlot:
+    """One loaded reader; serves a single inference at a time"""
+
+    def __init__(self, languages: LanguageSet, reader, size_mb: float):
+        self.languages = languages
+        self.reader = reader
+        self.size_mb = size_mb
+        self.busy = False
+        self.last_used = time.monotonic()
+        self.inferences = 0
+
+
+class ReaderPool:
+    """Lazily loaded OCR readers keyed by language set.
+
+    Readers are created on first use and kept while they fit in the memory
+    budget; when a new one does not fit, the least recently used idle
+    readers are evicted. Every slot runs one inference at a time, and a
+    language set can have up to ``replicas`` slots so several documents in
+    the same languages can be read in parallel.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[LanguageSet], object],
+        memory_budget_mb: Optional[float] = None,
+        replicas: Optional[int] = None,
+        default_size_mb: float = 300.0
+    ):
+        self.loader = loader
+        self.memory_budget_mb = memory_budget_mb if memory_budget_mb is not None else float(os.getenv("OCR_READER_MEMORY_MB", "1500"))
+        self.replicas = replicas or int(os.getenv("OCR_READERS_PER_LANGUAGE", "1"))
+        self.default_size_mb = default_size_mb
+
+        self._slots: "OrderedDict[int, ReaderSlot]" = OrderedDict()  # least recently used first
+        self._next_slot_id = 0
+        self._loading: Dict[LanguageSet, int] = {}  # loads in progress per language set
+        self._condition = threading.Condition()
+        self._load_lock = threading.Lock()  # loads one at a time so RSS deltas are meaningful
+        self.loads = 0
+        self.evictions = 0
+
+    def _used_mb(self) -> float:
+        return sum(slot.size_mb for slot in self._slots.values())
+
+    @property
+    def loaded_mb(self) -> float:
+        """Size of the readers currently loaded (drops when one is evicted)"""
+        with self._condition:
+            return self._used_mb()
+
+    def _expected_size(self, languages: LanguageSet) -> float:
+        sizes = [slot.size_mb for slot in self._slots.values() if slot.languages == languages]
+        if not sizes:
+            sizes = [slot.size_mb for slot in self._slots.values()]
+        return max(sizes) if sizes else self.default_size_mb
+
+    def _evict_for(self, needed_mb: float) -> bool:
+        """Evict idle readers, oldest first, until needed_mb fits in the budget"""
+        if self.memory_budget_mb <= 0:
+            return True
+        for slot_id in list(self._slots):
+            if self._used_mb() + needed_mb <= self.memory_budget_mb:
+                break
+            slot = self._slots[slot_id]
+            if not slot.busy:
+                del self._slots[slot_id]
+                slot.reader = None
+                self.evictions += 1
+                print(f"♻️ Evicted OCR reader {'+'.join(slot.languages)} ({slot.size_mb:.0f} MB)")
+        # The pool may always hold one reader, even if it alone exceeds the budget
+        return not self._slots or self._used_mb() + needed_mb <= self.memory_budget_mb
+
+    def _claim(self, languages: LanguageSet) -> Optional[ReaderSlot]:
+        """Take an idle slot for languages, if there is one (condition held)"""
+        for slot_id, slot in self._slots.items():
+            if slot.languages == languages and not slot.busy:
+                slot.busy = True
+                self._slots.move_to_end(slot_id)
+                return slot
+        return None
+
+    def _load(self, languages: LanguageSet, expected_mb: float) -> ReaderSlot:
+        with self._load_lock:
+            print(f"🔄 Loading EasyOCR reader for {'+'.join(languages)}...")
+            before = current_rss_mb()
+            reader = self.loader(languages)
+            after = current_rss_mb()
+        # A reader loaded into memory freed by an eviction barely moves RSS,
+        # so implausibly small deltas fall back to the expected size
+        measured = after - before if before is not None and after is not None else 0
+        size = measured if measured >= expected_mb / 2 else expected_mb
+        self.loads += 1
+        print(f"✅ EasyOCR reader for {'+'.join(languages)} ready ({size:.0f} MB)")
+        return ReaderSlot(languages, reader, size)
+
+    @contextmanager
+    def acquire(self, languages: Sequence[str]) -> Iterator[object]:
+        """Borrow a reader for a language set for one inference"""
+        languages = language_set(languages)
+        slot = None
+        with self._condition:
+            while slot is None:
+                slot = self._claim(languages)
+                if slot is not None:
+                    break
+                count = sum(1 for s in self._slots.values() if s.languages == languages)
+                expected_mb = self._expected_size(languages)
+                if count + self._loading.get(languages, 0) < self.replicas and self._evict_for(expected_mb):
+                    self._loading[languages] = self._loading.get(languages, 0) + 1
+                    break
+                # Wait for a reader to become idle (or evictable)
+                self._condition.wait()
+
+        if slot is None:
+            try:
+                slot = self._load(languages, expected_mb)
+            except Exception:
+                with self._condition:
+                    self._loading[languages] -= 1
+                    self._condition.notify_all()
+                raise
+            with self._condition:
+                self._loading[languages] -= 1
+                slot.busy = True
+                self._slots[self._next_slot_id] = slot
+                self._next_slot_id += 1
+                # Loads can overshoot the estimate; trim idle readers back under budget
+                self._evict_for(0)
+            gc.collect()
+
+        try:
+            yield slot.reader
+        finally:
+            with self._condition:
+                slot.busy = False
+                slot.last_used = time.monotonic()
+                slot.inferences += 1
+                self._condition.notify_all()
+
+    def preload(self, languages: Sequence[str]):
+        """Load a reader ahead of the first request"""
+        with self.acquire(languages):
+            pass
+
+    def loaded(self) -> List[LanguageSet]:
+        with self._condition:
+            return [slot.languages for slot in self._slots.values()]
+
+    def stats(self) -> Dict:
+        with self._condition:
+            return {
+                "readers": [
+                    {
+                        "languages": list(slot.languages),
+                        "size_mb": round(slot.size_mb, 1),
+                        "busy": slot.busy,
+                        "inferences": slot.inferences
+                    }
+                    for slot in self._slots.values()
+                ],
+                "memory_used_mb": round(self._used_mb(), 1),
+                "memory_budget_mb": self.memory_budget_mb,
+                "replicas_per_language": self.replicas,
+                "loads": self.loads,
+                "evictions": self.evictions
+            }
@@ -0,0 +1,157 @@
+import asyncio
+import json
+from typing import Dict, List, Optional
+
+from document_store import DocumentStore
+from ai_service import AIService
+from job_matcher import JobMatcher
+
+# Metadata set at upload rather than by the AI analysis, kept across reanalysis
+PRESERVED_METADATA = ("duplicate_of",)
+
+
+class Reprocessor:
+    """Re-runs AI analysis and/or job matching over stored OCR text.
+
+    Documents are walked in id order, in chunks. Each chunk is processed with
+    bounded concurrency and written back in one transaction together with the
+    job checkpoint, so an interrupted job resumes from the last finished chunk.
+    """
+
+    def __init__(self, db: DocumentStore, ai_service: AIService, job_matcher: JobMatcher):
+        self.db = db
+        self.ai_service = ai_service
+        self.job_matcher = job_matcher
+        self.running_jobs: Dict[int, asyncio.Task] = {}
+
+    async def create_job(
+        self,
+        document_ids: Optional[List[int]] = None,
+        username: Optional[str] = None,
+        reanalyze: bool = True,
+        rematch: bool = True,
+        chunk_size: int = 50,
+        concurrency: int = 4
+    ) -> int:
+        """Register a new reprocess job and return its id"""
+        if not reanalyze and not rematch:
+            raise ValueError("Nothing to do: enable reanalyze and/or rematch")
+        if document_ids is not None and not document_ids:
+            raise ValueError("No documents selected (document_ids is empty)")
+
+        params = {
+            "document_ids": document_ids,
+            "username": username,
+            "reanalyze": reanalyze,
+            "rematch": rematch,
+            "chunk_size": max(1, chunk_size),
+            "concurrency": max(1, concurrency)
+        }
+        return await self.db.create_reprocess_job(params)
+
+    def start(self, job_id: int) -> bool:
+        """Run a job in the background. Returns False if it is already running."""
+        task = self.running_jobs.get(job_id)
+        if task and not task.done():
+            return False
+
+        self.running_jobs[job_id] = asyncio.create_task(self.run(job_id))
+        return True
+
+    async def resume_interrupted(self) -> List[int]:
+        """Restart jobs that were still running when the server stopped"""
+        resumed = []
+        for job in await self.db.get_reprocess_jobs(status="running"):
+            if self.start(job["id"]):
+                resumed.append(job["id"])
+        return resumed
+
+    async def run(self, job_id: int):
+        """Process a job from its last checkpoint until all documents are done"""
+        job = await self.db.get_reprocess_job(job_id)
+        if not job:
+            raise ValueError(f"Reprocess job {job_id} not found")
+
+        params = job["params"]
+        last_id = job["last_document_id"] or 0
+        processed = job["processed"] or 0
+        failed = job["failed"] or 0
+        semaphore = asyncio.Semaphore(params["concurrency"])
+
+        await self.db.update_reprocess_job(job_id, status="running", error=None)
+        print(f"🔁 Reprocess job {job_id} started from document {last_id}")
+
+        try:
+            while True:
+                chunk = await self.db.get_documents_for_reprocessing(
+                    last_id,
+                    params["chunk_size"],
+                    document_ids=params.get("document_ids"),
+                    username=params.get("username")
+                )
+                if not chunk:
+                    break
+
+                results = await asyncio.gather(
+                    *(self._reprocess_one(doc, params, semaphore) for doc in chunk)
+                )
+                updates = [update for update in results if update is not None]
+
+                if params["rematch"] and updates:
+                    # Score the whole chunk against the catalog in one vectorized pass
+                    recommendations = await asyncio.to_thread(
+                        self.job_matcher.recommend_batch, [update.pop("_skills") for update in updates]
+                    )
+                    for update, recs in zip(updates, recommendations):
+                        update["job_recommendations"] = json.dumps(recs)
+                else:
+                    for update in updates:
+                        update.pop("_skills", None)
+
+                processed += len(updates)
+                failed += len(chunk) - len(updates)
+                last_id = chunk[-1]["id"]
+
+                await self.db.bulk_update_documents(updates, checkpoint={
+                    "job_id": job_id,
+                    "last_document_id": last_id,
+                    "processed": processed,
+                    "failed": failed
+                })
+
+            await self.db.update_reprocess_job(job_id, status="completed")
+            print(f"✅ Reprocess job {job_id} completed ({processed} updated, {failed} failed)")
+
+        except asyncio.CancelledError:
+            # Leave status as "running" so the job resumes on next startup
+            raise
+        except Exception as e:
+            print(f"❌ Reprocess job {job_id} failed: {str(e)}")
+            await self.db.update_reprocess_job(job_id, status="failed", error=str(e))
+
+    async def _reprocess_one(self, doc: Dict, params: Dict, semaphore: asyncio.Semaphore) -> Optional[Dict]:
+        """Recompute the AI analysis for a single document (if requested)"""
+        async with semaphore:
+            try:
+                update = {"id": doc["id"]}
+                skills = doc["skills"]
+
+                if params["reanalyze"]:
+                    if not doc["ocr_text"]:
+                        return None
+                    analysis = await self.ai_service.analyze_document(doc["ocr_text"])
+                    skills = analysis.get("skills", [])
+                    update["document_type"] = analysis.get("document_type", "Unknown")
+                    update["skills"] = json.dumps(skills)
+                    metadata = dict(analysis.get("metadata", {}))
+                    stored = doc.get("metadata") or {}
+                    metadata.update({key: stored[key] for key in PRESERVED_METADATA if key in stored})
+                    update["metadata"] = json.dumps(metadata)
+
+                # Job matching is done per chunk in run()
+                update["_skills"] = skills
+                return update
+
+            except Exception as e:
+                print(f"⚠️ Could not reprocess document {doc['id']}: {str(e)}")
+                return None
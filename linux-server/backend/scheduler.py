@@ -0,0 +1,200 @@
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+
+class RateLimitExceeded(Exception):
+    """Raised when work cannot be admitted right now"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate  # tokens per second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, amount: float) -> float:
+        """Take tokens if available; otherwise return seconds until they will be"""
+        self._refill()
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+
+def _parse_weights(value: str) -> Dict[str, int]:
+    """Parse "alice=2,bob=3" into per-user weights"""
+    weights = {}
+    for item in value.split(","):
+        if "=" in item:
+            username, weight = item.split("=", 1)
+            weights[username.strip()] = max(1, int(weight))
+    return weights
+
+
+class FairScheduler:
+    """Per-user fair queuing in front of OCR work.
+
+    Admission is limited by a per-username token bucket and a global queue
+    length; rejected work gets a Retry-After estimate. Admitted jobs wait in
+    per-user queues that are served weighted round-robin by a fixed number of
+    workers, so one user's large batch cannot starve everyone else.
+    """
+
+    def __init__(
+        self,
+        concurrency: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        rate_per_minute: Optional[float] = None,
+        burst: Optional[int] = None,
+        weights: Optional[Dict[str, int]] = None
+    ):
+        self.concurrency = concurrency or int(os.getenv("OCR_CONCURRENCY", "1"))
+        self.max_queue = max_queue or int(os.getenv("OCR_MAX_QUEUE", "100"))
+        self.rate = (rate_per_minute or float(os.getenv("UPLOAD_RATE_PER_MINUTE", "30"))) / 60
+        self.burst = burst or int(os.getenv("UPLOAD_BURST", "20"))
+        self.weights = weights if weights is not None else _parse_weights(os.getenv("OCR_USER_WEIGHTS", ""))
+
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._buckets_swept = time.monotonic()
+        self._queues: Dict[str, Deque[Tuple[Callable[[], Awaitable], asyncio.Future]]] = {}
+        self._ring: Deque[str] = deque()  # users with queued work, in service order
+        self._turn_used = 0  # jobs dispatched for the user at the head of the ring this turn
+        self._reserved = 0  # admitted but not yet submitted
+        self._queued = 0
+        self._running = 0
+        self._avg_job_seconds = 5.0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._workers = []
+
+    def admit(self, username: str, jobs: int = 1):
+        """Reserve capacity for a user's jobs or raise RateLimitExceeded"""
+        if jobs > self.burst:
+            raise ValueError(f"Too many files in one request (maximum {self.burst})")
+
+        backlog = self._queued + self._reserved
+        if backlog + jobs > self.max_queue:
+            # Time for the backlog to drain far enough at current throughput
+            excess = backlog + jobs - self.max_queue
+            raise RateLimitExceeded(
+                "Server is busy, please retry later",
+                excess * self._avg_job_seconds / self.concurrency
+            )
+
+        self._evict_full_buckets()
+        bucket = self._buckets.get(username)
+        if bucket is None:
+            bucket = self._buckets[username] = TokenBucket(self.rate, self.burst)
+        wait = bucket.try_take(jobs)
+        if wait > 0:
+            raise RateLimitExceeded(f"Upload rate limit exceeded for {username}", wait)
+
+        self._reserved += jobs
+
+    def _evict_full_buckets(self):
+        """Drop buckets idle long enough to have refilled: a new one is identical.
+
+        Runs at most once per refill period, so admit stays O(1) amortized.
+        """
+        now = time.monotonic()
+        refill_seconds = self.burst / self.rate
+        if now - self._buckets_swept < refill_seconds:
+            return
+        self._buckets_swept = now
+        for username in [u for u, bucket in self._buckets.items() if now - bucket.updated >= refill_seconds]:
+            del self._buckets[username]
+
+    def release(self, username: str, jobs: int = 1):
+        """Give back reserved capacity that will not be submitted"""
+        self._reserved = max(0, self._reserved - jobs)
+
+    async def submit(self, username: str, job: Callable[[], Awaitable]):
+        """Queue an admitted job for a user and wait for its result"""
+        future = asyncio.get_running_loop().create_future()
+        self._reserved = max(0, self._reserved - 1)
+
+        queue = self._queues.get(username)
+        if queue is None:
+            queue = self._queues[username] = deque()
+        if not queue:
+            self._ring.append(username)
+        queue.append((job, future))
+        self._queued += 1
+        self._wakeup.set()
+
+        return await future
+
+    def _next_job(self) -> Optional[Tuple[Callable[[], Awaitable], asyncio.Future]]:
+        """Pick the next job, weighted round-robin across users"""
+        while self._ring:
+            username = self._ring[0]
+            queue = self._queues[username]
+            job, future = queue.popleft()
+            self._queued -= 1
+            self._turn_used += 1
+
+            if not queue:
+                self._ring.popleft()
+                del self._queues[username]
+                self._turn_used = 0
+            elif self._turn_used >= self.weights.get(username, 1):
+                self._ring.rotate(-1)
+                self._turn_used = 0
+
+            if not future.cancelled():
+                return job, future
+        return None
+
+    async def _worker(self):
+        while True:
+            picked = self._next_job()
+            if picked is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            job, future = picked
+            self._running += 1
+            start = time.monotonic()
+            try:
+                result = await job()
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self._running -= 1
+                self._avg_job_seconds = 0.8 * self._avg_job_seconds + 0.2 * (time.monotonic() - start)
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+
+    def stats(self) -> Dict:
+        return {
+            "concurrency": self.concurrency,
+            "running": self._running,
+            "queued": self._queued,
+            "max_queue": self.max_queue,
+            "queued_by_user": {username: len(queue) for username, queue in self._queues.items()},
+            "avg_job_seconds": round(self._avg_job_seconds, 2)
+        }
@@ -0,0 +1,186 @@
+import asyncio
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional
+
+from document_store import DocumentStore
+
+
+class UploadStorage:
+    """Hash-sharded storage for uploaded originals.
+
+    Files live at ``<root>/<h[0:2]>/<h[2:4]>/<h>_<filename>`` where ``h`` is a
+    random hex id, so no directory grows without bound. Deletes are queued and
+    carried out by a background reaper, and an optional retention job drops
+    originals some hours after processing while the extracted data stays in
+    the database.
+    """
+
+    def __init__(self, root: str = "uploads", retention_hours: Optional[float] = None, retention_interval: Optional[float] = None):
+        self.root = Path(root).resolve()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.retention_hours = retention_hours if retention_hours is not None else float(os.getenv("UPLOAD_RETENTION_HOURS", "0"))
+        self.retention_interval = retention_interval or float(os.getenv("UPLOAD_RETENTION_INTERVAL_SECONDS", "3600"))
+
+        self._delete_queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self._db: Optional[DocumentStore] = None
+
+        # Running totals, seeded by a scan at startup and kept up to date on save/delete
+        self._usage_lock = threading.Lock()
+        self._file_count = 0
+        self._total_bytes = 0
+        self.deleted_files = 0
+        self.pending_deletes = 0
+
+    def path_for(self, filename: str) -> Path:
+        """Allocate a new sharded path for an uploaded file"""
+        digest = uuid.uuid4().hex
+        safe_name = Path(filename).name.replace(os.sep, "_")
+        return self.root / digest[0:2] / digest[2:4] / f"{digest}_{safe_name}"
+
+    def save(self, filename: str, source: BinaryIO) -> str:
+        """Store an uploaded file and return its path"""
+        file_path = self.path_for(filename)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+
+        with open(file_path, "wb") as buffer:
+            shutil.copyfileobj(source, buffer)
+
+        self._track(1, file_path.stat().st_size)
+        return str(file_path)
+
+    def owns(self, file_path: str) -> bool:
+        """Whether a path is inside this storage (files imported from elsewhere are never deleted)"""
+        try:
+            Path(file_path).resolve().relative_to(self.root)
+            return True
+        except ValueError:
+            return False
+
+    def schedule_delete(self, file_path: str):
+        """Queue a stored file for deletion by the background reaper"""
+        if not file_path or not self.owns(file_path):
+            return
+        if self._delete_queue is None:
+            # Reaper not running (e.g. CLI use): delete inline
+            self._delete_now(file_path)
+            return
+        self.pending_deletes += 1
+        self._delete_queue.put_nowait(file_path)
+
+    async def start(self, db: DocumentStore):
+        """Scan current disk usage, then start the reaper and the retention job"""
+        self._db = db
+        await asyncio.to_thread(self._scan_usage)
+        self._delete_queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._reaper())]
+        if self.retention_hours > 0:
+            self._tasks.append(asyncio.create_task(self._retention_loop()))
+
+    async def stop(self):
+        """Finish queued deletes and stop background tasks"""
+        if self._delete_queue is not None:
+            await self._delete_queue.join()
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    async def _reaper(self):
+        while True:
+            file_path = await self._delete_queue.get()
+            try:
+                await asyncio.to_thread(self._delete_now, file_path)
+            except Exception as e:
+                print(f"⚠️ Could not delete {file_path}: {str(e)}")
+            finally:
+                self.pending_deletes -= 1
+                self._delete_queue.task_done()
+
+    def _delete_now(self, file_path: str):
+        path = Path(file_path)
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except FileNotFoundError:
+            return
+        self.deleted_files += 1
+        self._track(-1, -size)
+
+    async def _retention_loop(self):
+        while True:
+            try:
+                removed = await self.apply_retention()
+                if removed:
+                    print(f"🧹 Retention: removed {removed} processed originals")
+            except Exception as e:
+                print(f"⚠️ Retention job failed: {str(e)}")
+            await asyncio.sleep(self.retention_interval)
+
+    def path_prefixes(self) -> List[str]:
+        """Prefixes of stored paths that point into this storage"""
+        prefixes = [str(self.root) + os.sep]
+        # Older uploads were stored with paths relative to the working directory
+        relative = os.path.relpath(self.root)
+        if relative != "." and not relative.startswith(".."):
+            prefixes.append(relative + os.sep)
+        return prefixes
+
+    async def apply_retention(self, batch_size: int = 500) -> int:
+        """Drop originals processed more than retention_hours ago, keeping their rows"""
+        cutoff = (datetime.now() - timedelta(hours=self.retention_hours)).isoformat()
+        prefixes = self.path_prefixes()
+        removed = 0
+        last_id = 0
+
+        # Rows of files outside the storage are filtered out by the query, so
+        # each pass only reads rows it can actually act on
+        while True:
+            expired = await self._db.get_expired_originals(cutoff, last_id, batch_size, prefixes)
+            if not expired:
+                break
+            last_id = expired[-1]["id"]
+
+            owned = [doc for doc in expired if self.owns(doc["file_path"])]
+            for doc in owned:
+                self.schedule_delete(doc["file_path"])
+            await self._db.mark_originals_removed([doc["id"] for doc in owned])
+            removed += len(owned)
+
+        return removed
+
+    def _track(self, files: int, size: int):
+        with self._usage_lock:
+            self._file_count += files
+            self._total_bytes += size
+
+    def _scan_usage(self):
+        files, size = 0, 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                try:
+                    size += os.stat(os.path.join(dirpath, filename)).st_size
+                    files += 1
+                except OSError:
+                    continue
+        with self._usage_lock:
+            self._file_count = files
+            self._total_bytes = size
+
+    def disk_usage(self) -> Dict:
+        """Disk usage figures for /stats"""
+        filesystem = shutil.disk_usage(self.root)
+        with self._usage_lock:
+            return {
+                "upload_files": self._file_count,
+                "upload_bytes": self._total_bytes,
+                "pending_deletes": self.pending_deletes,
+                "deleted_files": self.deleted_files,
+                "retention_hours": self.retention_hours,
+                "filesystem_total_bytes": filesystem.total,
+                "filesystem_free_bytes": filesystem.free
+            }
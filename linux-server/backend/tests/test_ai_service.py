@@ -0,0 +1,90 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("google.generativeai")
+
+from ai_service import AIResponseError, AIService, _object_spans  # noqa: E402
+
+TEXT = "This is to certify that Asha completed the Python and SQL internship at Acme Labs."
+
+
+class StubModel:
+    """Replies with canned text instead of calling Gemini"""
+
+    def __init__(self, reply: str):
+        self.reply = reply
+        self.prompts = []
+
+    def generate_content(self, prompt: str):
+        self.prompts.append(prompt)
+        return SimpleNamespace(text=self.reply)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setenv("AI_BREAKER_THRESHOLD", "2")
+    service = AIService()
+    service.api_key = "test"
+    yield service
+    service.close()
+
+
+def analyze(service: AIService, reply: str):
+    service.model = StubModel(reply)
+    return asyncio.run(service.analyze_document(TEXT))
+
+
+def test_reply_with_analysis(service):
+    reply = 'Sure! ```json\n{"document_type": "Internship Certificate", "skills": ["Python", "SQL"]}\n```'
+    analysis = analyze(service, reply)
+
+    assert analysis["analysis_source"] == "gemini"
+    assert (analysis["document_type"], analysis["skills"]) == ("Internship Certificate", ["Python", "SQL"])
+    assert service.breaker.failures == 0
+
+
+def test_unparseable_reply_falls_back_and_trips_the_breaker(service):
+    analysis = analyze(service, "I'm sorry, I can't help with that {not json}")
+
+    assert (analysis["analysis_source"], analysis["fallback_reason"]) == ("fallback", "parse_error")
+    assert analysis["metadata"]["fallback_reason"] == "parse_error"
+    assert "Python" in analysis["skills"]  # from the rule-based analysis
+    assert service.breaker.failures == 1
+
+    analyze(service, json.dumps(["not", "an", "analysis"]))
+    assert service.breaker.state == "open"
+    assert analyze(service, "{}")["fallback_reason"] == "circuit_open"
+
+
+@pytest.mark.parametrize("reply, document_type", [
+    ('{"document_type": "Workshop Certificate", "skills": []}', "Workshop Certificate"),
+    ('Here you go {as asked}:\n```json\n{"document_type": "Thesis"}\n```\nHope this helps!', "Thesis"),
+    ('{"document_type": "Other", "metadata": {"institution": "A {curly} \\"quoted\\" name \\\\"}}', "Other"),
+    ('Closing "}" first, then {"document_type": "Degree Certificate"} and {"document_type": "Thesis"}', "Degree Certificate"),
+])
+def test_parse_reply(service, reply, document_type):
+    assert service._parse_ai_response(reply)["document_type"] == document_type
+
+
+@pytest.mark.parametrize("reply", ["", "no json here", '{"document_type": "Thesis"', '{"answer": 42}', "[1, 2]"])
+def test_parse_reply_without_analysis(service, reply):
+    with pytest.raises(AIResponseError):
+        service._parse_ai_response(reply)
+
+
+def test_object_spans_are_found_in_one_pass():
+    text = '{"a": {"b": "}"}} x {"c": 1} {"unclosed": ' + '{"d": "e"}, ' * 3
+    assert [text[start:end] for start, end in _object_spans(text)] == ['{"a": {"b": "}"}}', '{"c": 1}']
+
+
+def test_chunk_prompts_fit_the_token_budget(service):
+    service.max_prompt_tokens = 1000
+    service.max_chunks = 50
+    paragraphs = [f"Paragraph {i}: " + "completed the machine learning course with distinction " * 8 for i in range(200)]
+
+    chunks = service._chunk_text("\n\n".join(paragraphs))
+    assert len(chunks) > 1
+    assert all(service._estimate_tokens(service._create_analysis_prompt(chunk)) <= 1000 for chunk in chunks)
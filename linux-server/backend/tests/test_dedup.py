@@ -0,0 +1,198 @@
+"""Near-duplicate confirmation and the store-backed duplicate detector."""
+import asyncio
+import json
+import random
+
+import pytest
+
+from database import Database, DocumentRecord
+from dedup import DuplicateDetector, Fingerprint, same_document, simhash
+from document_store import SQLiteDocumentStore
+
+VOCABULARY = [
+    "certificate", "completion", "awarded", "student", "successfully", "completed", "course",
+    "python", "programming", "machine", "learning", "institute", "technology", "madras",
+    "national", "programme", "enhanced", "learning", "duration", "weeks", "score", "percent",
+    "elite", "coordinator", "signature", "verify", "online", "assessment", "proctored", "exam",
+]
+
+
+def text(seed: int, words: int = 300) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choice(VOCABULARY) for _ in range(words))
+
+
+def rescan(original: str, seed: int = 0) -> str:
+    """The same text through a noisy OCR pass: confusions, truncations, merged words"""
+    rng = random.Random(seed)
+    words = original.split()
+    for i in rng.sample(range(len(words)), len(words) // 20):
+        words[i] = words[i].replace("o", "0").replace("l", "1").replace("m", "rn")
+    for i in rng.sample(range(len(words)), len(words) // 50):
+        words[i] = words[i][:-1]
+    words[10:12] = ["".join(words[10:12])]
+    return " ".join(words)
+
+
+def test_rescan_is_the_same_document():
+    original = text(1)
+    assert same_document(original, rescan(original))
+    assert same_document(rescan(original), original)
+
+
+def test_different_documents():
+    assert not same_document(text(1), text(2))
+    assert not same_document(text(1), "")
+
+
+def test_different_identifiers_never_match():
+    body = text(1)
+    assert same_document(f"Certificate No AB123456 {body}", f"Certificate No AB123456 {rescan(body)}")
+    assert not same_document(f"Certificate No AB123456 {body}", f"Certificate No QX987001 {body}")
+
+
+@pytest.fixture
+def run():
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
+
+
+@pytest.fixture
+def store(run, tmp_path):
+    store = SQLiteDocumentStore(Database(str(tmp_path / "documents.db")))
+    run(store.init_db())
+    yield store
+    run(store.close())
+
+
+def upload(run, store, detector, ocr_text: str, content_hash: str, username: str = "alice") -> int:
+    fingerprint = Fingerprint(content_hash, None, simhash(ocr_text))
+    doc_id = run(store.insert_document(DocumentRecord(
+        username=username,
+        original_filename="certificate.pdf",
+        file_path=f"/srv/uploads/{content_hash}.pdf",
+        ocr_text=ocr_text,
+        document_type="Course Certificate",
+        skills="[]",
+        metadata="{}",
+        job_recommendations="[]",
+        timestamp="2026-01-10T09:00:00",
+        content_hash=content_hash,
+        text_hash=f"{fingerprint.text_hash:016x}"
+    )))
+    detector.add(username, doc_id, fingerprint)
+    return doc_id
+
+
+def test_detector_finds_exact_and_near_duplicates(run, store):
+    detector = DuplicateDetector(store)
+    original = text(1)
+    doc_id = upload(run, store, detector, original, "aa" * 32)
+
+    exact = run(detector.find("alice", Fingerprint("aa" * 32)))
+    assert (exact.document_id, exact.kind, exact.document) == (doc_id, "exact", None)
+    assert run(detector.find("alice", Fingerprint("aa" * 32), load_document=True)).document["ocr_text"] == original
+    assert run(detector.find("bob", Fingerprint("aa" * 32))) is None
+
+    noisy = rescan(original)
+    near = run(detector.find("alice", Fingerprint("bb" * 32, None, simhash(noisy)), noisy))
+    assert (near.document_id, near.kind) == (doc_id, "near")
+    assert near.to_dict()["duplicate_of"] == doc_id
+
+    other = text(2)
+    assert run(detector.find("alice", Fingerprint("cc" * 32, None, simhash(other)), other)) is None
+
+
+def test_detector_sees_uploads_from_other_workers(run, store, monkeypatch):
+    monkeypatch.setenv("DUP_CACHE_SECONDS", "0")
+    worker, other_worker = DuplicateDetector(store), DuplicateDetector(store)
+    run(worker.find("alice", Fingerprint("00" * 32, None, simhash(text(2))), text(2)))  # caches alice's hashes
+
+    original = text(1)
+    doc_id = upload(run, store, other_worker, original, "aa" * 32)
+
+    assert run(worker.find("alice", Fingerprint("aa" * 32))).document_id == doc_id
+    noisy = rescan(original)
+    assert run(worker.find("alice", Fingerprint("bb" * 32, None, simhash(noisy)), noisy)).document_id == doc_id
+
+
+def test_detector_cache_is_bounded(run, store, monkeypatch):
+    monkeypatch.setenv("DUP_CACHE_USERS", "2")
+    detector = DuplicateDetector(store)
+    for username in ("alice", "bob", "alice", "carol"):
+        run(detector.find(username, Fingerprint(None, None, simhash(text(1))), text(1)))
+
+    assert list(detector._users) == ["alice", "carol"]
+
+
+class CountingStore:
+    """Counts the store calls the detector makes"""
+
+    def __init__(self, store):
+        self.store = store
+        self.calls = []
+
+    def __getattr__(self, name):
+        method = getattr(self.store, name)
+
+        async def call(*args, **kwargs):
+            self.calls.append(name)
+            return await method(*args, **kwargs)
+        return call
+
+
+def test_cached_exact_check_skips_the_store(run, store):
+    counting = CountingStore(store)
+    detector = DuplicateDetector(counting)
+    doc_id = upload(run, store, detector, text(1), "aa" * 32)
+
+    assert run(detector.find("alice", Fingerprint("aa" * 32))).document_id == doc_id
+    assert run(detector.find("alice", Fingerprint("aa" * 32))).document_id == doc_id
+    assert counting.calls == ["get_document_hashes"]
+
+    run(detector.find("alice", Fingerprint("aa" * 32), load_document=True))
+    assert counting.calls == ["get_document_hashes", "get_document_by_id"]
+
+
+def test_removed_and_forgotten_documents(run, store):
+    detector = DuplicateDetector(store)
+    first = upload(run, store, detector, text(1), "aa" * 32)
+    run(detector.find("alice", Fingerprint("aa" * 32)))  # caches alice's hashes
+    second = upload(run, store, detector, text(2), "bb" * 32)
+    assert run(detector.find("alice", Fingerprint("bb" * 32))).document_id == second
+
+    run(store.delete_documents(ids=[first]))
+    detector.remove(first)
+    assert run(detector.find("alice", Fingerprint("aa" * 32))) is None
+
+    run(store.delete_documents(username="alice"))
+    detector.forget("alice")
+    assert "alice" not in detector._users
+    assert run(detector.find("alice", Fingerprint("bb" * 32))) is None
+
+
+def test_deleted_candidates_are_dropped(run, store):
+    detector = DuplicateDetector(store)
+    original = text(1)
+    doc_id = upload(run, store, detector, original, "aa" * 32)
+    run(store.delete_documents(ids=[doc_id]))
+
+    noisy = rescan(original)
+    assert run(detector.find("alice", Fingerprint("bb" * 32, None, simhash(noisy)), noisy)) is None
+    assert doc_id not in detector._users["alice"][1].texts.hashes
+
+
+def test_reprocessing_keeps_duplicate_of(run):
+    pytest.importorskip("google.generativeai")
+    from reprocessor import Reprocessor
+
+    class Analysis:
+        async def analyze_document(self, ocr_text):
+            return {"document_type": "Transcript", "skills": ["java"], "metadata": {"institution": "IIT Madras"}}
+
+    reprocessor = Reprocessor(None, Analysis(), None)
+    doc = {"id": 7, "ocr_text": "scanned text", "skills": [], "metadata": {"duplicate_of": 3, "institution": "IITM"}}
+    update = run(reprocessor._reprocess_one(doc, {"reanalyze": True}, asyncio.Semaphore(1)))
+
+    assert json.loads(update["metadata"]) == {"institution": "IIT Madras", "duplicate_of": 3}
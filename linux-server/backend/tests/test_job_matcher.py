@@ -0,0 +1,46 @@
+import random
+
+import numpy as np
+
+from job_matcher import CatalogIndex, JobMatcher
+
+SKILLS = [
+    "python", "java", "javascript", "react", "react native", "c", "c++", "c#", "r", "go",
+    "sql", "nosql", "machine learning", "deep learning", "data analysis", "aws", "docker",
+]
+
+
+def catalog(size: int = 50):
+    rng = random.Random(0)
+    return [
+        {"id": job_id, "title": f"Job {job_id}", "required_skills": rng.sample(SKILLS, 3)}
+        for job_id in range(1, size + 1)
+    ]
+
+
+def test_fuzzy_lookup_matches_a_vocabulary_scan():
+    index = CatalogIndex(catalog(), 1)
+    for skill in ["react", "reactjs", "native", "java script", "learning", "c", "++", "sq", "ml", "pythonic", "x" * 200]:
+        expected = sorted(
+            column for job_skill, column in index.vocabulary.items() if job_skill in skill or skill in job_skill
+        )
+        if skill in index.vocabulary:
+            expected = [index.vocabulary[skill]]
+        assert index.skill_columns(skill).tolist() == expected, skill
+        assert index.skill_columns(skill).dtype == np.int32
+
+
+def test_random_padding_is_not_cached(monkeypatch):
+    monkeypatch.setenv("JOB_CACHE_SIZE", "16")
+    matcher = JobMatcher()
+    matcher.set_catalog(catalog())
+
+    matched = matcher.recommend(["docker"], max_results=50)
+    padded = matcher.recommend(["docker"], max_results=50, pad_random=True)
+    assert len(padded) == 50
+    assert padded[:len(matched)] == matched
+    assert all(rec["match_score"] == 0 for rec in padded[len(matched):])
+
+    # The padded jobs never come back from the cache
+    assert matcher.recommend(["docker"], max_results=50) == matched
+    assert matcher.cache_info()["size"] == 1
@@ -0,0 +1,145 @@
+import numpy as np
+import pytest
+
+from memory_guard import MemoryGuard, MemoryLimitExceeded, current_rss_mb
+from reader_pool import ReaderPool
+
+pytestmark = pytest.mark.skipif(current_rss_mb() is None, reason="needs /proc/self/statm")
+
+
+def allocate_mb(size_mb: int) -> np.ndarray:
+    # np.ones touches every page, so the allocation shows up in RSS
+    return np.ones(size_mb * 1024 * 1024, dtype=np.uint8)
+
+
+def test_disabled_guard_never_fails():
+    guard = MemoryGuard(limit_mb=0)
+    block = allocate_mb(64)
+    guard.check("page 1")
+    assert guard.growth_mb() is None
+    del block
+
+
+def test_job_growth_past_limit_fails():
+    guard = MemoryGuard(limit_mb=32)
+    block = allocate_mb(96)
+    with pytest.raises(MemoryLimitExceeded, match="page 3"):
+        guard.check("page 3")
+    del block
+
+
+def test_memory_in_use_before_the_job_is_not_charged():
+    block = allocate_mb(96)
+    guard = MemoryGuard(limit_mb=32)
+    guard.check("page 1")
+    del block
+
+
+def test_shared_memory_is_not_charged():
+    shared = {"mb": 0.0}
+    guard = MemoryGuard(limit_mb=32, shared_mb=lambda: shared["mb"])
+    reader = allocate_mb(96)
+    shared["mb"] += 96  # e.g. an OCR reader loaded during the job
+    guard.check("page 1")
+    del reader
+
+
+def test_uncollected_garbage_is_not_charged():
+    class Node:
+        pass
+
+    guard = MemoryGuard(limit_mb=32)
+    node = Node()
+    node.cycle = node
+    node.block = allocate_mb(96)
+    del node  # only freed by the cycle collector
+    guard.check("page 1")
+    assert guard.growth_mb() < 32
+
+
+class StubReader:
+    """Stands in for an EasyOCR reader: holds model-sized memory, reads nothing"""
+
+    def __init__(self, size_mb: int = 0):
+        self.weights = allocate_mb(size_mb) if size_mb else None
+        self.pages = []
+
+    def readtext(self, image):
+        self.pages.append(image.shape)
+        return [([[0, 0], [1, 0], [1, 1], [0, 1]], f"page {len(self.pages)}", 0.9)]
+
+
+def test_evicted_readers_stop_being_shared():
+    pool = ReaderPool(lambda languages: StubReader(96), memory_budget_mb=150, default_size_mb=96)
+    guard = MemoryGuard(limit_mb=32, shared_mb=lambda: pool.loaded_mb)
+
+    shared = []
+    for languages in [("en",), ("hi", "en"), ("en",), ("ta", "en"), ("en",), ("hi", "en")]:
+        with pool.acquire(languages):
+            pass
+        guard.check(f"reader {languages}")  # the readers themselves are not charged
+        shared.append(pool.loaded_mb)
+
+    assert pool.evictions == 5
+    assert max(shared) - min(shared) < 48  # one reader loaded at a time, not a growing total
+
+    # ...so the job is still charged for what it allocates itself
+    block = allocate_mb(64)
+    with pytest.raises(MemoryLimitExceeded):
+        guard.check("after reloads")
+    del block
+
+
+def test_scanned_pdf_pages_keep_memory_flat(tmp_path):
+    fitz = pytest.importorskip("fitz")
+    pytest.importorskip("cv2")
+    from contextlib import closing
+
+    from ocr_service import OCRService
+
+    pdf_path = str(tmp_path / "scanned.pdf")
+    with fitz.open() as pdf:
+        for page_num in range(200):
+            page = pdf.new_page()  # no text layer: every page is rasterized and OCRed
+            for line in range(30):
+                page.draw_rect(fitz.Rect(50, 60 + line * 22, 300 + page_num, 72 + line * 22), fill=(0, 0, 0))
+        pdf.save(pdf_path, garbage=3, deflate=True)
+
+    reader = StubReader()
+    service = OCRService(languages=["en"], pool=ReaderPool(lambda languages: reader))
+    page_mb = 1190 * 1684 * 3 / (1024 * 1024)  # one A4 page at 2x zoom
+
+    samples = []
+    with closing(service.iter_pdf_pages(pdf_path)) as pages:
+        for page_num, text in enumerate(pages, 1):
+            assert text == f"page {page_num}"
+            if page_num % 20 == 0:
+                samples.append(current_rss_mb())
+
+    assert len(reader.pages) == 200 and reader.pages[0] == (1684, 1190, 3)
+    # Keeping even every tenth page buffer would add over 100 MB by the end
+    assert max(samples[5:]) - max(samples[:5]) < 2 * page_mb
+
+
+def test_text_pdf_pages_keep_memory_flat(tmp_path):
+    fitz = pytest.importorskip("fitz")
+    pytest.importorskip("cv2")
+    from contextlib import closing
+
+    from ocr_service import OCRService
+
+    pdf_path = str(tmp_path / "long.pdf")
+    with fitz.open() as pdf:
+        for page_num in range(500):
+            lines = [f"Course {line}: Machine Learning, grade A (page {page_num + 1})" for line in range(30)]
+            pdf.new_page().insert_text((50, 60), "\n".join(lines), fontsize=11, lineheight=2)
+        pdf.save(pdf_path, garbage=3, deflate=True)
+
+    samples = []
+    with closing(OCRService(pool=ReaderPool(lambda languages: StubReader())).iter_pdf_pages(pdf_path)) as pages:
+        for page_num, _ in enumerate(pages, 1):
+            if page_num % 50 == 0:
+                samples.append(current_rss_mb())
+
+    # Only the current page is alive: the second half must not grow past the first
+    assert max(samples[5:]) - max(samples[:5]) < 10
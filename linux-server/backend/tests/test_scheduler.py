@@ -0,0 +1,41 @@
+import pytest
+
+import scheduler
+from scheduler import FairScheduler, RateLimitExceeded
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(scheduler.time, "monotonic", clock)
+    return clock
+
+
+def test_idle_buckets_are_evicted(clock):
+    fair = FairScheduler(concurrency=1, max_queue=10_000, rate_per_minute=60, burst=10, weights={})
+    for user in range(1000):
+        fair.admit(f"user{user}")
+        fair.release(f"user{user}")
+    assert len(fair._buckets) == 1000
+
+    # Ten seconds refill a burst of ten at one token per second
+    clock.now += 10
+    fair.admit("alice", 10)
+    assert list(fair._buckets) == ["alice"]
+
+    # Buckets that are still refilling keep their limit
+    clock.now += 5
+    fair.admit("bob", 10)
+    clock.now += 5
+    fair.admit("carol")
+    assert set(fair._buckets) == {"bob", "carol"}  # alice has refilled since
+    with pytest.raises(RateLimitExceeded):
+        fair.admit("bob", 10)